@@ -9,7 +9,14 @@
 
 from django.contrib import admin
 
-from datamodel.models import Game, Move
+from datamodel.models import Game, MatchRequest, Move, Rating, \
+    Tournament, TournamentEntry, TournamentGame, UserStats
 
 admin.site.register(Game)
 admin.site.register(Move)
+admin.site.register(MatchRequest)
+admin.site.register(Rating)
+admin.site.register(UserStats)
+admin.site.register(Tournament)
+admin.site.register(TournamentEntry)
+admin.site.register(TournamentGame)
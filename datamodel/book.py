@@ -0,0 +1,312 @@
+"""
+    Libro de aperturas: árbol (trie) de las secuencias de movimientos de las
+    partidas terminadas desde la posición inicial (CAT1POS..CAT4POS,
+    MOUSEPOS), con cuántas partidas pasaron por cada nodo y cuántas ganaron
+    los gatos.
+
+    Lo construye el comando build_opening_book y se guarda en un fichero
+    binario compacto (settings.OPENING_BOOK_FILE) que cada proceso carga una
+    vez, y otra cada vez que se reconstruye (get_book). El árbol se guarda
+    por niveles en cinco arrays paralelos, con los hijos de cada nodo
+    seguidos y ordenados de más a menos jugado, así que una consulta solo
+    recorre unos pocos hijos por movimiento y no hace ninguna consulta a la
+    base de datos.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import logging
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger('paccat.book')
+
+MAGIC = b'PCBK'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+# Movimiento de la raíz, que no tiene
+NO_MOVE = 0xFFFF
+
+# (nombre, tipo del array) de cada campo de los nodos, en el orden en el
+# que se guardan
+FIELDS = (('moves', 'H'), ('games', 'I'), ('cat_wins', 'I'),
+          ('first_child', 'I'), ('n_children', 'H'))
+
+_book = None
+# (fichero, fecha de modificación) del libro cargado
+_book_version = None
+
+
+def encode_move(origin, target):
+    return origin * 64 + target
+
+
+def decode_move(move):
+    return divmod(move, 64)
+
+
+def parse_path(value):
+    """
+        Interpreta una secuencia de movimientos "origen-destino" separados
+        por comas, p.ej. "0-9,59-50".
+
+        Returns
+        -------
+        list : tuplas (origen, destino)
+
+        Raises
+        -------
+        ValueError
+            Si algún movimiento no es válido
+
+        Author
+        -------
+            Eric Morales
+    """
+    path = []
+    for move in filter(None, value.split(',')):
+        origin, target = (int(cell) for cell in move.split('-'))
+        if not (0 <= origin < 64 and 0 <= target < 64):
+            raise ValueError("Casilla fuera del tablero: %s" % move)
+        path.append((origin, target))
+    return path
+
+
+class OpeningBook(object):
+    """
+        Libro de aperturas en memoria.
+
+        Attributes
+        ----------
+        moves, games, cat_wins, first_child, n_children : array
+            Campos de cada nodo (ver FIELDS). El nodo 0 es la posición
+            inicial.
+
+        Methods
+        -------
+        build(cls, games, max_depth, min_games)
+            Construye el libro a partir de las partidas.
+        load(cls, path)
+            Lee el libro de un fichero.
+        save(self, path)
+            Guarda el libro en un fichero.
+        find(self, path)
+            Nodo al que se llega con una secuencia de movimientos.
+        node_data(self, node)
+            Partidas y victorias de un nodo y de sus hijos.
+    """
+
+    def __init__(self, **arrays):
+        for name, typecode in FIELDS:
+            setattr(self, name, arrays.get(name, array(typecode)))
+
+    def __len__(self):
+        return len(self.moves)
+
+    @classmethod
+    def build(cls, games, max_depth, min_games=1):
+        """
+            Construye el libro a partir de las partidas.
+
+            Parameters
+            ----------
+            games : iterable
+                Tuplas ([(origen, destino)], ganador) de cada partida
+                terminada
+            max_depth : int
+                Movimientos de cada partida que se guardan
+            min_games : int
+                Se descartan los nodos por los que han pasado menos
+                partidas
+
+            Returns
+            -------
+            OpeningBook : libro construido
+
+            Author
+            -------
+                Eric Morales
+        """
+        # Cada nodo del árbol en construcción es [partidas, victorias de
+        # los gatos, {movimiento: nodo}]
+        root = [0, 0, {}]
+        for moves, winner in games:
+            node = root
+            node[0] += 1
+            node[1] += winner == 1
+            for origin, target in moves[:max_depth]:
+                node = node[2].setdefault(encode_move(origin, target),
+                                          [0, 0, {}])
+                node[0] += 1
+                node[1] += winner == 1
+
+        book = cls()
+        pending = deque([(NO_MOVE, root)])
+        while pending:
+            move, (n_games, cat_wins, children) = pending.popleft()
+            kept = sorted(((child_move, child)
+                           for child_move, child in children.items()
+                           if child[0] >= min_games),
+                          key=lambda item: (-item[1][0], item[0]))
+            book.moves.append(move)
+            book.games.append(n_games)
+            book.cat_wins.append(cat_wins)
+            # En orden por niveles, los hijos van detrás de todos los nodos
+            # ya añadidos y de los que quedan pendientes
+            book.first_child.append(len(book.moves) + len(pending))
+            book.n_children.append(len(kept))
+            pending.extend(kept)
+        return book
+
+    @classmethod
+    def load(cls, path):
+        """
+            Lee el libro de un fichero creado con save.
+
+            Raises
+            -------
+            ValueError
+                Si el fichero no es un libro de aperturas
+
+            Author
+            -------
+                Eric Morales
+        """
+        with open(path, 'rb') as f:
+            magic, version, n_nodes = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("%s no es un libro de aperturas" % path)
+            arrays = {}
+            for name, typecode in FIELDS:
+                values = array(typecode)
+                values.fromfile(f, n_nodes)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                arrays[name] = values
+        return cls(**arrays)
+
+    def save(self, path):
+        """
+            Guarda el libro. Se escribe en un fichero temporal que luego se
+            renombra, para que un proceso que lo esté cargando no lea un
+            fichero a medias.
+
+            Returns
+            -------
+            int : tamaño del fichero en bytes
+
+            Author
+            -------
+                Eric Morales
+        """
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self)))
+            for name, _ in FIELDS:
+                values = getattr(self, name)
+                if sys.byteorder == 'big':
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                values.tofile(f)
+        os.replace(temporary, path)
+        return os.path.getsize(path)
+
+    def find(self, path):
+        """
+            Nodo al que se llega desde la posición inicial con la secuencia
+            de movimientos.
+
+            Returns
+            -------
+            int : índice del nodo, o None si ninguna partida del libro ha
+            pasado por ahí
+
+            Author
+            -------
+                Eric Morales
+        """
+        if not len(self):
+            return None
+        node = 0
+        for origin, target in path:
+            move = encode_move(origin, target)
+            first = self.first_child[node]
+            for child in range(first, first + self.n_children[node]):
+                if self.moves[child] == move:
+                    node = child
+                    break
+            else:
+                return None
+        return node
+
+    def node_data(self, node):
+        """
+            Partidas y victorias de un nodo y de sus hijos.
+
+            Returns
+            -------
+            dict : diccionario con los campos
+                games: partidas que han pasado por el nodo
+                cat_wins: de ellas, las que han ganado los gatos
+                moves: lista de dicts (origin, target, games, cat_wins) con
+                    los movimientos jugados desde el nodo, del más al menos
+                    jugado
+
+            Author
+            -------
+                Eric Morales
+        """
+        first = self.first_child[node]
+        moves = []
+        for child in range(first, first + self.n_children[node]):
+            origin, target = decode_move(self.moves[child])
+            moves.append({'origin': origin, 'target': target,
+                          'games': self.games[child],
+                          'cat_wins': self.cat_wins[child]})
+        return {'games': self.games[node], 'cat_wins': self.cat_wins[node],
+                'moves': moves}
+
+
+def get_book():
+    """
+        Libro de settings.OPENING_BOOK_FILE, que se carga la primera vez
+        que se pide en cada proceso y se vuelve a cargar cuando cambia la
+        fecha de modificación del fichero (al reconstruirlo), sin reiniciar
+        el proceso. Si no existe el fichero o no se puede leer, el libro
+        está vacío hasta que cambie.
+
+        Author
+        -------
+            Eric Morales
+    """
+    global _book, _book_version
+    path = settings.OPENING_BOOK_FILE
+    try:
+        version = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        version = (path, None)
+    if _book is not None and version == _book_version:
+        return _book
+
+    current = OpeningBook()
+    if version[1] is not None:
+        try:
+            current = OpeningBook.load(path)
+        except (OSError, EOFError, ValueError, struct.error):
+            logger.exception("No se ha podido cargar el libro de aperturas "
+                             "%s", path)
+    _book, _book_version = current, version
+    return _book
+
+
+def reset_book():
+    global _book, _book_version
+    _book = _book_version = None
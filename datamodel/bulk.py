@@ -0,0 +1,172 @@
+"""
+    Inserción masiva de partidas y movimientos ya validados en memoria
+    (ver datamodel.engine), evitando el coste de Move.save y Game.save por
+    cada movimiento.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from datamodel.models import Game, GameStatus, Move
+
+# Número de filas por sentencia INSERT
+BULK_BATCH_SIZE = 1000
+
+
+def build_game(cat_user_id, mouse_user_id, moves, state, winner):
+    """
+        Construye (sin guardar) una partida y sus movimientos a partir del
+        resultado de datamodel.engine.replay, con el mismo estado que
+        tendría tras pasar por Move.save y Game.save.
+
+        Parameters
+        ----------
+        cat_user_id : int
+            Id del usuario gato
+        mouse_user_id : int
+            Id del usuario PAC (None si la partida no tiene PAC)
+        moves : list
+            Secuencia de tuplas (origin, target) ya validada
+        state : GameState
+            Estado final de la partida
+        winner : int
+            Ganador según check_winner
+
+        Returns
+        -------
+        tuple : (Game, [Move])
+
+        Author
+        -------
+            Eric Morales
+    """
+    if mouse_user_id is None:
+        status = GameStatus.CREATED
+    elif winner != 0:
+        status = GameStatus.FINISHED
+    else:
+        status = GameStatus.ACTIVE
+
+    game = Game(cat_user_id=cat_user_id, mouse_user_id=mouse_user_id,
+                cat1=state.cat1, cat2=state.cat2, cat3=state.cat3,
+                cat4=state.cat4, mouse=state.mouse, cat_turn=state.cat_turn,
+                status=status)
+
+    # Los gatos siempre mueven en los turnos pares
+    game_moves = [Move(origin=origin, target=target,
+                       player_id=cat_user_id if ply % 2 == 0
+                       else mouse_user_id)
+                  for ply, (origin, target) in enumerate(moves)]
+    return game, game_moves
+
+
+def safe_batch_size(model, objs, batch_size=BULK_BATCH_SIZE):
+    """
+        Ajusta el tamaño de lote al máximo que admite el motor de base de
+        datos (SQLite limita el número de parámetros por sentencia).
+
+        Parameters
+        ----------
+        model : Model
+            Modelo de los objetos a insertar
+        objs : list
+            Objetos a insertar
+        batch_size : int
+            Tamaño de lote deseado
+
+        Returns
+        -------
+        int : tamaño de lote a utilizar
+
+        Author
+        -------
+            Eric Morales
+    """
+    fields = model._meta.concrete_fields
+    return max(1, min(batch_size, connection.ops.bulk_batch_size(fields,
+                                                                 objs)))
+
+
+def bulk_create_with_ids(model, objs, batch_size=BULK_BATCH_SIZE):
+    """
+        Llama a bulk_create y se asegura de que todos los objetos tengan su
+        clave primaria asignada, aunque el motor de base de datos no la
+        devuelva (SQLite). Debe llamarse dentro de una transacción.
+
+        Parameters
+        ----------
+        model : Model
+            Modelo de los objetos a insertar
+        objs : list
+            Objetos sin guardar
+        batch_size : int
+            Número de filas por sentencia INSERT
+
+        Returns
+        -------
+        list : los mismos objetos, con la clave primaria asignada
+
+        Author
+        -------
+            Eric Morales
+    """
+    if not objs:
+        return objs
+
+    batch_size = safe_batch_size(model, objs, batch_size)
+    if connection.features.can_return_ids_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+
+    # SQLite serializa las escrituras, por lo que los ids insertados son
+    # los siguientes al máximo actual
+    last_id = model.objects.aggregate(Max('id'))['id__max'] or 0
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    ids = list(model.objects.filter(id__gt=last_id).order_by('id')
+               .values_list('id', flat=True)[:len(objs)])
+    if len(ids) != len(objs):
+        raise RuntimeError("bulk_create: no se han podido recuperar los ids "
+                           "de las filas insertadas")
+    for obj, pk in zip(objs, ids):
+        obj.pk = pk
+    return objs
+
+
+def bulk_insert_games(entries, batch_size=BULK_BATCH_SIZE):
+    """
+        Inserta un lote de partidas junto con sus movimientos en una única
+        transacción. Las partidas deben tener ya su estado final calculado,
+        ya que no se llama a Game.save ni a Move.save.
+
+        Parameters
+        ----------
+        entries : list
+            Lista de tuplas (Game, [Move]) sin guardar. Los movimientos no
+            necesitan tener la partida asignada.
+        batch_size : int
+            Número de filas por sentencia INSERT
+
+        Returns
+        -------
+        tuple : (partidas insertadas, movimientos insertados)
+
+        Author
+        -------
+            Eric Morales
+    """
+    with transaction.atomic():
+        games = [game for game, _ in entries]
+        bulk_create_with_ids(Game, games, batch_size)
+
+        moves = []
+        for game, game_moves in entries:
+            for move in game_moves:
+                move.game_id = game.id
+                moves.append(move)
+        Move.objects.bulk_create(
+            moves, batch_size=safe_batch_size(Move, moves, batch_size))
+
+    return len(games), len(moves)
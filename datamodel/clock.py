@@ -0,0 +1,72 @@
+"""
+    Reloj por movimiento de las partidas con control de tiempo
+    (Game.move_time).
+
+    No hay un temporizador por partida: cada partida guarda en
+    Game.move_deadline el instante (segundos desde epoch) en el que se le
+    acaba el tiempo al jugador que tiene el turno, y el índice sobre esa
+    columna hace de cola de prioridad. El plazo se comprueba:
+
+    - al mover (Move.save rechaza el movimiento y la API y move_service
+      terminan la partida), y
+    - en el barrido periódico del comando sweep_clocks, que busca por el
+      índice las partidas con el plazo vencido (ver
+      datamodel.reaper.reap_timeouts).
+
+    Con el plazo guardado en la partida, el tiempo restante se calcula sin
+    más consultas.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+
+# Segundos por movimiento que se pueden elegir al crear una partida (0 sin
+# reloj)
+MOVE_TIMES = (0, 15, 30, 60, 120)
+
+
+def now():
+    return int(time.time())
+
+
+def deadline(move_time, current=None):
+    """
+        Plazo del siguiente movimiento si empieza a contar ahora.
+
+        Returns
+        -------
+        int : instante en segundos desde epoch, o None si no hay reloj
+
+        Author
+        -------
+            Eric Morales
+    """
+    if not move_time:
+        return None
+    return (now() if current is None else current) + move_time
+
+
+def remaining(game, current=None):
+    """
+        Segundos que le quedan al jugador que tiene el turno.
+
+        Returns
+        -------
+        int : segundos (0 si se ha agotado), o None si la partida no tiene
+        el reloj en marcha
+
+        Author
+        -------
+            Eric Morales
+    """
+    if game.move_deadline is None:
+        return None
+    return max(0, game.move_deadline - (now() if current is None
+                                        else current))
+
+
+def expired(game, current=None):
+    return remaining(game, current) == 0
@@ -13,6 +13,7 @@ MSG_ERROR_INVALID_CELL = "Invalid cell for a cat or the mouse|Gato o ratón " \
 MSG_ERROR_GAMESTATUS = "Game status not valid|Estado no válido " \
                        "(0, created), (1, active), (2, finished)"
 MSG_ERROR_MOVE = "Move not allowed|Movimiento no permitido"
+MSG_ERROR_TIMEOUT = "Move time exceeded|Tiempo de movimiento agotado"
 MSG_ERROR_NEW_COUNTER = "Insert not allowed|Inseción no permitida"
 ERROR_CREDENTIALS = "Usuario/clave no válidos"
 EEROR_ACCOUNT_DISABLED = "Your mouse_cat account is disabled."
@@ -34,6 +35,10 @@ ERROR_NOT_ALLOWED_TO_REPRODUCE = "No puedes reproducir esta partida, porque " \
                                  "no eras uno de sus participantes"
 ERROR_NOT_FINISHED_YET = "La partida no ha finalizado todavia"
 GET_NOT_ALLOWED = "Metodo GET no permitido sobre esta página"
+ERROR_INVALID_ROLE = "Papel no válido: 1 gato, 2 PAC"
+ERROR_USER_NOT_EXISTS = "El usuario no existe"
+ERROR_TOURNAMENT_NOT_EXISTS = "El torneo no existe"
+ERROR_INVALID_MOVE_TIME = "Tiempo por movimiento no válido"
 
 GAME_SELECTED_MOVE_NUMBER = 'move_number'
 ACCESO_URL_INVALIDO = "Intento de acceso no permitido a URL"
@@ -0,0 +1,59 @@
+"""
+    Cálculo de la puntuación Elo de los jugadores. Lo usan
+    Rating.objects.record_result, al terminar cada partida, y el comando
+    rebuild_ratings, que recalcula las puntuaciones a partir del histórico.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+INITIAL_RATING = 1500.0
+# Diferencia de puntuación con la que el favorito gana 10 de cada 11
+# partidas
+SCALE = 400.0
+# Las primeras partidas mueven más la puntuación, para que los jugadores
+# nuevos lleguen antes a su nivel
+PROVISIONAL_GAMES = 30
+PROVISIONAL_K = 40.0
+K_FACTOR = 20.0
+
+
+def expected_score(rating, opponent):
+    """
+        Probabilidad de que gane un jugador con puntuación rating contra
+        otro con puntuación opponent.
+
+        Author
+        -------
+            Eric Morales
+    """
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / SCALE))
+
+
+def k_factor(games):
+    return PROVISIONAL_K if games < PROVISIONAL_GAMES else K_FACTOR
+
+
+def new_ratings(winner_rating, winner_games, loser_rating, loser_games):
+    """
+        Puntuaciones tras una partida (no hay empates).
+
+        Parameters
+        ----------
+        winner_rating, loser_rating : float
+            Puntuaciones antes de la partida
+        winner_games, loser_games : int
+            Partidas puntuadas que llevaba cada uno
+
+        Returns
+        -------
+        tuple : (puntuación del ganador, puntuación del perdedor)
+
+        Author
+        -------
+            Eric Morales
+    """
+    expected = expected_score(winner_rating, loser_rating)
+    return (winner_rating + k_factor(winner_games) * (1.0 - expected),
+            loser_rating - k_factor(loser_games) * (1.0 - expected))
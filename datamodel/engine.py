@@ -0,0 +1,288 @@
+"""
+    Motor de reglas en memoria de PACCAT. Permite reproducir y validar
+    partidas completas utilizando las mismas reglas que Move.save, pero sin
+    realizar ninguna consulta a la base de datos.
+        - GameState
+        - apply_move
+        - replay
+        - legal_moves
+        - fast_check_winner
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.core.exceptions import ValidationError
+
+from datamodel import constants
+from datamodel.models import CAT1POS, CAT2POS, CAT3POS, CAT4POS, MOUSEPOS, \
+    Game, valid_move
+
+# Desplazamientos diagonales posibles sobre el tablero (en casillas)
+CAT_SHIFTS = (7, 9)
+MOUSE_SHIFTS = (-9, -7, 7, 9)
+
+
+class GameState(object):
+    """
+        Estado de una partida en memoria. Expone los mismos atributos que
+        Game (cat1, cat2, cat3, cat4, mouse, cat_turn), por lo que puede
+        pasarse directamente a valid_move y check_winner.
+
+        Attributes
+        ----------
+        cat1 : int
+        cat2 : int
+        cat3 : int
+        cat4 : int
+        mouse : int
+        cat_turn : boolean
+
+        Methods
+        -------
+        from_game(cls, game)
+            Crea un estado a partir de un objeto Game.
+        copy(self)
+            Devuelve una copia independiente del estado.
+        cats(self)
+            Devuelve las posiciones de los cuatro gatos.
+    """
+
+    __slots__ = ('cat1', 'cat2', 'cat3', 'cat4', 'mouse', 'cat_turn')
+
+    # Solo las partidas guardadas pueden adjudicarse (ver check_winner)
+    adjudicated_winner = 0
+
+    def __init__(self, cat1=CAT1POS, cat2=CAT2POS, cat3=CAT3POS,
+                 cat4=CAT4POS, mouse=MOUSEPOS, cat_turn=True):
+        self.cat1 = cat1
+        self.cat2 = cat2
+        self.cat3 = cat3
+        self.cat4 = cat4
+        self.mouse = mouse
+        self.cat_turn = cat_turn
+
+    @classmethod
+    def from_game(cls, game):
+        """
+            Crea un estado a partir de un objeto Game (o cualquier objeto con
+            los mismos atributos).
+
+            Parameters
+            ----------
+            game : Game
+                Partida de la que copiar las posiciones
+
+            Returns
+            -------
+            GameState : estado creado
+
+            Author
+            -------
+                Eric Morales
+        """
+        return cls(game.cat1, game.cat2, game.cat3, game.cat4, game.mouse,
+                   game.cat_turn)
+
+    def copy(self):
+        """
+            Devuelve una copia independiente del estado.
+
+            Returns
+            -------
+            GameState : copia del estado
+
+            Author
+            -------
+                Eric Morales
+        """
+        return GameState(self.cat1, self.cat2, self.cat3, self.cat4,
+                         self.mouse, self.cat_turn)
+
+    def cats(self):
+        """
+            Devuelve las posiciones de los cuatro gatos, en orden.
+
+            Returns
+            -------
+            tuple : (cat1, cat2, cat3, cat4)
+
+            Author
+            -------
+                Eric Morales
+        """
+        return self.cat1, self.cat2, self.cat3, self.cat4
+
+
+def apply_move(state, origin, target):
+    """
+        Aplica un movimiento sobre el estado, con las mismas comprobaciones
+        que realiza Move.save para el jugador al que le toca mover.
+
+        Parameters
+        ----------
+        state : GameState
+            Estado sobre el que se realiza el movimiento (se modifica)
+        origin : int
+            Posición del tablero origen
+        target : int
+            Posición del tablero destino
+
+        Returns
+        -------
+        GameState : el mismo estado, ya actualizado
+
+        Raises
+        -------
+        ValidationError
+            Si el movimiento no es correcto
+
+        Author
+        -------
+            Eric Morales
+    """
+    valid_move(state, origin, target)
+
+    if state.cat_turn:
+        if state.cat1 == origin:
+            state.cat1 = target
+        elif state.cat2 == origin:
+            state.cat2 = target
+        elif state.cat3 == origin:
+            state.cat3 = target
+        elif state.cat4 == origin:
+            state.cat4 = target
+        else:
+            raise ValidationError(constants.MSG_ERROR_MOVE)
+        state.cat_turn = False
+    else:
+        if state.mouse != origin:
+            raise ValidationError(constants.MSG_ERROR_MOVE)
+        state.mouse = target
+        state.cat_turn = True
+
+    return state
+
+
+def fast_check_winner(state):
+    """
+        Equivalente a check_winner, pero solo prueba las cuatro casillas
+        diagonales del PAC en lugar de recorrer todo el tablero. Devuelve
+        exactamente el mismo resultado que check_winner para cualquier
+        estado.
+
+        Parameters
+        ----------
+        state : GameState
+            Estado (o partida) a comprobar
+
+        Returns
+        -------
+        int : 0 == NO WINNER, 1 == CAT_WINNER, 2 == MOUSE_WINNER
+
+        Author
+        -------
+            Eric Morales
+    """
+    mouse = state.mouse
+    if mouse in (0, 2, 4, 6):
+        return 2
+
+    if not state.cat_turn:
+        for shift in MOUSE_SHIFTS:
+            target = mouse + shift
+            # check_winner solo prueba las casillas [MIN_CELL, MAX_CELL)
+            if not Game.MIN_CELL <= target < Game.MAX_CELL:
+                continue
+            try:
+                if valid_move(state, mouse, target):
+                    return 0
+            except ValidationError:
+                pass
+        return 1
+
+    return 0
+
+
+def legal_moves(state):
+    """
+        Devuelve todos los movimientos válidos del jugador al que le toca
+        mover.
+
+        Parameters
+        ----------
+        state : GameState
+            Estado de la partida
+
+        Returns
+        -------
+        list : lista de tuplas (origin, target)
+
+        Author
+        -------
+            Eric Morales
+    """
+    if state.cat_turn:
+        pieces = state.cats()
+        shifts = CAT_SHIFTS
+    else:
+        pieces = (state.mouse,)
+        shifts = MOUSE_SHIFTS
+
+    moves = []
+    for origin in pieces:
+        for shift in shifts:
+            target = origin + shift
+            if not Game.MIN_CELL <= target <= Game.MAX_CELL:
+                continue
+            try:
+                valid_move(state, origin, target)
+            except ValidationError:
+                continue
+            moves.append((origin, target))
+    return moves
+
+
+def replay(moves, state=None):
+    """
+        Reproduce en memoria una secuencia completa de movimientos,
+        alternando gato y PAC, y comprobando tras cada uno si hay ganador.
+        No se permite mover una vez que la partida ha terminado.
+
+        Parameters
+        ----------
+        moves : iterable
+            Secuencia de tuplas (origin, target)
+        state : GameState (default None)
+            Estado inicial. Si no se indica, se parte de la posición inicial
+
+        Returns
+        -------
+        tuple : (GameState final, int ganador según check_winner)
+
+        Raises
+        -------
+        ValidationError
+            Si algún movimiento no es correcto. El atributo ply de la
+            excepción indica el índice del movimiento erróneo.
+
+        Author
+        -------
+            Eric Morales
+    """
+    if state is None:
+        state = GameState()
+
+    winner = fast_check_winner(state)
+    for ply, (origin, target) in enumerate(moves):
+        try:
+            if winner != 0:
+                raise ValidationError(constants.MSG_ERROR_MOVE)
+            apply_move(state, origin, target)
+        except ValidationError as err:
+            err.ply = ply
+            raise
+        winner = fast_check_winner(state)
+
+    return state, winner
@@ -0,0 +1,423 @@
+"""
+    Mapas de calor de ocupación de las casillas: cuántas veces ha estado
+    cada una de las 64 casillas ocupada por el PAC o por un gato en las
+    partidas terminadas, separados por el ganador y por el tramo de
+    movimientos (BUCKET_PLIES movimientos por tramo; el último tramo recoge
+    el resto de la partida).
+
+    Se cuentan las posiciones del índice de posiciones (GamePosition), no
+    los movimientos: cada posición ya trae las casillas de todas las piezas
+    en su clave. Los contadores se guardan en el modelo Heatmap y se
+    mantienen de dos formas:
+
+    - update (comando update_heatmaps, programado): suma las partidas
+      terminadas desde la última vez, por lotes, en el orden de su fecha de
+      fin (Game.finished_at), que no cambia aunque la partida se vuelva a
+      guardar. Hasta dónde se ha llegado se guarda en HeatmapCursor, en la
+      misma transacción que los contadores, así que un lote se suma entero
+      o no se suma. Solo se cogen las partidas que llevan SETTLE_SECONDS
+      terminadas, para no adelantar el cursor a una partida cuya
+      transacción aún no se ve.
+    - rebuild (comando rebuild_heatmaps): recalcula todo desde cero,
+      contando cada bloque de posiciones de una vez con bincount de NumPy.
+      Cuenta también las partidas cargadas sin pasar por Game.save, que no
+      tienen fecha de fin y update no ve.
+
+    Las dos bloquean la fila del cursor mientras trabajan, así que no se
+    mezclan entre ellas.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import sys
+from array import array
+from datetime import timedelta
+from itertools import product
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from datamodel.engine import GameState, fast_check_winner
+from datamodel.models import (
+    Game, GamePosition, GameStatus, Heatmap, HeatmapCursor)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - dependencia opcional
+    numpy = None
+
+# Movimientos por tramo y número de tramos
+BUCKET_PLIES = 10
+BUCKETS = 6
+OUTCOMES = (1, 2)
+SQUARES = 64
+# Contadores de todos los mapas, uno detrás de otro: pieza, ganador, tramo
+# y casilla
+SIZE = len(Heatmap.PIECES) * len(OUTCOMES) * BUCKETS * SQUARES
+
+# Partidas por lote (y por transacción) en update
+BATCH_SIZE = 500
+# Posiciones leídas en cada consulta en rebuild
+CHUNK_SIZE = 100000
+# Segundos que tiene que llevar terminada una partida para sumarla
+SETTLE_SECONDS = 60
+
+
+def ply_bucket(ply):
+    return min(ply // BUCKET_PLIES, BUCKETS - 1)
+
+
+def offset(piece, outcome, bucket):
+    """
+        Posición del primer contador de un mapa en el array de todos.
+
+        Author
+        -------
+            Eric Morales
+    """
+    return (((piece - 1) * len(OUTCOMES) + outcome - 1) * BUCKETS +
+            bucket) * SQUARES
+
+
+def new_counts():
+    return array('Q', [0]) * SIZE
+
+
+def pack_counts(values):
+    values = array('Q', values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_counts(data):
+    values = array('Q')
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def game_outcomes(rows):
+    """
+        Ganador de cada partida terminada.
+
+        Parameters
+        ----------
+        rows : iterable
+            Tuplas (id, cat1, cat2, cat3, cat4, mouse, cat_turn,
+            adjudicated_winner)
+
+        Returns
+        -------
+        dict : {id: ganador}, sin las partidas que no tienen ganador
+
+        Author
+        -------
+            Eric Morales
+    """
+    outcomes = {}
+    for game_id, cat1, cat2, cat3, cat4, mouse, cat_turn, adjudicated \
+            in rows:
+        winner = adjudicated or fast_check_winner(
+            GameState(cat1, cat2, cat3, cat4, mouse, cat_turn))
+        if winner in OUTCOMES:
+            outcomes[game_id] = winner
+    return outcomes
+
+
+def count_positions(rows, outcomes, counts):
+    """
+        Suma a counts las casillas ocupadas en cada posición.
+
+        Parameters
+        ----------
+        rows : iterable
+            Tuplas (partida, ply, clave) de GamePosition
+        outcomes : dict
+            Ganador de cada partida; las demás se ignoran
+        counts : array
+            Contadores de todos los mapas (new_counts)
+
+        Author
+        -------
+            Eric Morales
+    """
+    for game_id, ply, key in rows:
+        outcome = outcomes.get(game_id)
+        if outcome is None:
+            continue
+        bucket = ply_bucket(ply)
+        base = offset(Heatmap.CAT, outcome, bucket)
+        for shift in (0, 6, 12, 18):
+            counts[base + ((key >> shift) & 63)] += 1
+        counts[offset(Heatmap.MOUSE, outcome, bucket) +
+               ((key >> 24) & 63)] += 1
+
+
+def count_positions_numpy(positions, game_ids, winners):
+    """
+        Igual que count_positions, pero con un bloque de posiciones en
+        arrays de NumPy.
+
+        Parameters
+        ----------
+        positions : numpy.ndarray
+            Matriz con una fila (partida, ply, clave) por posición
+        game_ids : numpy.ndarray
+            Ids de las partidas con ganador, ordenados
+        winners : numpy.ndarray
+            Ganador de cada una de esas partidas
+
+        Returns
+        -------
+        numpy.ndarray : contadores de todos los mapas (SIZE)
+
+        Author
+        -------
+            Eric Morales
+    """
+    if not len(game_ids) or not len(positions):
+        return numpy.zeros(SIZE, dtype=numpy.uint64)
+    games, plies, keys = positions[:, 0], positions[:, 1], positions[:, 2]
+    found = numpy.minimum(numpy.searchsorted(game_ids, games),
+                          len(game_ids) - 1)
+    known = game_ids[found] == games
+    outcomes, plies, keys = winners[found[known]], plies[known], keys[known]
+
+    buckets = numpy.minimum(plies // BUCKET_PLIES, BUCKETS - 1)
+    cat_base = ((outcomes - 1) * BUCKETS + buckets) * SQUARES
+    mouse_base = cat_base + len(OUTCOMES) * BUCKETS * SQUARES
+    cells = [cat_base + ((keys >> shift) & 63) for shift in (0, 6, 12, 18)]
+    cells.append(mouse_base + ((keys >> 24) & 63))
+    return numpy.bincount(numpy.concatenate(cells),
+                          minlength=SIZE).astype(numpy.uint64)
+
+
+def apply_counts(counts, replace=False):
+    """
+        Suma los contadores a los mapas guardados, o los sustituye. Se
+        llama dentro de una transacción; las filas se bloquean para que dos
+        actualizaciones no se pisen.
+
+        Author
+        -------
+            Eric Morales
+    """
+    saved = {(heatmap.piece, heatmap.outcome, heatmap.bucket): heatmap
+             for heatmap in Heatmap.objects.select_for_update()}
+    for piece, outcome, bucket in product(
+            (piece for piece, _ in Heatmap.PIECES), OUTCOMES,
+            range(BUCKETS)):
+        start = offset(piece, outcome, bucket)
+        added = [int(value) for value in counts[start:start + SQUARES]]
+        heatmap = saved.get((piece, outcome, bucket))
+        if heatmap is None:
+            heatmap = Heatmap(piece=piece, outcome=outcome, bucket=bucket)
+        elif not replace:
+            if not any(added):
+                continue
+            added = [old + new for old, new in
+                     zip(unpack_counts(heatmap.counts), added)]
+        heatmap.counts = pack_counts(added)
+        heatmap.save()
+
+
+def lock_cursor():
+    """
+        Cursor de los mapas, bloqueado hasta el final de la transacción. Se
+        crea la primera vez; con la clave fija, dos procesos no pueden crear
+        dos cursores.
+
+        Returns
+        -------
+        HeatmapCursor : cursor
+
+        Author
+        -------
+            Eric Morales
+    """
+    HeatmapCursor.objects.get_or_create(id=1)
+    return HeatmapCursor.objects.select_for_update().get(id=1)
+
+
+def pending_games(cursor, before, limit):
+    """
+        Partidas terminadas antes de before que van detrás del cursor.
+
+        Returns
+        -------
+        list : como mucho limit tuplas (id, cat1, cat2, cat3, cat4, mouse,
+        cat_turn, adjudicated_winner, finished_at), en orden
+
+        Author
+        -------
+            Eric Morales
+    """
+    games = Game.objects.filter(status=GameStatus.FINISHED,
+                                mouse_user__isnull=False,
+                                finished_at__lt=before)
+    if cursor.finished_at is not None:
+        games = games.filter(
+            Q(finished_at__gt=cursor.finished_at) |
+            Q(finished_at=cursor.finished_at, id__gt=cursor.game_id))
+    return list(games.order_by('finished_at', 'id').values_list(
+        'id', 'cat1', 'cat2', 'cat3', 'cat4', 'mouse', 'cat_turn',
+        'adjudicated_winner', 'finished_at')[:limit])
+
+
+def update(batch_size=BATCH_SIZE, max_batches=None,
+           settle_seconds=SETTLE_SECONDS):
+    """
+        Suma a los mapas las partidas terminadas desde la última vez.
+
+        Parameters
+        ----------
+        batch_size : int
+            Partidas por lote
+        max_batches : int
+            Lotes como mucho (None para seguir hasta acabar)
+        settle_seconds : int
+            Segundos que tiene que llevar terminada una partida
+
+        Returns
+        -------
+        tuple : (partidas sumadas, lotes)
+
+        Author
+        -------
+            Eric Morales
+    """
+    before = timezone.now() - timedelta(seconds=settle_seconds)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            cursor = lock_cursor()
+            games = pending_games(cursor, before, batch_size)
+            if not games:
+                break
+            outcomes = game_outcomes(row[:8] for row in games)
+            counts = new_counts()
+            count_positions(GamePosition.objects.filter(
+                game_id__in=list(outcomes)).values_list(
+                'game_id', 'ply', 'key').iterator(), outcomes, counts)
+            apply_counts(counts)
+            cursor.game_id, cursor.finished_at = games[-1][0], games[-1][-1]
+            cursor.save()
+        total += len(games)
+        batches += 1
+    return total, batches
+
+
+def rebuild(chunk_size=CHUNK_SIZE, settle_seconds=SETTLE_SECONDS,
+            use_numpy=numpy is not None):
+    """
+        Recalcula los mapas desde cero con todas las partidas terminadas,
+        incluidas las que no tienen finished_at (cargadas sin pasar por
+        Game.save). Las partidas y las posiciones se leen por bloques en
+        orden de id, paginando por clave; en memoria solo quedan el ganador
+        de cada partida y los contadores. Todo se hace con el cursor
+        bloqueado, así que update espera a que termine.
+
+        Parameters
+        ----------
+        use_numpy : boolean
+            Cuenta las posiciones con NumPy (por defecto, si está
+            instalado)
+
+        Returns
+        -------
+        tuple : (partidas, posiciones leídas)
+
+        Author
+        -------
+            Eric Morales
+    """
+    if use_numpy and numpy is None:
+        raise ImportError("NumPy no está instalado")
+
+    before = timezone.now() - timedelta(seconds=settle_seconds)
+    with transaction.atomic():
+        cursor = lock_cursor()
+        cursor.finished_at, cursor.game_id = None, 0
+        outcomes = {}
+        last_id = 0
+        while True:
+            games = list(Game.objects.filter(
+                Q(finished_at__isnull=True) | Q(finished_at__lt=before),
+                status=GameStatus.FINISHED, mouse_user__isnull=False,
+                id__gt=last_id).order_by('id').values_list(
+                'id', 'cat1', 'cat2', 'cat3', 'cat4', 'mouse', 'cat_turn',
+                'adjudicated_winner', 'finished_at')[:chunk_size])
+            if not games:
+                break
+            outcomes.update(game_outcomes(row[:8] for row in games))
+            # update sigue por detrás de la última partida con fecha de fin
+            for row in games:
+                if row[-1] is not None and (
+                        cursor.finished_at is None or
+                        (row[-1], row[0]) > (cursor.finished_at,
+                                             cursor.game_id)):
+                    cursor.game_id, cursor.finished_at = row[0], row[-1]
+            last_id = games[-1][0]
+
+        if use_numpy:
+            game_ids = numpy.array(sorted(outcomes), dtype=numpy.int64)
+            winners = numpy.array([outcomes[game_id]
+                                   for game_id in game_ids],
+                                  dtype=numpy.int64)
+            counts = numpy.zeros(SIZE, dtype=numpy.uint64)
+        else:
+            counts = new_counts()
+
+        n_positions = 0
+        last_id = 0
+        while True:
+            rows = list(GamePosition.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', 'game_id', 'ply', 'key')[:chunk_size])
+            if not rows:
+                break
+            if use_numpy:
+                counts += count_positions_numpy(
+                    numpy.array(rows, dtype=numpy.int64)[:, 1:], game_ids,
+                    winners)
+            else:
+                count_positions((row[1:] for row in rows), outcomes, counts)
+            n_positions += len(rows)
+            last_id = rows[-1][0]
+
+        apply_counts(counts, replace=True)
+        cursor.save()
+    return len(outcomes), n_positions
+
+
+def heatmap_data():
+    """
+        Mapas guardados, para la API.
+
+        Returns
+        -------
+        dict : diccionario con los campos
+            bucket_plies: movimientos por tramo
+            cat, mouse: para cada pieza, dict con cat_wins y mouse_wins, las
+                partidas que han ganado los gatos y el PAC; cada uno es una
+                lista con los 64 contadores de cada tramo
+
+        Author
+        -------
+            Eric Morales
+    """
+    data = {'bucket_plies': BUCKET_PLIES}
+    for name in ('cat', 'mouse'):
+        data[name] = {winner: [[0] * SQUARES for _ in range(BUCKETS)]
+                      for winner in ('cat_wins', 'mouse_wins')}
+    for heatmap in Heatmap.objects.all():
+        piece = 'cat' if heatmap.piece == Heatmap.CAT else 'mouse'
+        winner = 'cat_wins' if heatmap.outcome == 1 else 'mouse_wins'
+        if 0 <= heatmap.bucket < BUCKETS:
+            data[piece][winner][heatmap.bucket] = \
+                unpack_counts(heatmap.counts).tolist()
+    return data
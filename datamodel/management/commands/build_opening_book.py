@@ -0,0 +1,100 @@
+"""
+    Comando que construye el libro de aperturas (ver datamodel.book) a
+    partir de las partidas terminadas.
+
+        python manage.py build_opening_book
+        python manage.py build_opening_book --depth 12 --min-games 5
+
+    Las partidas y sus movimientos se leen por lotes en orden de id,
+    paginando por clave, así que solo se guarda en memoria el árbol. Los
+    procesos que ya tengan cargado el libro anterior cargan el nuevo en la
+    siguiente consulta, al ver que ha cambiado el fichero.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from datamodel.book import OpeningBook
+from datamodel.engine import GameState, fast_check_winner
+from datamodel.models import Game, GameStatus, Move
+
+# Partidas leídas en cada consulta
+CHUNK_SIZE = 1000
+# Movimientos de cada partida que se guardan
+DEPTH = 16
+
+
+def finished_games(chunk_size):
+    """
+        Recorre las partidas terminadas en orden de id, chunk_size en cada
+        consulta, con sus movimientos.
+
+        Returns
+        -------
+        generator : tuplas ([(origen, destino)], ganador)
+
+        Author
+        -------
+            Eric Morales
+    """
+    last_id = 0
+    while True:
+        chunk = list(Game.objects.filter(
+            status=GameStatus.FINISHED, mouse_user__isnull=False,
+            id__gt=last_id).order_by('id').values_list(
+            'id', 'cat1', 'cat2', 'cat3', 'cat4', 'mouse', 'cat_turn',
+            'adjudicated_winner')[:chunk_size])
+        if not chunk:
+            return
+        moves = {game_id: [(origin, target) for _, origin, target in rows]
+                 for game_id, rows in groupby(
+                     Move.objects.filter(game_id__in=[
+                         row[0] for row in chunk]).order_by(
+                         'game_id', 'id').values_list(
+                         'game_id', 'origin', 'target'),
+                     key=lambda row: row[0])}
+        for game_id, cat1, cat2, cat3, cat4, mouse, cat_turn, adjudicated \
+                in chunk:
+            winner = adjudicated or fast_check_winner(
+                GameState(cat1, cat2, cat3, cat4, mouse, cat_turn))
+            if winner != 0:
+                yield moves.get(game_id, []), winner
+        last_id = chunk[-1][0]
+
+
+class Command(BaseCommand):
+    help = "Construye el libro de aperturas a partir de las partidas " \
+           "terminadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help="Fichero del libro (por defecto, "
+                                 "settings.OPENING_BOOK_FILE)")
+        parser.add_argument('--depth', type=int, default=DEPTH,
+                            help="Movimientos de cada partida que se "
+                                 "guardan")
+        parser.add_argument('--min-games', type=int, default=1,
+                            help="Descarta las variantes con menos "
+                                 "partidas")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Partidas leídas en cada consulta")
+
+    def handle(self, *args, **options):
+        if options['depth'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("La profundidad y el tamaño de lote deben ser "
+                               "positivos")
+
+        begin = time.perf_counter()
+        book = OpeningBook.build(finished_games(options['chunk_size']),
+                                 options['depth'], options['min_games'])
+        size = book.save(options['output'] or settings.OPENING_BOOK_FILE)
+        self.stdout.write("Libro con %d partidas y %d nodos (%d bytes) en "
+                          "%.2f s" % (book.games[0], len(book), size,
+                                      time.perf_counter() - begin))
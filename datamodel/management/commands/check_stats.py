@@ -0,0 +1,224 @@
+"""
+    Comando que comprueba las estadísticas de los jugadores (UserStats)
+    contra las partidas terminadas y, con --fix, corrige las diferencias.
+
+        python manage.py check_stats --workers 4
+        python manage.py check_stats --fix
+
+    Los usuarios se reparten en bloques de ids consecutivos y cada bloque
+    se comprueba por separado (en paralelo con --workers), agregando en la
+    base de datos las partidas de sus usuarios. Cada bloque se lee en una
+    transacción con una sola instantánea de la base de datos (REPEATABLE
+    READ en PostgreSQL; en SQLite y en MySQL ya lo es), así que las
+    partidas y las estadísticas guardadas coinciden en el tiempo.
+
+    Los procesos solo leen. Las correcciones las hace al final el proceso
+    principal, usuario a usuario: bloquea su fila de UserStats y vuelve a
+    calcular sus estadísticas antes de escribirlas. Así una partida que
+    termina entre la comprobación y la corrección no se pierde: o ya está
+    en el nuevo cálculo, o su incremento con F() espera a la corrección y
+    se suma después. Sirve también para rellenar la tabla con las partidas
+    anteriores a UserStats o cargadas con import_games, que no pasan por
+    Game.save.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import multiprocessing
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Count, Max, Min
+
+from datamodel.engine import GameState, fast_check_winner
+from datamodel.models import Game, GameStatus, UserStats
+
+# Usuarios por bloque
+CHUNK_SIZE = 1000
+
+
+def finished_games(first_id, last_id, role):
+    """
+        Partidas terminadas de los usuarios del bloque con el papel dado,
+        con su número de movimientos.
+
+        Returns
+        -------
+        QuerySet : tuplas (id del usuario, cat1, cat2, cat3, cat4, mouse,
+        cat_turn, ganador adjudicado, movimientos)
+
+        Author
+        -------
+            Eric Morales
+    """
+    field = 'cat_user' if role == 'cat' else 'mouse_user'
+    return Game.objects.filter(**{
+        'status': GameStatus.FINISHED, 'mouse_user__isnull': False,
+        field + '__id__range': (first_id, last_id)}).annotate(
+        n_moves=Count('moves')).order_by().values_list(
+        field + '_id', 'cat1', 'cat2', 'cat3', 'cat4', 'mouse', 'cat_turn',
+        'adjudicated_winner', 'n_moves')
+
+
+def expected_stats(first_id, last_id):
+    """
+        Estadísticas de los usuarios del bloque calculadas a partir de las
+        partidas, igual que UserStats.objects.record_game.
+
+        Returns
+        -------
+        dict : id de usuario -> dict con los campos UserStats.COUNTERS
+
+        Author
+        -------
+            Eric Morales
+    """
+    stats = {}
+    for role, winning in (('cat', 1), ('mouse', 2)):
+        for user_id, cat1, cat2, cat3, cat4, mouse, cat_turn, adjudicated, \
+                n_moves in finished_games(first_id, last_id, role):
+            winner = adjudicated or fast_check_winner(
+                GameState(cat1, cat2, cat3, cat4, mouse, cat_turn))
+            if winner == 0:
+                continue
+            user = stats.setdefault(user_id, dict.fromkeys(
+                UserStats.COUNTERS, 0))
+            user['games_as_' + role] += 1
+            user['wins_as_' + role] += int(winner == winning)
+            user['plies'] += n_moves
+    return stats
+
+
+@contextmanager
+def snapshot():
+    """
+        Transacción en la que todas las consultas ven la misma instantánea
+        de la base de datos. Dentro de otra transacción (p.ej. en los
+        tests) ya no se puede cambiar el aislamiento y se usa el de fuera.
+
+        Author
+        -------
+            Eric Morales
+    """
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL "
+                               "REPEATABLE READ READ ONLY")
+        yield
+
+
+def check_chunk(args):
+    """
+        Compara las estadísticas guardadas de un bloque de usuarios con las
+        calculadas. Se ejecuta en cada proceso de trabajo.
+
+        Parameters
+        ----------
+        args : tuple
+            (primer id, último id)
+
+        Returns
+        -------
+        list : tuplas (id de usuario, guardadas, calculadas) de los usuarios
+        que no coinciden (None si no tiene fila)
+
+        Author
+        -------
+            Eric Morales
+    """
+    first_id, last_id = args
+    empty = dict.fromkeys(UserStats.COUNTERS, 0)
+    with snapshot():
+        expected = expected_stats(first_id, last_id)
+        stored = {row['user_id']: row for row in UserStats.objects.filter(
+            user__id__range=(first_id, last_id)).values(
+            'user_id', *UserStats.COUNTERS)}
+
+        mismatches = []
+        for user_id in sorted(set(expected) | set(stored)):
+            current = stored.get(user_id)
+            if current is not None:
+                current = {key: current[key] for key in UserStats.COUNTERS}
+            wanted = expected.get(user_id, empty)
+            if current != wanted and not (current is None and
+                                          wanted == empty):
+                mismatches.append((user_id, current, wanted))
+    return mismatches
+
+
+def fix_user(user_id):
+    """
+        Corrige las estadísticas de un usuario. Con su fila bloqueada, las
+        vuelve a calcular a partir de las partidas, porque pueden haber
+        terminado partidas desde la comprobación.
+
+        Returns
+        -------
+        boolean : True si había que corregirlas
+
+        Author
+        -------
+            Eric Morales
+    """
+    with transaction.atomic():
+        UserStats.objects.get_or_create(user_id=user_id)
+        stats = UserStats.objects.select_for_update().get(user_id=user_id)
+        wanted = expected_stats(user_id, user_id).get(
+            user_id, dict.fromkeys(UserStats.COUNTERS, 0))
+        if all(getattr(stats, key) == value
+               for key, value in wanted.items()):
+            return False
+        UserStats.objects.filter(user_id=user_id).update(**wanted)
+    return True
+
+
+class Command(BaseCommand):
+    help = "Comprueba las estadísticas de los jugadores contra las " \
+           "partidas terminadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Procesos que comprueban bloques en "
+                                 "paralelo")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Usuarios por bloque")
+        parser.add_argument('--fix', action='store_true',
+                            help="Corrige las estadísticas que no coinciden")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("El tamaño de bloque debe ser positivo")
+
+        bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return
+        size = options['chunk_size']
+        tasks = [(first, min(first + size - 1, bounds['last']))
+                 for first in range(bounds['first'], bounds['last'] + 1,
+                                    size)]
+
+        n_workers = max(1, options['workers'])
+        if n_workers == 1:
+            results = [check_chunk(task) for task in tasks]
+        else:
+            # Cada proceso debe abrir su propia conexión
+            connections.close_all()
+            with multiprocessing.Pool(n_workers) as pool:
+                results = pool.map(check_chunk, tasks)
+
+        mismatches = [mismatch for result in results for mismatch in result]
+        for user_id, current, wanted in mismatches:
+            self.stdout.write("usuario %d: guardado %s, calculado %s" % (
+                user_id, current, wanted))
+        if options['fix']:
+            fixed = sum(fix_user(user_id) for user_id, _, _ in mismatches)
+            self.stdout.write("%d usuarios no coinciden (%d corregidos)" % (
+                len(mismatches), fixed))
+        else:
+            self.stdout.write("%d usuarios no coinciden" % len(mismatches))
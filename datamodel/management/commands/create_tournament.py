@@ -0,0 +1,55 @@
+"""
+    Comando que crea un torneo y empareja su primera ronda.
+
+        python manage.py create_tournament "Torneo de otoño" ana luis eva
+        python manage.py create_tournament Liga --kind round-robin ana luis
+        python manage.py create_tournament Abierto --all-users --rounds 7
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from datamodel.models import Tournament
+from datamodel.tournament import create_tournament
+
+KINDS = {'swiss': Tournament.SWISS, 'round-robin': Tournament.ROUND_ROBIN}
+
+
+class Command(BaseCommand):
+    help = "Crea un torneo suizo o de todos contra todos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Nombre del torneo")
+        parser.add_argument('usernames', nargs='*',
+                            help="Usuarios participantes")
+        parser.add_argument('--kind', choices=sorted(KINDS), default='swiss')
+        parser.add_argument('--rounds', type=int, default=None,
+                            help="Rondas del torneo suizo")
+        parser.add_argument('--all-users', action='store_true',
+                            help="Apunta a todos los usuarios activos")
+
+    def handle(self, *args, **options):
+        if options['all_users']:
+            users = list(User.objects.filter(is_active=True).order_by('id'))
+        else:
+            users = list(User.objects.filter(
+                username__in=options['usernames']).order_by('id'))
+            missing = set(options['usernames']) - {user.username
+                                                   for user in users}
+            if missing:
+                raise CommandError("No existen los usuarios: %s" % ", ".join(
+                    sorted(missing)))
+        if len(users) < 2:
+            raise CommandError("Un torneo necesita al menos dos jugadores")
+
+        tournament = create_tournament(options['name'],
+                                       KINDS[options['kind']], users,
+                                       options['rounds'])
+        self.stdout.write("Torneo %d creado: %d jugadores, %d rondas, %d "
+                          "partidas en la primera" % (
+                              tournament.id, len(users), tournament.rounds,
+                              tournament.games.count()))
@@ -0,0 +1,216 @@
+"""
+    Comando de importación masiva de partidas.
+
+        python manage.py import_games partidas.jsonl
+
+    Cada línea del fichero es un objeto JSON con el formato:
+
+        {"cat_user": "usuario1", "mouse_user": "usuario2",
+         "moves": [[0, 9], [59, 50], ...]}
+
+    Las partidas se validan enteras en memoria con las reglas del juego
+    (datamodel.engine) y se insertan con bulk_create por lotes, cada lote en
+    su propia transacción. Las partidas rechazadas se informan junto con el
+    motivo.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import sys
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from datamodel.bulk import BULK_BATCH_SIZE, build_game, bulk_create_with_ids, \
+    bulk_insert_games
+from datamodel.engine import replay
+
+# Número de partidas validadas que se insertan en cada transacción
+GAMES_PER_TRANSACTION = 5000
+
+
+class Command(BaseCommand):
+    help = "Importa partidas desde un fichero JSON lines, validándolas en " \
+           "memoria e insertándolas con bulk_create."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichero JSON lines ('-' para "
+                                         "leer de la entrada estándar)")
+        parser.add_argument('--batch-size', type=int,
+                            default=GAMES_PER_TRANSACTION,
+                            help="Partidas por transacción")
+        parser.add_argument('--insert-size', type=int,
+                            default=BULK_BATCH_SIZE,
+                            help="Filas por sentencia INSERT")
+        parser.add_argument('--create-users', action='store_true',
+                            help="Crea (sin contraseña utilizable) los "
+                                 "usuarios que no existan")
+        parser.add_argument('--rejects',
+                            help="Fichero donde escribir las líneas "
+                                 "rechazadas junto con el motivo")
+
+    def handle(self, *args, **options):
+        self.create_users = options['create_users']
+        self.insert_size = options['insert_size']
+        self.user_ids = {}
+        self.n_games = 0
+        self.n_moves = 0
+        self.n_rejected = 0
+
+        rejects = open(options['rejects'], 'w') if options['rejects'] \
+            else None
+        try:
+            stream = sys.stdin if options['path'] == '-' \
+                else open(options['path'])
+        except OSError as err:
+            raise CommandError(str(err))
+
+        start = time.time()
+        try:
+            batch = []
+            for lineno, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                batch.append((lineno, line))
+                if len(batch) >= options['batch_size']:
+                    self.import_batch(batch, rejects)
+                    batch = []
+            if batch:
+                self.import_batch(batch, rejects)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if rejects:
+                rejects.close()
+
+        elapsed = time.time() - start
+        self.stdout.write(
+            "Importadas %d partidas y %d movimientos en %.2fs "
+            "(%.0f movimientos/s). Rechazadas: %d" % (
+                self.n_games, self.n_moves, elapsed,
+                self.n_moves / elapsed if elapsed else 0, self.n_rejected))
+
+    def reject(self, rejects, lineno, line, reason):
+        """
+            Informa de una partida rechazada.
+
+            Author
+            -------
+                Eric Morales
+        """
+        self.n_rejected += 1
+        self.stderr.write("Línea %d rechazada: %s" % (lineno, reason))
+        if rejects:
+            rejects.write(json.dumps({'line': lineno, 'reason': reason,
+                                      'data': line}) + "\n")
+
+    def parse(self, line):
+        """
+            Interpreta una línea del fichero.
+
+            Returns
+            -------
+            tuple : (cat_user, mouse_user, [(origin, target)])
+
+            Raises
+            -------
+            ValueError
+                Si la línea no tiene el formato correcto
+
+            Author
+            -------
+                Eric Morales
+        """
+        data = json.loads(line)
+        if not isinstance(data, dict) or not data.get('cat_user'):
+            raise ValueError("falta el usuario gato")
+        cat_user = str(data['cat_user'])
+        mouse_user = data.get('mouse_user')
+        mouse_user = str(mouse_user) if mouse_user else None
+        moves = [(int(origin), int(target))
+                 for origin, target in data.get('moves', [])]
+
+        if mouse_user is None and moves:
+            raise ValueError("una partida sin PAC no puede tener movimientos")
+        if cat_user == mouse_user:
+            raise ValueError("un usuario no puede jugar contra sí mismo")
+        return cat_user, mouse_user, moves
+
+    def resolve_users(self, usernames):
+        """
+            Carga en self.user_ids los ids de los usuarios indicados,
+            creándolos si se ha pedido con --create-users.
+
+            Author
+            -------
+                Eric Morales
+        """
+        missing = set(usernames) - set(self.user_ids)
+        if not missing:
+            return
+
+        self.user_ids.update(User.objects.filter(username__in=missing)
+                             .values_list('username', 'id'))
+        missing -= set(self.user_ids)
+
+        if missing and self.create_users:
+            # make_password(None) genera una contraseña no utilizable sin
+            # calcular ningún hash
+            new_users = [User(username=name, password=make_password(None))
+                         for name in sorted(missing)]
+            bulk_create_with_ids(User, new_users, self.insert_size)
+            self.user_ids.update((user.username, user.id)
+                                 for user in new_users)
+
+    def import_batch(self, batch, rejects):
+        """
+            Valida en memoria e inserta un lote de partidas.
+
+            Author
+            -------
+                Eric Morales
+        """
+        parsed = []
+        for lineno, line in batch:
+            try:
+                parsed.append((lineno, line, self.parse(line)))
+            except (ValueError, TypeError) as err:
+                self.reject(rejects, lineno, line,
+                            "formato no válido: %s" % err)
+
+        self.resolve_users(name for _, _, (cat, mouse, _) in parsed
+                           for name in (cat, mouse) if name)
+
+        entries = []
+        for lineno, line, (cat_user, mouse_user, moves) in parsed:
+            unknown = [name for name in (cat_user, mouse_user)
+                       if name and name not in self.user_ids]
+            if unknown:
+                self.reject(rejects, lineno, line,
+                            "usuario desconocido: %s" % ", ".join(unknown))
+                continue
+
+            try:
+                state, winner = replay(moves)
+            except ValidationError as err:
+                self.reject(rejects, lineno, line,
+                            "movimiento %d %s: %s" % (
+                                err.ply + 1, list(moves[err.ply]),
+                                "; ".join(err.messages)))
+                continue
+
+            entries.append(build_game(
+                self.user_ids[cat_user],
+                self.user_ids[mouse_user] if mouse_user else None,
+                moves, state, winner))
+
+        n_games, n_moves = bulk_insert_games(entries, self.insert_size)
+        self.n_games += n_games
+        self.n_moves += n_moves
@@ -0,0 +1,125 @@
+"""
+    Comando que rellena el índice de posiciones (GamePosition) con los
+    movimientos ya guardados.
+
+        python manage.py index_positions
+        python manage.py index_positions --rebuild --chunk-size 500
+
+    Hace falta para las partidas anteriores al índice y para las cargadas
+    con import_games o seed_data, que no pasan por Move.save. Las partidas
+    se leen por lotes en orden de id, paginando por clave, y se reproducen
+    en memoria; cada lote se inserta en su propia transacción. Las
+    posiciones que ya estén en el índice se ignoran, así que puede volver a
+    ejecutarse sin --rebuild.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+from itertools import groupby
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from datamodel.bulk import safe_batch_size
+from datamodel.engine import GameState, apply_move
+from datamodel.models import GamePosition, Move
+from datamodel.positions import position_key
+
+# Partidas leídas en cada consulta
+CHUNK_SIZE = 1000
+
+
+def game_positions(game_id, moves):
+    """
+        Posiciones por las que pasa una partida.
+
+        Parameters
+        ----------
+        game_id : int
+            Id de la partida
+        moves : list
+            Movimientos (origen, destino) de la partida, en orden
+
+        Returns
+        -------
+        list : GamePosition sin guardar, desde la posición inicial. Si algún
+        movimiento no es válido, se indexa solo hasta él.
+
+        Author
+        -------
+            Eric Morales
+    """
+    state = GameState()
+    positions = [GamePosition(game_id=game_id, ply=0,
+                              key=position_key(state))]
+    for ply, (origin, target) in enumerate(moves, 1):
+        try:
+            apply_move(state, origin, target)
+        except ValidationError:
+            break
+        positions.append(GamePosition(game_id=game_id, ply=ply,
+                                      key=position_key(state)))
+    return positions
+
+
+def index_chunk(game_ids):
+    """
+        Indexa las posiciones de un lote de partidas.
+
+        Returns
+        -------
+        int : posiciones calculadas (incluidas las que ya estaban)
+
+        Author
+        -------
+            Eric Morales
+    """
+    rows = Move.objects.filter(game_id__in=game_ids).order_by(
+        'game_id', 'id').values_list('game_id', 'origin', 'target')
+    positions = []
+    for game_id, moves in groupby(rows, key=lambda row: row[0]):
+        positions.extend(game_positions(
+            game_id, [(origin, target) for _, origin, target in moves]))
+    with transaction.atomic():
+        GamePosition.objects.bulk_create(
+            positions, batch_size=safe_batch_size(GamePosition, positions),
+            ignore_conflicts=True)
+    return len(positions)
+
+
+class Command(BaseCommand):
+    help = "Rellena el índice de posiciones con los movimientos guardados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Partidas leídas en cada consulta")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Vacía el índice antes de rellenarlo")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("El tamaño de lote debe ser positivo")
+
+        begin = time.perf_counter()
+        if options['rebuild']:
+            GamePosition.objects.all().delete()
+
+        n_games = n_positions = 0
+        last_id = 0
+        while True:
+            # Solo las partidas con algún movimiento
+            game_ids = list(Move.objects.filter(game_id__gt=last_id).order_by(
+                'game_id').values_list('game_id', flat=True).distinct()[
+                :options['chunk_size']])
+            if not game_ids:
+                break
+            n_positions += index_chunk(game_ids)
+            n_games += len(game_ids)
+            last_id = game_ids[-1]
+
+        self.stdout.write("%d partidas y %d posiciones indexadas en %.2f s" %
+                          (n_games, n_positions, time.perf_counter() - begin))
@@ -0,0 +1,61 @@
+"""
+    Comando que caduca las partidas creadas a las que nadie se ha unido y
+    adjudica las partidas activas abandonadas (ver datamodel.reaper).
+
+        python manage.py reap_games
+        python manage.py reap_games --active-timeout 3600 --max-batches 10
+
+    Está pensado para ejecutarse periódicamente, p.ej. cada hora desde cron
+    o el planificador de Heroku. Cada lote es una transacción corta, así que
+    puede ejecutarse con la aplicación en marcha; --max-batches limita lo
+    que hace cada ejecución cuando hay muchas partidas pendientes.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from datamodel.models import GameStatus
+from datamodel.reaper import BATCH_SIZE, reap
+
+
+class Command(BaseCommand):
+    help = "Caduca y adjudica las partidas abandonadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--created-timeout', type=int,
+                            default=settings.GAME_CREATED_TIMEOUT,
+                            help="Segundos tras los que caduca una partida "
+                                 "creada")
+        parser.add_argument('--active-timeout', type=int,
+                            default=settings.GAME_ACTIVE_TIMEOUT,
+                            help="Segundos sin movimientos tras los que se "
+                                 "adjudica una partida activa")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Partidas por lote")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Lotes de cada tipo como máximo")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("El tamaño de lote debe ser positivo")
+
+        now = timezone.now()
+        for status, timeout, action in (
+                (GameStatus.CREATED, options['created_timeout'],
+                 "caducadas"),
+                (GameStatus.ACTIVE, options['active_timeout'],
+                 "adjudicadas")):
+            begin = time.perf_counter()
+            total, batches = reap(status, now - timedelta(seconds=timeout),
+                                  options['batch_size'],
+                                  options['max_batches'])
+            self.stdout.write("%d partidas %s en %d lotes (%.2f s)" % (
+                total, action, batches, time.perf_counter() - begin))
@@ -0,0 +1,59 @@
+"""
+    Comando que recalcula los mapas de calor (ver datamodel.heatmap) con
+    todas las partidas terminadas.
+
+        python manage.py rebuild_heatmaps
+        python manage.py rebuild_heatmaps --chunk-size 500000
+        python manage.py rebuild_heatmaps --no-numpy
+
+    Hace falta la primera vez, y después de cargar partidas antiguas (tras
+    index_positions). Cada bloque de posiciones se cuenta de una vez con
+    NumPy; si no está instalado el comando falla, salvo que se pida
+    expresamente contar fila a fila con --no-numpy (mucho más lento). Deja
+    el cursor en la última partida contada, así que update_heatmaps sigue
+    desde ahí.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from datamodel import heatmap
+
+
+class Command(BaseCommand):
+    help = "Recalcula los mapas de calor con todas las partidas terminadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int,
+                            default=heatmap.CHUNK_SIZE,
+                            help="Partidas y posiciones leídas en cada "
+                                 "consulta")
+        parser.add_argument('--settle', type=int,
+                            default=heatmap.SETTLE_SECONDS,
+                            help="Segundos que tiene que llevar terminada "
+                                 "una partida")
+        parser.add_argument('--no-numpy', action='store_true',
+                            help="Cuenta fila a fila, sin NumPy")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['settle'] < 0:
+            raise CommandError("El tamaño de lote debe ser positivo y la "
+                               "espera no puede ser negativa")
+        use_numpy = not options['no_numpy']
+        if use_numpy and heatmap.numpy is None:
+            raise CommandError("NumPy no está instalado (pip install -r "
+                               "requirements.txt); usa --no-numpy para "
+                               "contar fila a fila")
+
+        begin = time.perf_counter()
+        games, positions = heatmap.rebuild(options['chunk_size'],
+                                           options['settle'], use_numpy)
+        self.stdout.write("%d partidas y %d posiciones contadas%s en %.2f s"
+                          % (games, positions,
+                             " con NumPy" if use_numpy else "",
+                             time.perf_counter() - begin))
@@ -0,0 +1,128 @@
+"""
+    Comando que recalcula desde cero las puntuaciones (Rating) a partir de
+    las partidas terminadas.
+
+        python manage.py rebuild_ratings
+
+    Solo hace falta una vez, para puntuar las partidas anteriores a Rating o
+    las cargadas con import_games (que no pasan por Game.save). Como la
+    puntuación depende del orden, las partidas se aplican en el orden en que
+    terminaron (finished_at): primero las que no tienen fecha de fin, que
+    son las anteriores, por id, y después el resto. Se leen por lotes,
+    paginando por clave, así que la memoria no depende del tamaño del
+    histórico: solo se guarda la puntuación de cada jugador. Las puntuaciones nuevas se escriben en una
+    única transacción al final.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from datamodel import elo
+from datamodel.bulk import safe_batch_size
+from datamodel.engine import GameState, fast_check_winner
+from datamodel.models import Game, GameStatus, Rating
+
+# Partidas leídas en cada consulta
+CHUNK_SIZE = 2000
+
+GAME_FIELDS = ('id', 'cat_user_id', 'mouse_user_id', 'cat1', 'cat2', 'cat3',
+               'cat4', 'mouse', 'cat_turn', 'adjudicated_winner')
+
+
+def finished_games(chunk_size):
+    """
+        Recorre las partidas terminadas en el orden en que terminaron
+        (finished_at, con las que no lo tienen primero, y después id),
+        chunk_size en cada consulta. Las dos fases usan el índice
+        game_finished_idx.
+
+        Returns
+        -------
+        generator : tuplas con los campos GAME_FIELDS
+
+        Author
+        -------
+            Eric Morales
+    """
+    games = Game.objects.filter(status=GameStatus.FINISHED,
+                                mouse_user__isnull=False)
+    last_id = 0
+    while True:
+        chunk = list(games.filter(finished_at__isnull=True,
+                                  id__gt=last_id).order_by(
+            'id').values_list(*GAME_FIELDS)[:chunk_size])
+        if not chunk:
+            break
+        yield from chunk
+        last_id = chunk[-1][0]
+
+    last = None
+    while True:
+        page = games.filter(finished_at__isnull=False)
+        if last is not None:
+            page = page.filter(Q(finished_at__gt=last[0]) |
+                               Q(finished_at=last[0], id__gt=last[1]))
+        chunk = list(page.order_by('finished_at', 'id').values_list(
+            'finished_at', *GAME_FIELDS)[:chunk_size])
+        if not chunk:
+            return
+        for row in chunk:
+            yield row[1:]
+        last = chunk[-1][0], chunk[-1][1]
+
+
+def compute_ratings(games):
+    """
+        Aplica en orden los resultados de las partidas, igual que
+        Rating.objects.record_result.
+
+        Returns
+        -------
+        dict : id de usuario -> [rating, partidas, victorias]
+
+        Author
+        -------
+            Eric Morales
+    """
+    ratings = {}
+    for _, cat_id, mouse_id, cat1, cat2, cat3, cat4, mouse, cat_turn, \
+            adjudicated in games:
+        if cat_id == mouse_id:
+            continue
+        winner = adjudicated or fast_check_winner(
+            GameState(cat1, cat2, cat3, cat4, mouse, cat_turn))
+        if winner == 0:
+            continue
+        won_id, lost_id = (cat_id, mouse_id) if winner == 1 \
+            else (mouse_id, cat_id)
+        won = ratings.setdefault(won_id, [elo.INITIAL_RATING, 0, 0])
+        lost = ratings.setdefault(lost_id, [elo.INITIAL_RATING, 0, 0])
+        won[0], lost[0] = elo.new_ratings(won[0], won[1], lost[0], lost[1])
+        won[1] += 1
+        won[2] += 1
+        lost[1] += 1
+    return ratings
+
+
+class Command(BaseCommand):
+    help = "Recalcula las puntuaciones a partir de las partidas terminadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Partidas leídas en cada consulta")
+
+    def handle(self, *args, **options):
+        ratings = compute_ratings(finished_games(options['chunk_size']))
+        objs = [Rating(user_id=user_id, rating=rating, games=games,
+                       wins=wins)
+                for user_id, (rating, games, wins) in ratings.items()]
+        with transaction.atomic():
+            Rating.objects.all().delete()
+            Rating.objects.bulk_create(
+                objs, batch_size=safe_batch_size(Rating, objs))
+        self.stdout.write("%d jugadores puntuados" % len(ratings))
@@ -0,0 +1,298 @@
+"""
+    Comando que genera un conjunto de datos sintético para pruebas de
+    escala: usuarios, partidas y movimientos en todos los estados posibles.
+
+        python manage.py seed_data --users 10000 --games 1000000 --workers 4
+
+    Las partidas se juegan con bots sencillos sobre el motor de reglas en
+    memoria (datamodel.engine) y se insertan por lotes con bulk_create.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import multiprocessing
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from datamodel.bulk import BULK_BATCH_SIZE, build_game, bulk_insert_games, \
+    safe_batch_size
+from datamodel.engine import GameState, apply_move, fast_check_winner, \
+    legal_moves
+
+# Estados de partida que se pueden generar
+CREATED = 'created'
+ACTIVE_CAT = 'active_cat'
+ACTIVE_MOUSE = 'active_mouse'
+CAT_WINS = 'cat_wins'
+MOUSE_WINS = 'mouse_wins'
+KINDS = (CREATED, ACTIVE_CAT, ACTIVE_MOUSE, CAT_WINS, MOUSE_WINS)
+
+# Máximo de movimientos de una partida generada
+MAX_PLIES = 120
+# Intentos para conseguir una partida terminada con el ganador pedido
+MAX_ATTEMPTS = 50
+
+# Cerrojo compartido entre procesos. SQLite no admite escrituras
+# concurrentes, así que en ese caso solo se paraleliza la generación
+insert_lock = None
+
+
+def init_worker(lock):
+    """
+        Inicializa cada proceso de trabajo con el cerrojo compartido.
+
+        Author
+        -------
+            Eric Morales
+    """
+    global insert_lock
+    insert_lock = lock
+
+
+def insert_entries(entries):
+    """
+        Inserta un lote de partidas, serializando las escrituras entre
+        procesos si la base de datos es SQLite.
+
+        Author
+        -------
+            Eric Morales
+    """
+    if insert_lock is None or connection.vendor != 'sqlite':
+        return bulk_insert_games(entries, BULK_BATCH_SIZE)
+    with insert_lock:
+        return bulk_insert_games(entries, BULK_BATCH_SIZE)
+
+
+def mouse_mobility(state):
+    """
+        Número de movimientos que tendría el PAC en el estado dado.
+
+        Author
+        -------
+            Eric Morales
+    """
+    cat_turn = state.cat_turn
+    state.cat_turn = False
+    n_moves = len(legal_moves(state))
+    state.cat_turn = cat_turn
+    return n_moves
+
+
+def choose_move(state, rng, smart_cats, smart_mouse):
+    """
+        Elige el siguiente movimiento. Los gatos "listos" minimizan la
+        movilidad del PAC; el PAC "listo" avanza hacia la fila superior.
+
+        Returns
+        -------
+        tuple : (origin, target), o None si no hay movimientos
+
+        Author
+        -------
+            Eric Morales
+    """
+    moves = legal_moves(state)
+    if not moves:
+        return None
+
+    if state.cat_turn and smart_cats:
+        scored = []
+        for origin, target in moves:
+            after = apply_move(state.copy(), origin, target)
+            scored.append((mouse_mobility(after), rng.random(),
+                           (origin, target)))
+        return min(scored)[2]
+
+    if not state.cat_turn and smart_mouse and rng.random() < 0.8:
+        return min(moves, key=lambda move: (move[1] // 8, rng.random()))
+
+    return rng.choice(moves)
+
+
+def play_game(rng, kind):
+    """
+        Genera la secuencia de movimientos de una partida del tipo pedido.
+
+        Parameters
+        ----------
+        rng : Random
+            Generador de números aleatorios
+        kind : str
+            Uno de los valores de KINDS
+
+        Returns
+        -------
+        tuple : (movimientos, GameState final, ganador)
+
+        Author
+        -------
+            Eric Morales
+    """
+    if kind == CREATED:
+        return [], GameState(), 0
+
+    for _ in range(MAX_ATTEMPTS):
+        state = GameState()
+        moves = []
+        winner = 0
+
+        if kind in (ACTIVE_CAT, ACTIVE_MOUSE):
+            # Partida a medias: se para en un turno del jugador pedido
+            n_plies = rng.randrange(0, 40, 2)
+            if kind == ACTIVE_MOUSE:
+                n_plies += 1
+        else:
+            n_plies = MAX_PLIES
+
+        while len(moves) < n_plies and winner == 0:
+            move = choose_move(state, rng, smart_cats=kind == CAT_WINS,
+                               smart_mouse=kind == MOUSE_WINS)
+            if move is None:
+                break
+            apply_move(state, *move)
+            moves.append(move)
+            winner = fast_check_winner(state)
+
+        if kind in (ACTIVE_CAT, ACTIVE_MOUSE):
+            if winner == 0 and len(moves) == n_plies:
+                return moves, state, winner
+        elif winner == (1 if kind == CAT_WINS else 2):
+            return moves, state, winner
+
+    raise CommandError("No se ha podido generar una partida de tipo %s" %
+                       kind)
+
+
+def seed_games(args):
+    """
+        Genera e inserta un bloque de partidas. Se ejecuta en cada proceso
+        de trabajo.
+
+        Parameters
+        ----------
+        args : tuple
+            (semilla, número de partidas, pesos de KINDS, ids de usuario,
+            partidas por transacción)
+
+        Returns
+        -------
+        tuple : (partidas insertadas, movimientos insertados)
+
+        Author
+        -------
+            Eric Morales
+    """
+    seed, n_games, weights, user_ids, batch_size = args
+    rng = random.Random(seed)
+    total_games = total_moves = 0
+
+    entries = []
+    for kind in rng.choices(KINDS, weights=weights, k=n_games):
+        cat_user_id, mouse_user_id = rng.sample(user_ids, 2)
+        moves, state, winner = play_game(rng, kind)
+        entries.append(build_game(
+            cat_user_id, None if kind == CREATED else mouse_user_id,
+            moves, state, winner))
+
+        if len(entries) >= batch_size:
+            n_games, n_moves = insert_entries(entries)
+            total_games += n_games
+            total_moves += n_moves
+            entries = []
+
+    n_games, n_moves = insert_entries(entries)
+    return total_games + n_games, total_moves + n_moves
+
+
+class Command(BaseCommand):
+    help = "Genera usuarios, partidas y movimientos sintéticos para " \
+           "pruebas de escala."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help="Número de usuarios")
+        parser.add_argument('--games', type=int, default=10000,
+                            help="Número de partidas")
+        parser.add_argument('--prefix', default='seed',
+                            help="Prefijo de los nombres de usuario")
+        parser.add_argument('--password', default='seed_password',
+                            help="Contraseña común de los usuarios")
+        for kind, weight in zip(KINDS, (1, 1, 1, 1, 1)):
+            parser.add_argument('--%s' % kind.replace('_', '-'),
+                                dest=kind, type=float, default=weight,
+                                help="Peso de las partidas de tipo %s" %
+                                     kind)
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Procesos que generan partidas en paralelo")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Partidas por transacción")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Semilla para obtener datos reproducibles")
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError("Se necesitan al menos dos usuarios")
+        weights = [options[kind] for kind in KINDS]
+        if min(weights) < 0 or sum(weights) <= 0:
+            raise CommandError("La distribución de estados no es válida")
+
+        start = time.time()
+        user_ids = self.create_users(options['prefix'], options['users'],
+                                     options['password'])
+        self.stdout.write("%d usuarios listos en %.2fs" % (
+            len(user_ids), time.time() - start))
+
+        rng = random.Random(options['seed'])
+        n_workers = max(1, options['workers'])
+        chunks = [options['games'] // n_workers] * n_workers
+        chunks[0] += options['games'] % n_workers
+        tasks = [(rng.getrandbits(64), n_games, weights, user_ids,
+                  options['batch_size'])
+                 for n_games in chunks if n_games > 0]
+
+        start = time.time()
+        if n_workers == 1:
+            results = [seed_games(task) for task in tasks]
+        else:
+            # Cada proceso debe abrir su propia conexión
+            connections.close_all()
+            with multiprocessing.Pool(n_workers, initializer=init_worker,
+                                      initargs=(multiprocessing.Lock(),)) \
+                    as pool:
+                results = pool.map(seed_games, tasks)
+
+        n_games = sum(games for games, _ in results)
+        n_moves = sum(moves for _, moves in results)
+        elapsed = time.time() - start
+        self.stdout.write("%d partidas y %d movimientos insertados en %.2fs" %
+                          (n_games, n_moves, elapsed))
+
+    def create_users(self, prefix, n_users, password):
+        """
+            Crea los usuarios que falten con una única contraseña ya
+            calculada, y devuelve la lista de sus ids.
+
+            Author
+            -------
+                Eric Morales
+        """
+        # El hash se calcula una sola vez para todos los usuarios
+        hashed = make_password(password)
+        usernames = ["%s_%d" % (prefix, i) for i in range(n_users)]
+        for i in range(0, n_users, BULK_BATCH_SIZE):
+            users = [User(username=name, password=hashed)
+                     for name in usernames[i:i + BULK_BATCH_SIZE]]
+            User.objects.bulk_create(
+                users, batch_size=safe_batch_size(User, users),
+                ignore_conflicts=True)
+
+        return list(User.objects.filter(username__startswith=prefix + "_")
+                    .order_by('id').values_list('id', flat=True))
@@ -0,0 +1,45 @@
+"""
+    Comando que suma a los mapas de calor (ver datamodel.heatmap) las
+    partidas terminadas desde la última vez.
+
+        python manage.py update_heatmaps
+        python manage.py update_heatmaps --batch-size 1000 --max-batches 10
+
+    Está pensado para programarlo (p.ej. con cron cada minuto): cada lote
+    se suma en su propia transacción junto con el cursor, así que si se
+    interrumpe, la siguiente ejecución sigue donde se quedó.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from datamodel.heatmap import BATCH_SIZE, SETTLE_SECONDS, update
+
+
+class Command(BaseCommand):
+    help = "Suma a los mapas de calor las partidas terminadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Partidas por lote")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Lotes como mucho en esta ejecución")
+        parser.add_argument('--settle', type=int, default=SETTLE_SECONDS,
+                            help="Segundos que tiene que llevar terminada "
+                                 "una partida")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['settle'] < 0:
+            raise CommandError("El tamaño de lote debe ser positivo y la "
+                               "espera no puede ser negativa")
+
+        begin = time.perf_counter()
+        games, batches = update(options['batch_size'],
+                                options['max_batches'], options['settle'])
+        self.stdout.write("%d partidas sumadas en %d lotes (%.2f s)" %
+                          (games, batches, time.perf_counter() - begin))
@@ -0,0 +1,275 @@
+"""
+    Cola de partida rápida. Un jugador se apunta como gato o como PAC
+    (enqueue) y, si hay alguien esperando con el papel contrario, se le
+    empareja con el que lleva más tiempo esperando y se crea la partida ya
+    activa; si no, queda en la cola hasta que llegue un rival.
+
+    Para reclamar al rival se bloquea su petición con
+    SELECT ... FOR UPDATE SKIP LOCKED: dos emparejamientos simultáneos no
+    esperan el uno al otro, cada uno se salta las peticiones que ya está
+    reclamando el otro y toma la siguiente. SQLite no tiene bloqueos de
+    fila, así que ahí la petición se reclama con un UPDATE condicionado a
+    que siga en espera y, si otro la ha reclamado antes, se prueba con la
+    siguiente.
+
+    Unirse a una partida concreta de la lista (join_game) también se hace
+    sin bloqueos: un único UPDATE condicionado a que la partida siga sin
+    PAC decide quién entra si dos jugadores se unen a la vez.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+
+from django.db import IntegrityError, OperationalError, connection, \
+    transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from datamodel import clock
+from datamodel.models import Game, GameStatus, MatchRequest
+
+# Rivales que se intentan reclamar antes de quedarse en la cola
+MAX_CLAIM_ATTEMPTS = 5
+# Reintentos de la transacción si SQLite devuelve "database is locked"
+SQLITE_RETRIES = 3
+SQLITE_RETRY_DELAY = 0.05
+
+
+def opposite_role(role):
+    return MatchRequest.MOUSE if role == MatchRequest.CAT \
+        else MatchRequest.CAT
+
+
+def waiting_request(user):
+    """
+        Petición del usuario que sigue esperando rival (o None).
+
+        Author
+        -------
+            Eric Morales
+    """
+    return MatchRequest.objects.filter(user=user, game__isnull=True).first()
+
+
+def waiting_candidates(user, role, skip=()):
+    """
+        Peticiones en espera con las que puede emparejarse un usuario que
+        quiere jugar con el papel role, de la más antigua a la más nueva. Si
+        la base de datos lo admite, se bloquean saltando las que ya tiene
+        bloqueadas otra transacción.
+
+        Author
+        -------
+            Eric Morales
+    """
+    candidates = MatchRequest.objects.filter(
+        role=opposite_role(role), game__isnull=True).exclude(
+        user=user).exclude(id__in=skip).order_by('created', 'id')
+    if connection.features.has_select_for_update_skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+    return candidates
+
+
+def claim(candidate, game):
+    """
+        Asigna la partida a una petición si sigue en espera.
+
+        Returns
+        -------
+        bool : True si se ha reclamado, False si otro la reclamó antes
+
+        Author
+        -------
+            Eric Morales
+    """
+    return MatchRequest.objects.filter(
+        id=candidate.id, game__isnull=True).update(game=game) == 1
+
+
+def match(user, role):
+    """
+        Intenta emparejar al usuario con el rival que lleva más tiempo
+        esperando. Debe llamarse dentro de una transacción.
+
+        Returns
+        -------
+        Game : partida creada (activa), o None si no hay rival disponible
+
+        Author
+        -------
+            Eric Morales
+    """
+    tried = []
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        candidate = waiting_candidates(user, role, tried).first()
+        if candidate is None:
+            return None
+        tried.append(candidate.id)
+
+        if role == MatchRequest.CAT:
+            cat_user_id, mouse_user_id = user.id, candidate.user_id
+        else:
+            cat_user_id, mouse_user_id = candidate.user_id, user.id
+
+        savepoint = transaction.savepoint()
+        # Game.save pasa a activa la partida al tener los dos jugadores
+        game = Game.objects.create(cat_user_id=cat_user_id,
+                                   mouse_user_id=mouse_user_id)
+        if claim(candidate, game):
+            transaction.savepoint_commit(savepoint)
+            return game
+        transaction.savepoint_rollback(savepoint)
+    return None
+
+
+def enqueue(user, role):
+    """
+        Apunta al usuario en la cola de partida rápida. Si ya estaba
+        esperando con el mismo papel conserva su sitio; si esperaba con el
+        otro, se cambia.
+
+        Parameters
+        ----------
+        user : User
+            Usuario que quiere jugar
+        role : int
+            MatchRequest.CAT o MatchRequest.MOUSE
+
+        Returns
+        -------
+        tuple : (partida creada, petición en espera); uno de los dos es None
+
+        Author
+        -------
+            Eric Morales
+    """
+    for attempt in range(SQLITE_RETRIES):
+        try:
+            with transaction.atomic():
+                return _enqueue(user, role)
+        except OperationalError:
+            # Con SQLite dos escrituras simultáneas pueden fallar con
+            # "database is locked"; en el resto se propaga el error
+            if connection.vendor != 'sqlite' or \
+                    attempt == SQLITE_RETRIES - 1:
+                raise
+            time.sleep(SQLITE_RETRY_DELAY)
+
+
+def _enqueue(user, role):
+    waiting = waiting_request(user)
+    if waiting is not None:
+        if waiting.role == role:
+            return None, waiting
+        waiting.delete()
+
+    game = match(user, role)
+    if game is not None:
+        return game, None
+
+    try:
+        with transaction.atomic():
+            return None, MatchRequest.objects.create(user=user, role=role)
+    except IntegrityError:
+        # Otra petición simultánea del mismo usuario ya lo ha apuntado
+        return None, waiting_request(user)
+
+
+def cancel(user):
+    """
+        Saca al usuario de la cola.
+
+        Returns
+        -------
+        bool : True si estaba esperando
+
+        Author
+        -------
+            Eric Morales
+    """
+    deleted, _ = MatchRequest.objects.filter(
+        user=user, game__isnull=True).delete()
+    return deleted > 0
+
+
+def pop_match(user):
+    """
+        Devuelve la última partida en la que se ha emparejado al usuario
+        mientras esperaba y borra sus peticiones emparejadas, que ya no
+        hacen falta.
+
+        Returns
+        -------
+        int : id de la partida, o None si no se le ha emparejado
+
+        Author
+        -------
+            Eric Morales
+    """
+    matched = MatchRequest.objects.filter(user=user, game__isnull=False)
+    request = matched.order_by('-id').first()
+    if request is None:
+        return None
+    matched.delete()
+    return request.game_id
+
+
+def open_games(user):
+    """
+        Partidas creadas que esperan PAC, sin las del propio usuario, en
+        orden de creación.
+
+        Author
+        -------
+            Eric Morales
+    """
+    return Game.objects.filter(
+        mouse_user=None, status=GameStatus.CREATED).exclude(
+        cat_user=user).order_by('id')
+
+
+def join_game(game_id, user):
+    """
+        Une al usuario como PAC a una partida con un único UPDATE
+        condicionado a que siga esperando PAC, así que si dos jugadores se
+        unen a la vez solo uno lo consigue (el que actualiza la fila).
+        Equivale a asignar mouse_user y llamar a Game.save, que pasa la
+        partida a activa; las fichas de una partida creada ya están en la
+        posición inicial.
+
+        Returns
+        -------
+        bool : True si el usuario ha entrado en la partida
+
+        Author
+        -------
+            Eric Morales
+    """
+    return Game.objects.filter(
+        id=game_id, mouse_user=None, status=GameStatus.CREATED).update(
+        mouse_user=user, status=GameStatus.ACTIVE,
+        last_activity=timezone.now(),
+        # Si tiene reloj, empieza a contar el tiempo de los gatos
+        move_deadline=Case(When(move_time__gt=0,
+                                then=F('move_time') + clock.now()),
+                           default=None)) == 1
+
+
+def next_open_game(user, game_id):
+    """
+        Partida abierta a la que mandar a un jugador que no ha podido unirse
+        a game_id: la siguiente de la lista o, si no hay, la primera.
+
+        Returns
+        -------
+        Game : partida, o None si no hay ninguna abierta
+
+        Author
+        -------
+            Eric Morales
+    """
+    games = open_games(user).exclude(id=game_id)
+    return games.filter(id__gt=game_id).first() or games.first()
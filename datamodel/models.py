@@ -2,6 +2,13 @@
     Modelos de datos utilizados a lo largo de la aplicación de PACCAT.
         - Game
         - Move
+        - GamePosition
+        - MatchRequest
+        - Rating
+        - UserStats
+        - Tournament
+        - TournamentEntry
+        - TournamentGame
         - Counter
 
     Author
@@ -12,10 +19,14 @@
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from enum import IntEnum
 
-from datamodel import constants
+from datamodel import clock, constants, elo
+from datamodel.positions import make_key, position_key, position_ply
+from datamodel.timing import timed
 
 # Posiciones iniciales.
 CAT1POS = 0
@@ -23,6 +34,7 @@ CAT2POS = 2
 CAT3POS = 4
 CAT4POS = 6
 MOUSEPOS = 59
+INITIAL_KEY = make_key((CAT1POS, CAT2POS, CAT3POS, CAT4POS), MOUSEPOS, True)
 
 
 def validate_position(value):
@@ -61,6 +73,7 @@ def validate_position(value):
             raise ValidationError(constants.MSG_ERROR_INVALID_CELL)
 
 
+@timed('valid_move')
 def valid_move(game, origin, target):
     """
         Función que comprueba si un movimiento es valido, teniendo en
@@ -124,6 +137,7 @@ def valid_move(game, origin, target):
     return True
 
 
+@timed('check_winner')
 def check_winner(game):
     """
         Funcion que comprueba si hay ganador.
@@ -147,6 +161,10 @@ def check_winner(game):
     """
 
     if game is not None:
+        # Las partidas abandonadas se adjudican sin mirar el tablero
+        if game.adjudicated_winner:
+            return game.adjudicated_winner
+
         # Compruebo si PAC ha llegado al otro extremo
         if game.mouse in [0, 2, 4, 6]:
             return 2
@@ -226,11 +244,29 @@ class Game(models.Model):
         mouse : IntegerField
         cat_turn : BooleanField
         status : IntegerField
+        last_activity : DateTimeField
+            Último guardado de la partida (creación, movimiento o entrada
+            del PAC). Con ella encuentra reap_games las partidas abandonadas.
+        adjudicated_winner : IntegerField
+            Ganador asignado a una partida abandonada o con el tiempo
+            agotado (0 si se ha decidido en el tablero)
+        move_time : IntegerField
+            Segundos por movimiento (0 sin reloj, ver datamodel.clock)
+        move_deadline : BigIntegerField
+            Instante (segundos desde epoch) en el que se agota el tiempo del
+            jugador que tiene el turno, o None si no hay reloj en marcha
+        finished_at : DateTimeField
+            Momento en el que terminó la partida. No cambia aunque se vuelva
+            a guardar; es None en las partidas sin terminar y en las cargadas
+            sin pasar por save (import_games, seed_data)
 
         Methods
         -------
         save(self, *args, **kwargs)
             Almacena el juego en la base de datos.
+        adjudicate(self)
+            Termina la partida dando la victoria al jugador que no tiene el
+            turno.
         __str__(self)
             Devuelve una cadena con toda la información necesaria de un objeto
             de esta clase.
@@ -257,6 +293,12 @@ class Game(models.Model):
     cat_turn = models.BooleanField(default=True, blank=False, null=False)
 
     status = models.IntegerField(default=0, validators=[valid_game_status])
+    last_activity = models.DateTimeField(auto_now=True)
+    adjudicated_winner = models.IntegerField(default=0)
+    move_time = models.IntegerField(
+        default=0, choices=[(value, value) for value in clock.MOVE_TIMES])
+    move_deadline = models.BigIntegerField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
         """
@@ -280,7 +322,11 @@ class Game(models.Model):
         """
 
         # Antes de guardar, comprobamos si la partida ya ha terminado
-        if check_winner(self) != 0:
+        winner = check_winner(self)
+        # Solo se puntúa la partida al pasar a terminada con un ganador
+        finishing = winner != 0 and self.status != GameStatus.FINISHED \
+            and self.mouse_user_id is not None
+        if winner != 0:
             self.status = GameStatus.FINISHED
         validate_position(self.cat1)
         validate_position(self.cat2)
@@ -297,10 +343,64 @@ class Game(models.Model):
             self.cat_turn = True
 
         # Cuando nos metan al mouse, pasamos a estado activo
-        if self.mouse_user and self.status == GameStatus.CREATED:
+        if self.mouse_user_id and self.status == GameStatus.CREATED:
             self.status = GameStatus.ACTIVE
 
-        super(Game, self).save(*args, **kwargs)
+        # En cada guardado de una partida activa con reloj (al empezar y
+        # tras cada movimiento) empieza a contar el tiempo del turno
+        if self.status == GameStatus.ACTIVE:
+            self.move_deadline = clock.deadline(self.move_time)
+        else:
+            self.move_deadline = None
+
+        if self.status == GameStatus.FINISHED and self.finished_at is None:
+            self.finished_at = timezone.now()
+
+        if not finishing:
+            super(Game, self).save(*args, **kwargs)
+            return
+
+        # La puntuación y las estadísticas de los jugadores se actualizan en
+        # la misma transacción que termina la partida
+        with transaction.atomic():
+            # Solo termina la partida la copia que la encuentra sin terminar
+            # en la base de datos: si dos copias desfasadas la terminan a la
+            # vez (p.ej. un movimiento y el barrido de relojes), el UPDATE
+            # de la segunda espera a la primera y ya no la encuentra, así
+            # que el resultado no se puntúa dos veces
+            if self.pk is not None and not Game.objects.filter(
+                    pk=self.pk).exclude(status=GameStatus.FINISHED).update(
+                    status=GameStatus.FINISHED):
+                raise ValidationError(constants.MSG_ERROR_GAMESTATUS)
+            super(Game, self).save(*args, **kwargs)
+            Rating.objects.record_result(self.cat_user_id,
+                                         self.mouse_user_id, winner)
+            UserStats.objects.record_game(self.cat_user_id,
+                                          self.mouse_user_id, winner,
+                                          self.moves.count())
+            # datamodel.tournament importa este módulo, así que se importa
+            # aquí para evitar la dependencia circular
+            from datamodel import tournament
+            tournament.game_finished(self, winner)
+
+    def adjudicate(self):
+        """
+            Termina la partida dando la victoria al jugador que no tiene el
+            turno, porque ha abandonado o se le ha acabado el tiempo. Como
+            pasa por save, cuenta para la puntuación, las estadísticas y los
+            torneos.
+
+            Raises
+            -------
+            ValidationError
+                Si otra petición ya ha terminado la partida
+
+            Author
+            -------
+                Eric Morales
+        """
+        self.adjudicated_winner = 2 if self.cat_turn else 1
+        self.save()
 
     def __str__(self):
         """
@@ -344,6 +444,12 @@ class Game(models.Model):
 
     class Meta:
         ordering = ['id']
+        indexes = [models.Index(fields=['status', 'last_activity'],
+                                name='game_activity_idx'),
+                   models.Index(fields=['move_deadline'],
+                                name='game_deadline_idx'),
+                   models.Index(fields=['finished_at', 'id'],
+                                name='game_finished_idx')]
 
 
 class Move(models.Model):
@@ -426,9 +532,13 @@ class Move(models.Model):
                 or self.game.status == GameStatus.FINISHED:
             raise ValidationError(constants.MSG_ERROR_MOVE)
 
+        if clock.expired(self.game):
+            raise ValidationError(constants.MSG_ERROR_TIMEOUT)
+
         valid_move(self.game, self.origin, self.target)
 
-        if self.player == self.game.cat_user:
+        # Comparamos los ids para no cargar los usuarios de la base de datos
+        if self.player_id == self.game.cat_user_id:
 
             if self.game.cat_turn:
                 if self.game.cat1 == self.origin:
@@ -450,7 +560,7 @@ class Move(models.Model):
                     raise ValidationError(constants.MSG_ERROR_MOVE)
             else:
                 raise ValidationError(constants.MSG_ERROR_MOVE)
-        elif self.player == self.game.mouse_user:
+        elif self.player_id == self.game.mouse_user_id:
             if not self.game.cat_turn:
                 if self.game.mouse == self.origin:
                     self.game.mouse = self.target
@@ -462,11 +572,465 @@ class Move(models.Model):
         else:
             raise ValidationError(constants.MSG_ERROR_MOVE)
 
-        super(Move, self).save(*args, **kwargs)
-        self.game.save()
+        # Si la partida ya la ha terminado otra petición, Game.save falla y
+        # el movimiento no se guarda
+        with transaction.atomic():
+            super(Move, self).save(*args, **kwargs)
+            self.game.save()
+
+            # Índice de posiciones: la alcanzada con el movimiento y, con el
+            # primero de la partida, también la inicial
+            ply = position_ply(self.game)
+            positions = [GamePosition(game=self.game, ply=ply,
+                                      key=position_key(self.game))]
+            if ply == 1:
+                positions.append(GamePosition(game=self.game, ply=0,
+                                              key=INITIAL_KEY))
+            GamePosition.objects.bulk_create(positions, ignore_conflicts=True)
+
+    class Meta:
+        ordering = ['id']
+
+
+class GamePosition(models.Model):
+    """
+        Modelo del índice de posiciones: cada posición por la que ha pasado
+        una partida, con su clave compacta (ver datamodel.positions). Lo
+        rellenan Move.save y, para las partidas cargadas sin pasar por él,
+        el comando index_positions.
+
+        Attributes
+        ----------
+        game : ForeignKey
+        ply : SmallIntegerField
+            Movimientos desde la posición inicial
+        key : IntegerField
+            Clave de la posición (position_key)
+    """
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE,
+                             related_name='positions')
+    ply = models.SmallIntegerField()
+    key = models.IntegerField()
+
+    class Meta:
+        # Las partidas de una posición se paginan por id de partida
+        indexes = [models.Index(fields=['key', 'game'],
+                                name='position_key_idx')]
+        constraints = [models.UniqueConstraint(
+            fields=['game', 'ply'], name='position_game_ply_unique')]
+
+
+class MatchRequest(models.Model):
+    """
+        Modelo que almacena la petición de un jugador en la cola de partida
+        rápida (ver datamodel.matchmaking). Mientras espera rival, game es
+        None; al emparejarse apunta a la partida creada.
+
+        Attributes
+        ----------
+        user : ForeignKey
+        role : IntegerField
+            Papel con el que quiere jugar (CAT o MOUSE)
+        game : ForeignKey
+        created : DateTimeField
+    """
+
+    CAT = 1
+    MOUSE = 2
+    ROLES = ((CAT, 'Cat'), (MOUSE, 'Mouse'))
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='match_requests')
+    role = models.IntegerField(choices=ROLES)
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, null=True,
+                             blank=True, related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return "%s (%s) -> %s" % (self.user, self.get_role_display(),
+                                  self.game_id or "waiting")
+
+    class Meta:
+        ordering = ['id']
+        # Solo se indexan las peticiones en espera, que son las que
+        # consulta el emparejador, en orden de llegada
+        indexes = [models.Index(fields=['role', 'created', 'id'],
+                                condition=models.Q(game__isnull=True),
+                                name='match_waiting_idx')]
+        constraints = [models.UniqueConstraint(
+            fields=['user'], condition=models.Q(game__isnull=True),
+            name='match_one_waiting_per_user')]
+
+
+class RatingManager(models.Manager):
+    """
+        Manager de los objetos de tipo Rating (Rating.objects).
+
+        Methods
+        -------
+        record_result(self, cat_user_id, mouse_user_id, winner)
+            Actualiza la puntuación de los dos jugadores de una partida
+            terminada.
+        top(self, limit, after=None)
+            Página de la clasificación.
+    """
+
+    def record_result(self, cat_user_id, mouse_user_id, winner):
+        """
+            Actualiza la puntuación de los dos jugadores de una partida
+            terminada a partir de su puntuación actual, sin recorrer el
+            histórico. Las filas se bloquean (en orden de usuario, para
+            evitar interbloqueos) hasta el final de la transacción.
+
+            Parameters
+            ----------
+            cat_user_id : int
+                Id del usuario gato
+            mouse_user_id : int
+                Id del usuario PAC
+            winner : int
+                Ganador según check_winner (1 gatos, 2 PAC)
+
+            Author
+            -------
+                Eric Morales
+        """
+        if cat_user_id == mouse_user_id:
+            return
+
+        user_ids = sorted((cat_user_id, mouse_user_id))
+        with transaction.atomic():
+            for user_id in user_ids:
+                self.get_or_create(user_id=user_id)
+            ratings = {rating.user_id: rating for rating in
+                       self.select_for_update().filter(
+                           user_id__in=user_ids).order_by('user_id')}
+
+            if winner == 1:
+                won, lost = ratings[cat_user_id], ratings[mouse_user_id]
+            else:
+                won, lost = ratings[mouse_user_id], ratings[cat_user_id]
+            won.rating, lost.rating = elo.new_ratings(
+                won.rating, won.games, lost.rating, lost.games)
+            won.games += 1
+            won.wins += 1
+            lost.games += 1
+            won.save()
+            lost.save()
+
+    def top(self, limit, after=None):
+        """
+            Página de la clasificación, de mayor a menor puntuación. Se
+            pagina por clave (la última fila de la página anterior) en lugar
+            de con OFFSET, así que cualquier página cuesta lo mismo: una
+            lectura del índice rating_rank_idx a partir de esa fila.
+
+            Parameters
+            ----------
+            limit : int
+                Número de filas
+            after : tuple
+                (rating, id) de la última fila de la página anterior, o None
+                para la primera
+
+            Returns
+            -------
+            QuerySet : puntuaciones (con su usuario)
+
+            Author
+            -------
+                Eric Morales
+        """
+        ratings = self.select_related('user').order_by('-rating', '-id')
+        if after is not None:
+            rating, rating_id = after
+            ratings = ratings.filter(
+                models.Q(rating__lt=rating) |
+                models.Q(rating=rating, id__lt=rating_id))
+        return ratings[:limit]
+
+
+class Rating(models.Model):
+    """
+        Modelo que almacena la puntuación Elo de un jugador (ver
+        datamodel.elo). Se actualiza al terminar cada partida.
+
+        Attributes
+        ----------
+        user : OneToOneField
+        rating : FloatField
+        games : IntegerField
+            Partidas puntuadas
+        wins : IntegerField
+            Partidas ganadas
+        objects : RatingManager()
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                related_name='rating')
+    rating = models.FloatField(default=elo.INITIAL_RATING)
+    games = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+
+    objects = RatingManager()
+
+    def __str__(self):
+        return "%s: %.0f (%d)" % (self.user, self.rating, self.games)
+
+    class Meta:
+        ordering = ['-rating', '-id']
+        indexes = [models.Index(fields=['rating', 'id'],
+                                name='rating_rank_idx')]
+
+
+class UserStatsManager(models.Manager):
+    """
+        Manager de los objetos de tipo UserStats (UserStats.objects).
+
+        Methods
+        -------
+        record_game(self, cat_user_id, mouse_user_id, winner, plies)
+            Suma una partida terminada a las estadísticas de sus jugadores.
+    """
+
+    def record_game(self, cat_user_id, mouse_user_id, winner, plies):
+        """
+            Suma una partida terminada a las estadísticas de sus jugadores.
+            Los incrementos se hacen con expresiones F() en el propio
+            UPDATE, así que dos partidas que terminan a la vez no se pisan.
+
+            Parameters
+            ----------
+            cat_user_id : int
+                Id del usuario gato
+            mouse_user_id : int
+                Id del usuario PAC
+            winner : int
+                Ganador según check_winner (1 gatos, 2 PAC)
+            plies : int
+                Movimientos de la partida
+
+            Author
+            -------
+                Eric Morales
+        """
+        for user_id in sorted({cat_user_id, mouse_user_id}):
+            self.get_or_create(user_id=user_id)
+        self.filter(user_id=cat_user_id).update(
+            games_as_cat=F('games_as_cat') + 1,
+            wins_as_cat=F('wins_as_cat') + int(winner == 1),
+            plies=F('plies') + plies)
+        self.filter(user_id=mouse_user_id).update(
+            games_as_mouse=F('games_as_mouse') + 1,
+            wins_as_mouse=F('wins_as_mouse') + int(winner == 2),
+            plies=F('plies') + plies)
+
+
+class UserStats(models.Model):
+    """
+        Modelo que almacena los totales de las partidas terminadas de un
+        jugador, para mostrarlos sin recorrer Game y Move. Se actualiza al
+        terminar cada partida; el comando check_stats los compara con las
+        partidas.
+
+        Attributes
+        ----------
+        user : OneToOneField
+        games_as_cat : IntegerField
+        games_as_mouse : IntegerField
+        wins_as_cat : IntegerField
+        wins_as_mouse : IntegerField
+        plies : IntegerField
+            Movimientos sumando todas sus partidas terminadas
+        objects : UserStatsManager()
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                related_name='stats')
+    games_as_cat = models.IntegerField(default=0)
+    games_as_mouse = models.IntegerField(default=0)
+    wins_as_cat = models.IntegerField(default=0)
+    wins_as_mouse = models.IntegerField(default=0)
+    plies = models.IntegerField(default=0)
+
+    objects = UserStatsManager()
+
+    # Campos que se comparan con los datos de origen
+    COUNTERS = ('games_as_cat', 'games_as_mouse', 'wins_as_cat',
+                'wins_as_mouse', 'plies')
+
+    @property
+    def games(self):
+        return self.games_as_cat + self.games_as_mouse
+
+    @property
+    def wins(self):
+        return self.wins_as_cat + self.wins_as_mouse
+
+    @property
+    def losses(self):
+        return self.games - self.wins
+
+    @property
+    def losses_as_cat(self):
+        return self.games_as_cat - self.wins_as_cat
+
+    @property
+    def losses_as_mouse(self):
+        return self.games_as_mouse - self.wins_as_mouse
+
+    @property
+    def average_length(self):
+        return self.plies / self.games if self.games else 0.0
+
+    def as_dict(self):
+        return {'games': self.games, 'wins': self.wins,
+                'losses': self.losses,
+                'games_as_cat': self.games_as_cat,
+                'games_as_mouse': self.games_as_mouse,
+                'wins_as_cat': self.wins_as_cat,
+                'wins_as_mouse': self.wins_as_mouse,
+                'average_length': round(self.average_length, 2)}
+
+    def __str__(self):
+        return "%s: %d/%d" % (self.user, self.wins, self.games)
+
+    class Meta:
+        ordering = ['id']
+
+
+class Tournament(models.Model):
+    """
+        Modelo que almacena un torneo (ver datamodel.tournament).
+
+        Attributes
+        ----------
+        name : CharField
+        kind : IntegerField
+            Sistema de emparejamiento (SWISS o ROUND_ROBIN)
+        rounds : IntegerField
+            Número de rondas
+        current_round : IntegerField
+            Ronda en juego (0 si no ha empezado)
+        status : IntegerField
+            Estado del torneo (GameStatus)
+        created : DateTimeField
+    """
+
+    SWISS = 1
+    ROUND_ROBIN = 2
+    KINDS = ((SWISS, 'Swiss'), (ROUND_ROBIN, 'Round robin'))
+
+    name = models.CharField(max_length=100)
+    kind = models.IntegerField(choices=KINDS)
+    rounds = models.IntegerField(default=0)
+    current_round = models.IntegerField(default=0)
+    status = models.IntegerField(default=GameStatus.CREATED,
+                                 validators=[valid_game_status])
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return "%s (%s, ronda %d/%d)" % (self.name, self.get_kind_display(),
+                                         self.current_round, self.rounds)
+
+    class Meta:
+        ordering = ['id']
+
+
+class TournamentEntry(models.Model):
+    """
+        Modelo que almacena la participación de un jugador en un torneo. La
+        puntuación se suma al terminar cada una de sus partidas, así que la
+        clasificación no necesita recorrer las partidas.
+
+        Attributes
+        ----------
+        tournament : ForeignKey
+        user : ForeignKey
+        score : IntegerField
+            Victorias más rondas libres
+        games_as_cat : IntegerField
+        games_as_mouse : IntegerField
+        byes : IntegerField
+            Rondas en las que no ha tenido rival
+    """
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE,
+                                   related_name='entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='tournament_entries')
+    score = models.IntegerField(default=0)
+    games_as_cat = models.IntegerField(default=0)
+    games_as_mouse = models.IntegerField(default=0)
+    byes = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "%s: %s (%d)" % (self.tournament.name, self.user, self.score)
+
+    class Meta:
+        ordering = ['-score', 'id']
+        unique_together = (('tournament', 'user'),)
+        indexes = [models.Index(fields=['tournament', 'score'],
+                                name='tournament_standing_idx')]
+
+
+class TournamentGame(models.Model):
+    """
+        Modelo que relaciona una partida con la ronda del torneo en la que
+        se juega.
+
+        Attributes
+        ----------
+        tournament : ForeignKey
+        round : IntegerField
+        game : OneToOneField
+    """
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE,
+                                   related_name='games')
+    round = models.IntegerField()
+    game = models.OneToOneField(Game, on_delete=models.CASCADE,
+                                related_name='tournament_game')
 
     class Meta:
         ordering = ['id']
+        indexes = [models.Index(fields=['tournament', 'round'],
+                                name='tournament_round_idx')]
+
+
+class Heatmap(models.Model):
+    """
+        Modelo que almacena un mapa de calor: cuántas veces ha estado cada
+        casilla ocupada por una pieza en las posiciones de las partidas con
+        un resultado, dentro de un tramo de movimientos. Lo mantiene
+        datamodel.heatmap por lotes, sin recorrer los movimientos.
+
+        Attributes
+        ----------
+        piece : IntegerField
+            Pieza contada (CAT o MOUSE)
+        outcome : IntegerField
+            Ganador de las partidas (1 gatos, 2 PAC)
+        bucket : IntegerField
+            Tramo de movimientos (ver heatmap.BUCKET_PLIES)
+        counts : BinaryField
+            64 contadores de 64 bits en little endian, uno por casilla
+    """
+
+    CAT = 1
+    MOUSE = 2
+    PIECES = ((CAT, 'Gato'), (MOUSE, 'PAC'))
+
+    piece = models.IntegerField(choices=PIECES)
+    outcome = models.IntegerField()
+    bucket = models.IntegerField()
+    counts = models.BinaryField()
+
+    class Meta:
+        ordering = ['piece', 'outcome', 'bucket']
+        constraints = [models.UniqueConstraint(
+            fields=['piece', 'outcome', 'bucket'], name='heatmap_unique')]
 
 
 class SingletonModel(models.Model):
@@ -677,3 +1241,23 @@ class Counter(SingletonModel):
         """
 
         raise ValidationError(constants.MSG_ERROR_NEW_COUNTER)
+
+
+class HeatmapCursor(SingletonModel):
+    """
+        Modelo que almacena hasta qué partida terminada se han sumado los
+        mapas de calor, en el orden (finished_at, id) en el que las recorre
+        datamodel.heatmap. Su fila también sirve de cerrojo para que no se
+        mezclen dos actualizaciones ni una actualización y una
+        reconstrucción.
+
+        Attributes
+        ----------
+        finished_at : DateTimeField
+            Fin de la última partida sumada
+        game_id : IntegerField
+            Id de la última partida sumada
+    """
+
+    finished_at = models.DateTimeField(null=True)
+    game_id = models.IntegerField(default=0)
@@ -0,0 +1,77 @@
+"""
+    Clave compacta de una posición del tablero, para el índice de
+    posiciones (GamePosition).
+
+    Los gatos son intercambiables, así que se guardan como conjunto: sus
+    cuatro casillas ordenadas, 6 bits cada una. Detrás van el PAC (6 bits) y
+    el turno (1 bit). En total 31 bits, que caben en un entero de la base de
+    datos:
+
+        bits 0-23   casillas de los gatos, de menor a mayor
+        bits 24-29  casilla del PAC
+        bit 30      1 si mueven los gatos
+
+    Author
+    -------
+        Eric Morales
+"""
+
+
+def position_key(state):
+    """
+        Clave de la posición de una partida.
+
+        Parameters
+        ----------
+        state : Game
+            Partida o cualquier objeto con sus atributos (p.ej. GameState)
+
+        Returns
+        -------
+        int : clave de la posición
+
+        Author
+        -------
+            Eric Morales
+    """
+    return make_key((state.cat1, state.cat2, state.cat3, state.cat4),
+                    state.mouse, state.cat_turn)
+
+
+def make_key(cats, mouse, cat_turn):
+    key = 0
+    for shift, cat in enumerate(sorted(cats)):
+        key |= cat << (6 * shift)
+    return key | mouse << 24 | int(bool(cat_turn)) << 30
+
+
+def split_key(key):
+    """
+        Posición a partir de su clave.
+
+        Returns
+        -------
+        tuple : (casillas de los gatos ordenadas, casilla del PAC, True si
+        mueven los gatos)
+
+        Author
+        -------
+            Eric Morales
+    """
+    cats = [(key >> (6 * shift)) & 63 for shift in range(4)]
+    return cats, (key >> 24) & 63, bool(key >> 30)
+
+
+def position_ply(state):
+    """
+        Número de movimientos con los que se llega a la posición desde la
+        inicial. Los gatos empiezan en la primera fila y cada movimiento
+        suyo baja uno de ellos una fila, así que basta con sumar sus filas.
+
+        Author
+        -------
+            Eric Morales
+    """
+    cat_moves = sum(cat // 8 for cat in (state.cat1, state.cat2, state.cat3,
+                                         state.cat4))
+    return 2 * cat_moves if state.cat_turn else 2 * cat_moves - 1
@@ -0,0 +1,181 @@
+"""
+    Limpieza de partidas abandonadas (ver el comando reap_games).
+
+    - Las partidas creadas a las que nadie se ha unido en
+      settings.GAME_CREATED_TIMEOUT segundos caducan y se borran, para que
+      no llenen la lista de partidas a las que unirse.
+    - Las partidas activas sin movimientos en settings.GAME_ACTIVE_TIMEOUT
+      segundos se adjudican: gana el jugador que estaba esperando a que su
+      rival moviese. Se terminan con Game.save, así que cuentan para la
+      puntuación, las estadísticas y los torneos como cualquier otra.
+
+    Las partidas se buscan por el índice (status, last_activity) y se
+    procesan por lotes, cada uno en su propia transacción corta. Dentro de
+    la transacción se vuelven a comprobar las condiciones, por si alguien
+    ha movido o se ha unido a la partida entre la búsqueda y el borrado.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.db import transaction
+
+from datamodel import clock
+from datamodel.models import Game, GameStatus
+
+# Partidas por lote (y por transacción)
+BATCH_SIZE = 500
+
+
+def stale_game_ids(status, before, limit):
+    """
+        Ids de las partidas con el estado dado sin actividad desde before,
+        de la más antigua a la más reciente.
+
+        Returns
+        -------
+        list : como mucho limit ids
+
+        Author
+        -------
+            Eric Morales
+    """
+    return list(Game.objects.filter(
+        status=status, last_activity__lt=before).order_by(
+        'last_activity', 'id').values_list('id', flat=True)[:limit])
+
+
+def expire_created(game_ids, before):
+    """
+        Borra las partidas del lote que sigan creadas y sin actividad.
+
+        Returns
+        -------
+        int : partidas borradas
+
+        Author
+        -------
+            Eric Morales
+    """
+    with transaction.atomic():
+        _, deleted = Game.objects.filter(
+            id__in=game_ids, status=GameStatus.CREATED,
+            mouse_user__isnull=True, last_activity__lt=before).delete()
+    return deleted.get(Game._meta.label, 0)
+
+
+def adjudicate_active(game_ids, before):
+    """
+        Termina las partidas del lote que sigan activas y sin actividad,
+        dando la victoria al jugador que no tenía el turno.
+
+        Returns
+        -------
+        int : partidas adjudicadas
+
+        Author
+        -------
+            Eric Morales
+    """
+    with transaction.atomic():
+        games = list(Game.objects.select_for_update().filter(
+            id__in=game_ids, status=GameStatus.ACTIVE,
+            last_activity__lt=before))
+        for game in games:
+            game.adjudicate()
+    return len(games)
+
+
+def reap(status, before, batch_size=BATCH_SIZE, max_batches=None):
+    """
+        Procesa por lotes las partidas abandonadas con el estado dado.
+
+        Parameters
+        ----------
+        status : int
+            GameStatus.CREATED (se borran) o GameStatus.ACTIVE (se
+            adjudican)
+        before : datetime
+            Se procesan las partidas sin actividad desde esta fecha
+        batch_size : int
+            Partidas por lote
+        max_batches : int
+            Número máximo de lotes (None para procesarlas todas)
+
+        Returns
+        -------
+        tuple : (partidas procesadas, lotes)
+
+        Author
+        -------
+            Eric Morales
+    """
+    process = expire_created if status == GameStatus.CREATED \
+        else adjudicate_active
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        game_ids = stale_game_ids(status, before, batch_size)
+        if not game_ids:
+            break
+        processed = process(game_ids, before)
+        total += processed
+        batches += 1
+        # Si ninguna cumplía ya las condiciones, la búsqueda devolvería las
+        # mismas partidas otra vez
+        if processed == 0:
+            break
+    return total, batches
+
+
+def time_out(game_ids, current):
+    """
+        Adjudica las partidas del lote que sigan activas con el plazo del
+        movimiento vencido.
+
+        Returns
+        -------
+        list : ids de las partidas adjudicadas
+
+        Author
+        -------
+            Eric Morales
+    """
+    with transaction.atomic():
+        games = list(Game.objects.select_for_update().filter(
+            id__in=game_ids, status=GameStatus.ACTIVE,
+            move_deadline__lte=current))
+        for game in games:
+            game.adjudicate()
+    return [game.id for game in games]
+
+
+def reap_timeouts(batch_size=BATCH_SIZE, max_batches=None):
+    """
+        Barrido de los relojes: busca por el índice de move_deadline las
+        partidas con el plazo vencido y las adjudica por lotes.
+
+        Returns
+        -------
+        tuple : (ids de las partidas adjudicadas, lotes)
+
+        Author
+        -------
+            Eric Morales
+    """
+    current = clock.now()
+    timed_out = []
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        game_ids = list(Game.objects.filter(
+            move_deadline__lte=current).order_by(
+            'move_deadline', 'id').values_list('id', flat=True)[:batch_size])
+        if not game_ids:
+            break
+        processed = time_out(game_ids, current)
+        timed_out.extend(processed)
+        batches += 1
+        if not processed:
+            break
+    return timed_out, batches
@@ -0,0 +1,22 @@
+"""
+    Partidas de ejemplo, ya validadas, que comparten los tests y los
+    benchmarks (logic.benchmarks).
+
+    Author
+    -------
+        Eric Morales
+"""
+
+# Secuencia en la que los gatos encierran al PAC
+CAT_WIN_MOVES = [
+    (0, 9), (59, 50), (9, 16), (50, 57), (16, 25), (57, 48), (25, 32),
+    (48, 57), (32, 41), (57, 48), (2, 11), (48, 57), (11, 18), (57, 48),
+    (18, 27), (48, 57), (27, 34), (57, 48), (34, 43), (48, 57), (43, 50),
+    (57, 48), (50, 57),
+]
+
+# Secuencia en la que el PAC llega al otro extremo
+MOUSE_WIN_MOVES = [
+    (0, 9), (59, 50), (2, 11), (50, 43), (4, 13), (43, 34), (6, 15),
+    (34, 27), (9, 16), (27, 18), (11, 20), (18, 9), (20, 27), (9, 2),
+]
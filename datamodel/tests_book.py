@@ -0,0 +1,129 @@
+"""
+    Tests del libro de aperturas.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from . import book, tests
+from .bulk import build_game, bulk_insert_games
+from .engine import replay
+from .sample_games import CAT_WIN_MOVES, MOUSE_WIN_MOVES
+
+
+class OpeningBookTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'book.bin')
+        self.addCleanup(book.reset_book)
+
+    def games(self):
+        return [(CAT_WIN_MOVES, 1), (CAT_WIN_MOVES, 1), (MOUSE_WIN_MOVES, 2)]
+
+    def test1(self):
+        """ Cada nodo cuenta las partidas y victorias que pasan por él """
+        opening = book.OpeningBook.build(self.games(), max_depth=40)
+        root = opening.node_data(0)
+        self.assertEqual((root['games'], root['cat_wins']), (3, 2))
+
+        first = CAT_WIN_MOVES[0]
+        node = opening.find([first])
+        self.assertEqual(opening.node_data(node)['games'],
+                         2 + (MOUSE_WIN_MOVES[0] == first))
+        # Los hijos van del más al menos jugado
+        counts = [move['games'] for move in root['moves']]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+        node = opening.find(CAT_WIN_MOVES)
+        self.assertEqual(opening.node_data(node),
+                         {'games': 2, 'cat_wins': 2, 'moves': []})
+        self.assertIsNone(opening.find([(0, 1)]))
+        self.assertIsNone(book.OpeningBook().find([]))
+
+    def test2(self):
+        """ Profundidad máxima y poda de las variantes poco jugadas """
+        opening = book.OpeningBook.build(self.games(), max_depth=3)
+        self.assertIsNotNone(opening.find(CAT_WIN_MOVES[:3]))
+        self.assertIsNone(opening.find(CAT_WIN_MOVES[:4]))
+
+        opening = book.OpeningBook.build(self.games(), max_depth=40,
+                                         min_games=2)
+        self.assertIsNotNone(opening.find(CAT_WIN_MOVES))
+        divergence = next(ply for ply, (cat, mouse) in enumerate(
+            zip(CAT_WIN_MOVES, MOUSE_WIN_MOVES)) if cat != mouse)
+        self.assertIsNone(opening.find(MOUSE_WIN_MOVES[:divergence + 1]))
+
+    def test3(self):
+        """ El fichero guarda el mismo libro """
+        opening = book.OpeningBook.build(self.games(), max_depth=40)
+        size = opening.save(self.path)
+        self.assertEqual(size, book.HEADER.size + 16 * len(opening))
+        loaded = book.OpeningBook.load(self.path)
+        for name, _ in book.FIELDS:
+            self.assertEqual(getattr(loaded, name), getattr(opening, name))
+
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 32)
+        with self.assertRaises(ValueError):
+            book.OpeningBook.load(self.path)
+
+    def test4(self):
+        """ El comando construye el libro con las partidas terminadas """
+        cat, mouse = self.users
+        entries = [build_game(cat.id, mouse.id, moves, *replay(moves))
+                   for moves in (CAT_WIN_MOVES, MOUSE_WIN_MOVES,
+                                 CAT_WIN_MOVES[:4])]
+        bulk_insert_games(entries)
+
+        out = StringIO()
+        with override_settings(OPENING_BOOK_FILE=self.path):
+            call_command('build_opening_book', '--depth', '6', stdout=out)
+            self.assertIn("Libro con 2 partidas", out.getvalue())
+            opening = book.get_book()
+            self.assertIs(book.get_book(), opening)
+        node = opening.find(CAT_WIN_MOVES[:6])
+        self.assertEqual(opening.node_data(node)['cat_wins'], 1)
+
+    def test5(self):
+        """ Formato de los movimientos en la url """
+        self.assertEqual(book.parse_path("0-9,59-50"), [(0, 9), (59, 50)])
+        self.assertEqual(book.parse_path("0-9,"), [(0, 9)])
+        self.assertEqual(book.parse_path(""), [])
+        for value in ("0-64", "a-b", "0"):
+            with self.assertRaises(ValueError):
+                book.parse_path(value)
+
+    def test6(self):
+        """ Un fichero dañado deja el libro vacío hasta que se reconstruye,
+        y el libro nuevo se carga sin reiniciar el proceso """
+        with open(self.path, 'wb') as f:
+            f.write(book.HEADER.pack(book.MAGIC, book.VERSION, 1000))
+        with override_settings(OPENING_BOOK_FILE=self.path):
+            with self.assertLogs('paccat.book', 'ERROR'):
+                empty = book.get_book()
+            self.assertEqual(len(empty), 0)
+            self.assertIsNone(empty.find([]))
+            # El libro vacío se guarda: no se vuelve a intentar cargar
+            self.assertIs(book.get_book(), empty)
+
+            book.OpeningBook.build(self.games(), max_depth=4).save(self.path)
+            # Fecha de modificación distinta aunque el sistema de ficheros
+            # tenga poca resolución
+            stat = os.stat(self.path)
+            os.utime(self.path, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 10 ** 9))
+            self.assertEqual(book.get_book().games[0], 3)
+
+            os.remove(self.path)
+            self.assertEqual(len(book.get_book()), 0)
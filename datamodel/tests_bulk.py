@@ -0,0 +1,169 @@
+"""
+    Tests del motor de reglas en memoria y de la importación masiva de
+    partidas.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import os
+import random
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+
+from . import tests
+from .engine import GameState, fast_check_winner, legal_moves, replay
+from .models import Game, GameStatus, Move, check_winner
+from .sample_games import CAT_WIN_MOVES, MOUSE_WIN_MOVES
+
+
+class EngineTests(tests.BaseModelTest):
+    def test1(self):
+        """ fast_check_winner coincide con check_winner en partidas
+        aleatorias """
+        rng = random.Random(1234)
+        for _ in range(50):
+            state = GameState()
+            for _ in range(80):
+                self.assertEqual(fast_check_winner(state),
+                                 check_winner(state))
+                moves = legal_moves(state)
+                if not moves or check_winner(state) != 0:
+                    break
+                state, _ = replay([rng.choice(moves)], state)
+
+    def test2(self):
+        """ replay deja la partida igual que Move.save """
+        for moves in [CAT_WIN_MOVES, MOUSE_WIN_MOVES]:
+            game = Game.objects.create(cat_user=self.users[0],
+                                       mouse_user=self.users[1])
+            for ply, (origin, target) in enumerate(moves):
+                Move.objects.create(game=game, origin=origin, target=target,
+                                    player=self.users[ply % 2])
+
+            state, winner = replay(moves)
+            self.assertEqual(self.get_array_positions(game),
+                             self.get_array_positions(state))
+            self.assertEqual(game.cat_turn, state.cat_turn)
+            self.assertEqual(check_winner(game), winner)
+            self.assertEqual(game.status, GameStatus.FINISHED)
+
+    def test3(self):
+        """ replay rechaza movimientos no válidos e indica cuál """
+        with self.assertRaisesRegex(ValidationError, tests.MSG_ERROR_MOVE):
+            replay([(0, 9), (59, 50), (9, 0)])
+        with self.assertRaises(ValidationError) as cm:
+            replay([(0, 9), (0, 9)])
+        self.assertEqual(cm.exception.ply, 1)
+
+        # No se puede mover una vez terminada la partida
+        with self.assertRaisesRegex(ValidationError, tests.MSG_ERROR_MOVE):
+            replay(MOUSE_WIN_MOVES + [(4, 13)])
+
+
+class ImportGamesTests(tests.BaseModelTest):
+    def import_lines(self, lines, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl',
+                                         delete=False) as f:
+            for line in lines:
+                f.write(line + "\n")
+        out, err = StringIO(), StringIO()
+        try:
+            call_command('import_games', f.name, *args, stdout=out,
+                         stderr=err)
+        finally:
+            os.remove(f.name)
+        return out.getvalue(), err.getvalue()
+
+    def test1(self):
+        """ Importación de partidas válidas y rechazo de las no válidas """
+        cat, mouse = [user.username for user in self.users]
+        lines = [
+            json.dumps({"cat_user": cat, "mouse_user": mouse,
+                        "moves": CAT_WIN_MOVES}),
+            json.dumps({"cat_user": cat, "mouse_user": mouse,
+                        "moves": MOUSE_WIN_MOVES[:5]}),
+            json.dumps({"cat_user": cat}),
+            json.dumps({"cat_user": cat, "mouse_user": mouse,
+                        "moves": [[0, 9], [59, 60]]}),
+            json.dumps({"cat_user": cat, "mouse_user": "nadie",
+                        "moves": []}),
+            "esto no es json",
+        ]
+        out, err = self.import_lines(lines, '--batch-size', '2')
+
+        self.assertIn("Rechazadas: 3", out)
+        self.assertIn("Línea 4", err)
+        self.assertIn("movimiento 2", err)
+        self.assertIn("nadie", err)
+        self.assertIn("Línea 6", err)
+
+        games = list(Game.objects.order_by('id'))
+        self.assertEqual(len(games), 3)
+        self.assertEqual(games[0].status, GameStatus.FINISHED)
+        self.assertEqual(check_winner(games[0]), 1)
+        self.assertEqual(games[0].moves.count(), len(CAT_WIN_MOVES))
+        self.assertEqual(games[1].status, GameStatus.ACTIVE)
+        self.assertFalse(games[1].cat_turn)
+        self.assertEqual(games[1].moves.filter(player=self.users[1]).count(),
+                         2)
+        self.assertEqual(games[2].status, GameStatus.CREATED)
+        self.assertIsNone(games[2].mouse_user)
+
+        moves = list(games[0].moves.order_by('id')
+                     .values_list('origin', 'target'))
+        self.assertEqual(moves, CAT_WIN_MOVES)
+
+    def test2(self):
+        """ Creación de usuarios inexistentes """
+        lines = [json.dumps({"cat_user": "nuevo_gato",
+                             "mouse_user": "nuevo_pac",
+                             "moves": MOUSE_WIN_MOVES})]
+        self.import_lines(lines, '--create-users')
+        game = Game.objects.get()
+        self.assertEqual(game.cat_user.username, "nuevo_gato")
+        self.assertFalse(game.mouse_user.has_usable_password())
+        self.assertEqual(check_winner(game), 2)
+
+
+class SeedDataTests(tests.BaseModelTest):
+    def test1(self):
+        """ Generación de partidas en todos los estados """
+        call_command('seed_data', '--users', '4', '--games', '40', '--seed',
+                     '7', '--batch-size', '15', stdout=StringIO())
+        self.assertEqual(User.objects.filter(
+            username__startswith='seed_').count(), 4)
+
+        kinds = set()
+        for game in Game.objects.all():
+            moves = list(game.moves.order_by('id')
+                         .values_list('origin', 'target'))
+            state, winner = replay(moves)
+            self.assertEqual(self.get_array_positions(game),
+                             self.get_array_positions(state))
+            self.assertEqual(check_winner(game), winner)
+            if game.status == GameStatus.CREATED:
+                self.assertIsNone(game.mouse_user)
+            kinds.add((game.status, game.cat_turn if winner == 0 else winner))
+
+        self.assertEqual(kinds, {
+            (GameStatus.CREATED, True), (GameStatus.ACTIVE, True),
+            (GameStatus.ACTIVE, False), (GameStatus.FINISHED, 1),
+            (GameStatus.FINISHED, 2)})
+
+    def test2(self):
+        """ Distribución de estados """
+        call_command('seed_data', '--users', '2', '--games', '10',
+                     '--created', '0', '--active-cat', '0',
+                     '--active-mouse', '0', '--cat-wins', '0',
+                     stdout=StringIO())
+        self.assertEqual(Game.objects.filter(
+            status=GameStatus.FINISHED).count(), 10)
+        for game in Game.objects.all():
+            self.assertEqual(check_winner(game), 2)
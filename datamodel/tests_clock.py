@@ -0,0 +1,111 @@
+"""
+    Tests del reloj por movimiento.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.core.exceptions import ValidationError
+
+from . import clock, constants, matchmaking, reaper, tests
+from .models import Game, GameStatus, Move, UserStats, check_winner
+from .sample_games import CAT_WIN_MOVES
+
+
+class ClockTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        self.cat, self.mouse = self.users
+
+    def timed(self, move_time=30):
+        return Game.objects.create(cat_user=self.cat, mouse_user=self.mouse,
+                                   move_time=move_time)
+
+    def expire(self, game):
+        Game.objects.filter(id=game.id).update(
+            move_deadline=clock.now() - 1)
+        game.refresh_from_db()
+
+    def test1(self):
+        """ El reloj empieza al entrar el PAC y se reinicia al mover """
+        game = Game.objects.create(cat_user=self.cat, move_time=30)
+        self.assertIsNone(game.move_deadline)
+        self.assertTrue(matchmaking.join_game(game.id, self.mouse))
+        game.refresh_from_db()
+        self.assertAlmostEqual(clock.remaining(game), 30, delta=1)
+
+        Game.objects.filter(id=game.id).update(
+            move_deadline=clock.now() + 5)
+        game.refresh_from_db()
+        Move.objects.create(game=game, origin=0, target=9, player=self.cat)
+        self.assertAlmostEqual(clock.remaining(game), 30, delta=1)
+
+    def test2(self):
+        """ Las partidas sin reloj no tienen plazo """
+        game = self.timed(0)
+        self.assertIsNone(game.move_deadline)
+        self.assertIsNone(clock.remaining(game))
+        self.assertTrue(matchmaking.join_game(
+            Game.objects.create(cat_user=self.cat).id, self.mouse))
+        self.assertFalse(Game.objects.filter(
+            move_deadline__isnull=False).exists())
+
+    def test3(self):
+        """ No se puede mover con el tiempo agotado """
+        game = self.timed()
+        self.expire(game)
+        self.assertEqual(clock.remaining(game), 0)
+        with self.assertRaises(ValidationError) as error:
+            Move.objects.create(game=game, origin=0, target=9,
+                                player=self.cat)
+        self.assertEqual(error.exception.messages,
+                         [constants.MSG_ERROR_TIMEOUT])
+
+    def test4(self):
+        """ El barrido adjudica las partidas con el plazo vencido """
+        expired = [self.timed() for _ in range(3)]
+        for game in expired:
+            self.expire(game)
+        running = self.timed()
+
+        timed_out, batches = reaper.reap_timeouts(batch_size=2)
+        self.assertEqual(sorted(timed_out), [game.id for game in expired])
+        self.assertEqual(batches, 2)
+        for game in expired:
+            game.refresh_from_db()
+            self.assertEqual(game.status, GameStatus.FINISHED)
+            self.assertIsNone(game.move_deadline)
+            # Se le acaba el tiempo a los gatos, que tenían el turno
+            self.assertEqual(check_winner(game), 2)
+        running.refresh_from_db()
+        self.assertEqual(running.status, GameStatus.ACTIVE)
+        self.assertEqual(reaper.reap_timeouts(), ([], 0))
+
+
+    def test5(self):
+        """ Si dos copias desfasadas terminan la partida, solo cuenta la
+        primera """
+        game = self.timed()
+        for ply, (origin, target) in enumerate(CAT_WIN_MOVES[:-1]):
+            Move.objects.create(game=game, origin=origin, target=target,
+                                player=self.cat if ply % 2 == 0
+                                else self.mouse)
+        # Copia leída antes de agotarse el tiempo
+        before = Game.objects.get(id=game.id)
+        self.expire(game)
+        stale = Game.objects.get(id=game.id)
+
+        # El barrido adjudica la partida a partir de una copia...
+        game.adjudicate()
+        # ... y otra petición, con la suya, ya no puede terminarla
+        with self.assertRaises(ValidationError):
+            stale.adjudicate()
+        with self.assertRaises(ValidationError):
+            Move.objects.create(game=before, origin=CAT_WIN_MOVES[-1][0],
+                                target=CAT_WIN_MOVES[-1][1], player=self.cat)
+
+        stats = UserStats.objects.get(user=self.cat)
+        self.assertEqual(stats.games_as_cat, 1)
+        self.assertEqual(self.cat.rating.games, 1)
+        self.assertEqual(game.moves.count(), len(CAT_WIN_MOVES) - 1)
@@ -0,0 +1,153 @@
+"""
+    Tests de los mapas de calor de ocupación de las casillas.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from io import StringIO
+from unittest import skipIf
+
+from django.core.management import CommandError, call_command
+
+from . import heatmap, tests
+from .heatmap import offset
+from .models import Game, GamePosition, Heatmap, HeatmapCursor, Move
+from .sample_games import CAT_WIN_MOVES, MOUSE_WIN_MOVES
+
+
+class HeatmapTests(tests.BaseModelTest):
+    def play(self, moves):
+        cat, mouse = self.users
+        game = Game.objects.create(cat_user=cat, mouse_user=mouse)
+        for ply, (origin, target) in enumerate(moves):
+            Move.objects.create(game=game, origin=origin, target=target,
+                                player=cat if ply % 2 == 0 else mouse)
+        return game
+
+    def positions(self):
+        return list(GamePosition.objects.values_list('game_id', 'ply',
+                                                     'key'))
+
+    def test1(self):
+        """ Cada posición suma las casillas de las cinco piezas en el mapa
+        de su ganador y su tramo """
+        game = self.play(CAT_WIN_MOVES)
+        counts = heatmap.new_counts()
+        heatmap.count_positions(self.positions(), {game.id: 1}, counts)
+        n_positions = len(CAT_WIN_MOVES) + 1
+        self.assertEqual(sum(counts), 5 * n_positions)
+        self.assertEqual(sum(counts[offset(Heatmap.MOUSE, 2, 0):]), 0)
+
+        initial = offset(Heatmap.CAT, 1, 0)
+        for cell in (0, 2, 4, 6):
+            self.assertGreaterEqual(counts[initial + cell], 1)
+        self.assertGreaterEqual(counts[offset(Heatmap.MOUSE, 1, 0) + 59], 1)
+
+        # Las partidas sin ganador no cuentan
+        counts = heatmap.new_counts()
+        heatmap.count_positions(self.positions(), {}, counts)
+        self.assertEqual(sum(counts), 0)
+
+    def test2(self):
+        """ Las actualizaciones por lotes suman lo mismo que recalcular
+        desde cero """
+        self.play(CAT_WIN_MOVES)
+        self.play(MOUSE_WIN_MOVES)
+        self.play(CAT_WIN_MOVES[:3])
+        self.assertEqual(heatmap.update(settle_seconds=0), (2, 1))
+        self.assertEqual(heatmap.update(settle_seconds=0), (0, 0))
+        data = heatmap.heatmap_data()
+        self.assertEqual(sum(map(sum, data['mouse']['cat_wins'])),
+                         len(CAT_WIN_MOVES) + 1)
+        self.assertEqual(sum(map(sum, data['cat']['mouse_wins'])),
+                         4 * (len(MOUSE_WIN_MOVES) + 1))
+
+        last = self.play(MOUSE_WIN_MOVES)
+        self.play(CAT_WIN_MOVES)
+        self.assertEqual(heatmap.update(batch_size=1, max_batches=1,
+                                        settle_seconds=0), (1, 1))
+        self.assertEqual(HeatmapCursor.load().game_id, last.id)
+        self.assertEqual(heatmap.update(batch_size=1, settle_seconds=0),
+                         (1, 1))
+        incremental = heatmap.heatmap_data()
+
+        self.assertEqual(heatmap.rebuild(chunk_size=7, settle_seconds=0),
+                         (4, len(self.positions())))
+        self.assertEqual(heatmap.heatmap_data(), incremental)
+        self.assertEqual(Heatmap.objects.count(), 2 * 2 * heatmap.BUCKETS)
+        self.assertEqual(heatmap.update(settle_seconds=0), (0, 0))
+
+    def test3(self):
+        """ Las partidas recién terminadas esperan a la siguiente
+        actualización """
+        self.play(CAT_WIN_MOVES)
+        self.assertEqual(heatmap.update(), (0, 0))
+        self.assertEqual(heatmap.rebuild(), (0, len(self.positions())))
+        self.assertFalse(any(map(any, heatmap.heatmap_data()['cat'][
+            'cat_wins'])))
+        self.assertEqual(heatmap.update(settle_seconds=0), (1, 1))
+
+    def test4(self):
+        """ Comandos """
+        self.play(CAT_WIN_MOVES)
+        out = StringIO()
+        call_command('update_heatmaps', '--settle', '0', stdout=out)
+        self.assertIn("1 partidas sumadas en 1 lotes", out.getvalue())
+        args = ['--settle', '0']
+        if heatmap.numpy is None:
+            with self.assertRaisesMessage(CommandError, "--no-numpy"):
+                call_command('rebuild_heatmaps', *args, stdout=out)
+            args.append('--no-numpy')
+        call_command('rebuild_heatmaps', *args, stdout=out)
+        self.assertIn("1 partidas y %d posiciones contadas" %
+                      len(self.positions()), out.getvalue())
+
+    @skipIf(heatmap.numpy is None, "NumPy no está instalado")
+    def test5(self):
+        """ NumPy cuenta lo mismo que el recorrido fila a fila """
+        numpy = heatmap.numpy
+        cat_game = self.play(CAT_WIN_MOVES)
+        mouse_game = self.play(MOUSE_WIN_MOVES)
+        self.play(CAT_WIN_MOVES[:3])
+        outcomes = {cat_game.id: 1, mouse_game.id: 2}
+        counts = heatmap.new_counts()
+        heatmap.count_positions(self.positions(), outcomes, counts)
+        vectorized = heatmap.count_positions_numpy(
+            numpy.array(self.positions(), dtype=numpy.int64),
+            numpy.array(sorted(outcomes), dtype=numpy.int64),
+            numpy.array([outcomes[game_id] for game_id in sorted(outcomes)],
+                        dtype=numpy.int64))
+        self.assertEqual(vectorized.tolist(), counts.tolist())
+
+    def test6(self):
+        """ Volver a guardar una partida terminada no la vuelve a sumar """
+        game = self.play(CAT_WIN_MOVES)
+        finished_at = Game.objects.get(id=game.id).finished_at
+        self.assertIsNotNone(finished_at)
+        self.assertEqual(heatmap.update(settle_seconds=0), (1, 1))
+        counts = heatmap.heatmap_data()
+
+        game = Game.objects.get(id=game.id)
+        game.save()
+        game = Game.objects.get(id=game.id)
+        self.assertEqual(game.finished_at, finished_at)
+        self.assertGreater(game.last_activity, finished_at)
+        self.assertEqual(heatmap.update(settle_seconds=0), (0, 0))
+        self.assertEqual(heatmap.heatmap_data(), counts)
+
+    def test7(self):
+        """ La reconstrucción cuenta las partidas sin fecha de fin, y
+        update sigue por detrás de las que sí la tienen """
+        self.play(CAT_WIN_MOVES)
+        loaded = self.play(MOUSE_WIN_MOVES)
+        Game.objects.filter(id=loaded.id).update(finished_at=None)
+        self.assertEqual(heatmap.update(settle_seconds=0), (1, 1))
+        self.assertEqual(heatmap.rebuild(settle_seconds=0, use_numpy=False),
+                         (2, len(self.positions())))
+        self.assertTrue(any(map(any, heatmap.heatmap_data()['cat'][
+            'mouse_wins'])))
+        self.assertEqual(HeatmapCursor.load().finished_at,
+                         Game.objects.exclude(id=loaded.id).get().finished_at)
+        self.assertEqual(heatmap.update(settle_seconds=0), (0, 0))
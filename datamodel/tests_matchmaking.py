@@ -0,0 +1,139 @@
+"""
+    Tests de la cola de partida rápida.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.db import IntegrityError, transaction
+
+from . import matchmaking, tests
+from .models import Game, GameStatus, MatchRequest
+
+CAT = MatchRequest.CAT
+MOUSE = MatchRequest.MOUSE
+
+
+class MatchmakingTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        for name in ['third_user_test', 'fourth_user_test']:
+            self.users.append(self.get_or_create_user(name))
+
+    def test1(self):
+        """ Sin rival, el jugador queda esperando """
+        game, waiting = matchmaking.enqueue(self.users[0], CAT)
+        self.assertIsNone(game)
+        self.assertEqual(waiting.role, CAT)
+        self.assertEqual(matchmaking.waiting_request(self.users[0]), waiting)
+
+    def test2(self):
+        """ Un rival con el papel contrario crea la partida activa """
+        matchmaking.enqueue(self.users[0], CAT)
+        game, waiting = matchmaking.enqueue(self.users[1], MOUSE)
+        self.assertIsNone(waiting)
+        self.assertEqual(game.status, GameStatus.ACTIVE)
+        self.assertEqual(game.cat_user, self.users[0])
+        self.assertEqual(game.mouse_user, self.users[1])
+        self.assertIsNone(matchmaking.waiting_request(self.users[0]))
+        self.assertEqual(matchmaking.pop_match(self.users[0]), game.id)
+        self.assertIsNone(matchmaking.pop_match(self.users[0]))
+
+    def test3(self):
+        """ No se empareja con el mismo papel ni consigo mismo """
+        matchmaking.enqueue(self.users[0], CAT)
+        game, _ = matchmaking.enqueue(self.users[1], CAT)
+        self.assertIsNone(game)
+        game, waiting = matchmaking.enqueue(self.users[0], MOUSE)
+        # Cambia de papel y se empareja con el otro gato
+        self.assertEqual(game.cat_user, self.users[1])
+        self.assertEqual(game.mouse_user, self.users[0])
+        self.assertFalse(MatchRequest.objects.filter(
+            game__isnull=True).exists())
+
+    def test4(self):
+        """ Se empareja con el que lleva más tiempo esperando """
+        matchmaking.enqueue(self.users[0], MOUSE)
+        matchmaking.enqueue(self.users[1], MOUSE)
+        game, _ = matchmaking.enqueue(self.users[2], CAT)
+        self.assertEqual(game.mouse_user, self.users[0])
+        game, _ = matchmaking.enqueue(self.users[3], CAT)
+        self.assertEqual(game.mouse_user, self.users[1])
+
+    def test5(self):
+        """ Volver a apuntarse con el mismo papel conserva el sitio """
+        _, first = matchmaking.enqueue(self.users[0], CAT)
+        _, second = matchmaking.enqueue(self.users[0], CAT)
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(MatchRequest.objects.count(), 1)
+
+    def test6(self):
+        """ cancel saca al jugador de la cola """
+        matchmaking.enqueue(self.users[0], CAT)
+        self.assertTrue(matchmaking.cancel(self.users[0]))
+        self.assertFalse(matchmaking.cancel(self.users[0]))
+        game, _ = matchmaking.enqueue(self.users[1], MOUSE)
+        self.assertIsNone(game)
+
+    def test7(self):
+        """ Una petición ya reclamada no se vuelve a reclamar y se pasa a la
+        siguiente """
+        _, first = matchmaking.enqueue(self.users[0], MOUSE)
+        matchmaking.enqueue(self.users[1], MOUSE)
+        other = Game.objects.create(cat_user=self.users[2],
+                                    mouse_user=self.users[0])
+        self.assertTrue(matchmaking.claim(first, other))
+        self.assertFalse(matchmaking.claim(first, other))
+
+        games = Game.objects.count()
+        game, _ = matchmaking.enqueue(self.users[3], CAT)
+        self.assertEqual(game.mouse_user, self.users[1])
+        self.assertEqual(Game.objects.count(), games + 1)
+
+    def test8(self):
+        """ Un usuario solo puede tener una petición en espera """
+        MatchRequest.objects.create(user=self.users[0], role=CAT)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MatchRequest.objects.create(user=self.users[0], role=MOUSE)
+
+
+class JoinGameTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        self.users.append(self.get_or_create_user('third_user_test'))
+
+    def test1(self):
+        """ Solo se une el primero de dos jugadores """
+        game = Game.objects.create(cat_user=self.users[0])
+        self.assertTrue(matchmaking.join_game(game.id, self.users[1]))
+        self.assertFalse(matchmaking.join_game(game.id, self.users[2]))
+        game.refresh_from_db()
+        self.assertEqual(game.mouse_user, self.users[1])
+        self.assertEqual(game.status, GameStatus.ACTIVE)
+        self.assertEqual(game.cat_turn, True)
+
+    def test2(self):
+        """ No se puede unir a una partida terminada ni a una que no
+        existe """
+        game = Game.objects.create(cat_user=self.users[0],
+                                   status=GameStatus.FINISHED)
+        self.assertFalse(matchmaking.join_game(game.id, self.users[1]))
+        self.assertFalse(matchmaking.join_game(game.id + 1, self.users[1]))
+
+    def test3(self):
+        """ La siguiente partida abierta es la posterior o, si no hay, la
+        primera """
+        first = Game.objects.create(cat_user=self.users[0])
+        taken = Game.objects.create(cat_user=self.users[0])
+        other = Game.objects.create(cat_user=self.users[2])
+        last = Game.objects.create(cat_user=self.users[0])
+        matchmaking.join_game(taken.id, self.users[1])
+
+        self.assertEqual(matchmaking.next_open_game(self.users[2], taken.id),
+                         last)
+        self.assertEqual(matchmaking.next_open_game(self.users[2], last.id),
+                         first)
+        self.assertEqual(matchmaking.next_open_game(self.users[0], last.id),
+                         other)
+        self.assertIsNone(matchmaking.next_open_game(self.users[0], other.id))
@@ -0,0 +1,88 @@
+"""
+    Tests del índice de posiciones.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+
+from . import tests
+from .bulk import build_game, bulk_insert_games
+from .engine import GameState, apply_move, replay
+from .models import INITIAL_KEY, Game, GamePosition, Move
+from .positions import make_key, position_key, position_ply, split_key
+from .sample_games import CAT_WIN_MOVES, MOUSE_WIN_MOVES
+
+
+class PositionKeyTests(tests.BaseModelTest):
+    def test1(self):
+        """ Los gatos cuentan como conjunto """
+        self.assertEqual(make_key((0, 2, 4, 6), 59, True),
+                         make_key((6, 4, 2, 0), 59, True))
+        self.assertNotEqual(make_key((0, 2, 4, 6), 59, True),
+                            make_key((0, 2, 4, 6), 59, False))
+        self.assertEqual(split_key(make_key((63, 9, 4, 0), 50, False)),
+                         ([0, 4, 9, 63], 50, False))
+        self.assertLess(make_key((60, 61, 62, 63), 63, True), 2 ** 31)
+
+    def test2(self):
+        """ El número de movimiento se deduce de la posición """
+        state = GameState()
+        self.assertEqual(position_key(state), INITIAL_KEY)
+        self.assertEqual(position_ply(state), 0)
+        for ply, move in enumerate(CAT_WIN_MOVES, 1):
+            apply_move(state, *move)
+            self.assertEqual(position_ply(state), ply)
+
+
+class PositionIndexTests(tests.BaseModelTest):
+    def play(self, moves):
+        cat, mouse = self.users
+        game = Game.objects.create(cat_user=cat, mouse_user=mouse)
+        for ply, (origin, target) in enumerate(moves):
+            Move.objects.create(game=game, origin=origin, target=target,
+                                player=cat if ply % 2 == 0 else mouse)
+        return game
+
+    def indexed(self):
+        return sorted(GamePosition.objects.values_list('game_id', 'ply',
+                                                       'key'))
+
+    def test1(self):
+        """ Move.save indexa cada posición, incluida la inicial """
+        game = self.play(CAT_WIN_MOVES)
+        keys = [INITIAL_KEY]
+        state = GameState()
+        for move in CAT_WIN_MOVES:
+            keys.append(position_key(apply_move(state, *move)))
+        self.assertEqual(self.indexed(),
+                         [(game.id, ply, key) for ply, key in
+                          enumerate(keys)])
+
+    def test2(self):
+        """ El comando indexa las partidas cargadas sin Move.save igual
+        que Move.save, y se puede repetir """
+        self.play(CAT_WIN_MOVES)
+        self.play(MOUSE_WIN_MOVES)
+        expected = self.indexed()
+
+        GamePosition.objects.all().delete()
+        out = StringIO()
+        call_command('index_positions', '--chunk-size', '1', stdout=out)
+        self.assertIn("2 partidas y %d posiciones" % len(expected),
+                      out.getvalue())
+        self.assertEqual(self.indexed(), expected)
+
+        call_command('index_positions', stdout=out)
+        call_command('index_positions', '--rebuild', stdout=out)
+        self.assertEqual(self.indexed(), expected)
+
+        cat, mouse = self.users
+        bulk_insert_games([build_game(cat.id, mouse.id, CAT_WIN_MOVES[:3],
+                                      *replay(CAT_WIN_MOVES[:3]))])
+        call_command('index_positions', stdout=out)
+        self.assertEqual(len(self.indexed()), len(expected) + 4)
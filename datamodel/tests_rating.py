@@ -0,0 +1,112 @@
+"""
+    Tests de la puntuación Elo de los jugadores.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+
+from . import elo, tests
+from .bulk import build_game, bulk_insert_games
+from .engine import replay
+from .models import Game, GameStatus, Move, Rating
+from .sample_games import CAT_WIN_MOVES, MOUSE_WIN_MOVES
+
+
+class RatingTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        self.users.append(self.get_or_create_user('third_user_test'))
+
+    def play(self, cat, mouse, moves):
+        game = Game.objects.create(cat_user=cat, mouse_user=mouse)
+        for ply, (origin, target) in enumerate(moves):
+            Move.objects.create(game=game, origin=origin, target=target,
+                                player=cat if ply % 2 == 0 else mouse)
+        return game
+
+    def test1(self):
+        """ Entre iguales, el ganador suma lo que pierde el perdedor """
+        won, lost = elo.new_ratings(1500, 0, 1500, 0)
+        self.assertAlmostEqual(won, 1500 + elo.PROVISIONAL_K / 2)
+        self.assertAlmostEqual(lost, 1500 - elo.PROVISIONAL_K / 2)
+        # Ganar al favorito da más puntos que ganar a uno peor
+        self.assertGreater(elo.new_ratings(1400, 50, 1600, 50)[0] - 1400,
+                           elo.new_ratings(1600, 50, 1400, 50)[0] - 1600)
+
+    def test2(self):
+        """ Terminar una partida actualiza la puntuación de los dos """
+        game = self.play(self.users[0], self.users[1], CAT_WIN_MOVES)
+        self.assertEqual(game.status, GameStatus.FINISHED)
+        cat = Rating.objects.get(user=self.users[0])
+        mouse = Rating.objects.get(user=self.users[1])
+        self.assertGreater(cat.rating, elo.INITIAL_RATING)
+        self.assertLess(mouse.rating, elo.INITIAL_RATING)
+        self.assertEqual((cat.games, cat.wins), (1, 1))
+        self.assertEqual((mouse.games, mouse.wins), (1, 0))
+
+        # Volver a guardar la partida terminada no la puntúa otra vez
+        game.save()
+        self.assertEqual(Rating.objects.get(user=self.users[0]).games, 1)
+
+    def test3(self):
+        """ Las partidas sin terminar no cuentan """
+        self.play(self.users[0], self.users[1], CAT_WIN_MOVES[:-1])
+        self.assertFalse(Rating.objects.exists())
+
+    def test4(self):
+        """ La clasificación se pagina por clave """
+        self.play(self.users[0], self.users[1], CAT_WIN_MOVES)
+        self.play(self.users[2], self.users[0], MOUSE_WIN_MOVES)
+        ranking = list(Rating.objects.top(10))
+        self.assertEqual(len(ranking), 3)
+        self.assertEqual([r.rating for r in ranking],
+                         sorted([r.rating for r in ranking], reverse=True))
+
+        first = list(Rating.objects.top(1))
+        rest = list(Rating.objects.top(10, (first[0].rating, first[0].id)))
+        self.assertEqual(first + rest, ranking)
+
+    def test5(self):
+        """ rebuild_ratings obtiene lo mismo que la actualización al
+        terminar cada partida, también para las partidas importadas """
+        self.play(self.users[0], self.users[1], CAT_WIN_MOVES)
+        self.play(self.users[2], self.users[0], MOUSE_WIN_MOVES)
+        self.play(self.users[1], self.users[2], CAT_WIN_MOVES)
+        incremental = {r.user_id: (r.rating, r.games, r.wins)
+                       for r in Rating.objects.all()}
+
+        call_command('rebuild_ratings', chunk_size=1, stdout=StringIO())
+        rebuilt = {r.user_id: (r.rating, r.games, r.wins)
+                   for r in Rating.objects.all()}
+        self.assertEqual(rebuilt.keys(), incremental.keys())
+        for user_id, (rating, games, wins) in incremental.items():
+            self.assertAlmostEqual(rebuilt[user_id][0], rating)
+            self.assertEqual(rebuilt[user_id][1:], (games, wins))
+
+        state, winner = replay(CAT_WIN_MOVES)
+        bulk_insert_games([build_game(self.users[0].id, self.users[2].id,
+                                      CAT_WIN_MOVES, state, winner)])
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.assertEqual(Rating.objects.get(user=self.users[2]).games, 3)
+
+    def test6(self):
+        """ rebuild_ratings aplica los resultados en el orden en que
+        terminaron las partidas, no en el de su id """
+        first = self.play(self.users[0], self.users[1], CAT_WIN_MOVES[:-1])
+        self.play(self.users[1], self.users[2], CAT_WIN_MOVES)
+        self.play(self.users[2], self.users[1], CAT_WIN_MOVES)
+        origin, target = CAT_WIN_MOVES[-1]
+        Move.objects.create(game=first, origin=origin, target=target,
+                            player=self.users[0])
+        incremental = {r.user_id: (r.rating, r.games, r.wins)
+                       for r in Rating.objects.all()}
+
+        call_command('rebuild_ratings', chunk_size=1, stdout=StringIO())
+        for rating in Rating.objects.all():
+            self.assertAlmostEqual(rating.rating,
+                                   incremental[rating.user_id][0])
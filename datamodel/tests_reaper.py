@@ -0,0 +1,110 @@
+"""
+    Tests de la limpieza de partidas abandonadas.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from . import matchmaking, reaper, tests
+from .models import Game, GameStatus, Move, Rating, UserStats, check_winner
+
+
+class ReaperTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        self.cat, self.mouse = self.users
+        self.now = timezone.now()
+
+    def age(self, game, days):
+        Game.objects.filter(id=game.id).update(
+            last_activity=self.now - timedelta(days=days))
+
+    def created(self, days):
+        game = Game.objects.create(cat_user=self.cat)
+        self.age(game, days)
+        return game
+
+    def active(self, days, cat_turn=True):
+        game = Game.objects.create(cat_user=self.cat, mouse_user=self.mouse)
+        if not cat_turn:
+            Move.objects.create(game=game, origin=0, target=9,
+                                player=self.cat)
+        self.age(game, days)
+        return game
+
+    def test1(self):
+        """ Caducan solo las partidas creadas sin actividad """
+        old = self.created(3)
+        fresh = self.created(0)
+        active = self.active(3)
+        total, batches = reaper.reap(GameStatus.CREATED,
+                                     self.now - timedelta(days=1))
+        self.assertEqual((total, batches), (1, 1))
+        self.assertFalse(Game.objects.filter(id=old.id).exists())
+        self.assertTrue(Game.objects.filter(id=fresh.id).exists())
+        self.assertTrue(Game.objects.filter(id=active.id).exists())
+
+    def test2(self):
+        """ Las partidas activas abandonadas las gana quien esperaba """
+        waiting_mouse = self.active(5)
+        waiting_cat = self.active(5, cat_turn=False)
+        fresh = self.active(0)
+        total, _ = reaper.reap(GameStatus.ACTIVE,
+                               self.now - timedelta(days=1))
+        self.assertEqual(total, 2)
+
+        for game, winner in ((waiting_mouse, 2), (waiting_cat, 1)):
+            game.refresh_from_db()
+            self.assertEqual(game.status, GameStatus.FINISHED)
+            self.assertEqual(check_winner(game), winner)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, GameStatus.ACTIVE)
+
+        # Cuentan para la puntuación y las estadísticas
+        self.assertEqual(Rating.objects.get(user=self.cat).games, 2)
+        stats = UserStats.objects.get(user=self.mouse)
+        self.assertEqual((stats.games_as_mouse, stats.wins_as_mouse), (2, 1))
+        out = StringIO()
+        call_command('check_stats', stdout=out)
+        self.assertIn("0 usuarios no coinciden", out.getvalue())
+
+    def test3(self):
+        """ Se procesan por lotes y se puede limitar su número """
+        for _ in range(5):
+            self.created(3)
+        before = self.now - timedelta(days=1)
+        self.assertEqual(reaper.reap(GameStatus.CREATED, before, 2, 1),
+                         (2, 1))
+        self.assertEqual(reaper.reap(GameStatus.CREATED, before, 2), (3, 2))
+        self.assertEqual(reaper.reap(GameStatus.CREATED, before, 2), (0, 0))
+
+    def test4(self):
+        """ Mover o unirse a la partida renueva su actividad """
+        game = self.active(5)
+        Move.objects.create(game=game, origin=0, target=9, player=self.cat)
+        game.refresh_from_db()
+        self.assertGreaterEqual(game.last_activity, self.now)
+
+        game = self.created(3)
+        self.assertTrue(matchmaking.join_game(game.id, self.mouse))
+        game.refresh_from_db()
+        self.assertGreaterEqual(game.last_activity, self.now)
+
+    def test5(self):
+        """ El comando informa de las partidas procesadas """
+        self.created(3)
+        self.active(5)
+        out = StringIO()
+        call_command('reap_games', '--batch-size', '10', stdout=out)
+        output = out.getvalue()
+        self.assertIn("1 partidas caducadas en 1 lotes", output)
+        self.assertIn("1 partidas adjudicadas en 1 lotes", output)
+        self.assertEqual(Game.objects.filter(
+            status=GameStatus.FINISHED).count(), 1)
@@ -0,0 +1,143 @@
+"""
+    Tests de las estadísticas de los jugadores.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from . import tests
+from .bulk import build_game, bulk_insert_games
+from .engine import replay
+from .management.commands.check_stats import check_chunk, fix_user
+from .models import Game, Move, UserStats
+from .sample_games import CAT_WIN_MOVES, MOUSE_WIN_MOVES
+
+
+class UserStatsTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        self.users.append(self.get_or_create_user('third_user_test'))
+
+    def play(self, cat, mouse, moves):
+        game = Game.objects.create(cat_user=cat, mouse_user=mouse)
+        for ply, (origin, target) in enumerate(moves):
+            Move.objects.create(game=game, origin=origin, target=target,
+                                player=cat if ply % 2 == 0 else mouse)
+        return game
+
+    def counters(self):
+        return {stats.user_id: {key: getattr(stats, key)
+                                for key in UserStats.COUNTERS}
+                for stats in UserStats.objects.all()}
+
+    def check_stats(self, *args):
+        out = StringIO()
+        call_command('check_stats', *args, chunk_size=2, stdout=out)
+        return out.getvalue()
+
+    def test1(self):
+        """ Terminar una partida suma a los dos jugadores """
+        self.play(self.users[0], self.users[1], CAT_WIN_MOVES)
+        self.play(self.users[2], self.users[0], MOUSE_WIN_MOVES)
+
+        stats = UserStats.objects.get(user=self.users[0])
+        self.assertEqual((stats.games_as_cat, stats.wins_as_cat), (1, 1))
+        self.assertEqual((stats.games_as_mouse, stats.wins_as_mouse), (1, 1))
+        self.assertEqual((stats.games, stats.wins, stats.losses), (2, 2, 0))
+        self.assertEqual(stats.average_length,
+                         (len(CAT_WIN_MOVES) + len(MOUSE_WIN_MOVES)) / 2)
+
+        stats = UserStats.objects.get(user=self.users[1])
+        self.assertEqual((stats.games_as_mouse, stats.losses), (1, 1))
+
+    def test2(self):
+        """ Las partidas sin terminar no cuentan """
+        self.play(self.users[0], self.users[1], MOUSE_WIN_MOVES[:-1])
+        self.assertFalse(UserStats.objects.exists())
+
+    def test3(self):
+        """ check_stats no encuentra diferencias con las partidas jugadas """
+        self.play(self.users[0], self.users[1], CAT_WIN_MOVES)
+        self.play(self.users[1], self.users[2], MOUSE_WIN_MOVES)
+        self.assertIn("0 usuarios no coinciden", self.check_stats())
+
+    def test4(self):
+        """ check_stats --fix corrige las estadísticas """
+        self.play(self.users[0], self.users[1], CAT_WIN_MOVES)
+        expected = self.counters()
+
+        UserStats.objects.filter(user=self.users[0]).update(wins_as_cat=7)
+        UserStats.objects.filter(user=self.users[1]).delete()
+        UserStats.objects.create(user=self.users[2], plies=3)
+        self.assertIn("3 usuarios no coinciden", self.check_stats())
+        self.assertIn("3 usuarios no coinciden", self.check_stats('--fix'))
+        self.assertIn("0 usuarios no coinciden", self.check_stats())
+
+        fixed = self.counters()
+        self.assertEqual(fixed[self.users[0].id], expected[self.users[0].id])
+        self.assertEqual(fixed[self.users[1].id], expected[self.users[1].id])
+        self.assertEqual(fixed[self.users[2].id]['plies'], 0)
+
+    def test5(self):
+        """ check_stats --fix incluye las partidas importadas """
+        state, winner = replay(MOUSE_WIN_MOVES)
+        bulk_insert_games([build_game(self.users[0].id, self.users[1].id,
+                                      MOUSE_WIN_MOVES, state, winner)])
+        self.check_stats('--fix')
+        stats = UserStats.objects.get(user=self.users[1])
+        self.assertEqual((stats.games_as_mouse, stats.wins_as_mouse,
+                          stats.plies), (1, 1, len(MOUSE_WIN_MOVES)))
+
+    def test6(self):
+        """ --fix vuelve a calcular cada usuario antes de corregirlo: no se
+        pierden las partidas que terminan después de la comprobación """
+        self.play(self.users[0], self.users[1], CAT_WIN_MOVES)
+        UserStats.objects.filter(user=self.users[0]).update(wins_as_cat=7)
+        ids = sorted(user.id for user in self.users)
+        mismatches = check_chunk((ids[0], ids[-1]))
+        self.assertEqual([user_id for user_id, _, _ in mismatches],
+                         [self.users[0].id])
+
+        self.play(self.users[0], self.users[2], CAT_WIN_MOVES)
+        self.assertTrue(fix_user(self.users[0].id))
+        stats = UserStats.objects.get(user=self.users[0])
+        self.assertEqual((stats.games_as_cat, stats.wins_as_cat,
+                          stats.plies), (2, 2, 2 * len(CAT_WIN_MOVES)))
+        self.assertFalse(fix_user(self.users[0].id))
+        self.assertEqual(check_chunk((ids[0], ids[-1])), [])
+
+
+class CheckStatsWorkersTests(TransactionTestCase):
+    """
+        check_stats en paralelo. Los procesos de trabajo abren sus propias
+        conexiones, así que los datos tienen que estar confirmados.
+    """
+
+    def test1(self):
+        """ Varios procesos comprueban bloques a la vez """
+        users = [tests.BaseModelTest.get_or_create_user('workers_%d' % i)
+                 for i in range(6)]
+        state, winner = replay(MOUSE_WIN_MOVES)
+        bulk_insert_games([build_game(cat.id, mouse.id, MOUSE_WIN_MOVES,
+                                      state, winner)
+                           for cat, mouse in zip(users, users[1:])])
+
+        def check_stats(*args):
+            out = StringIO()
+            call_command('check_stats', '--workers', '3', *args,
+                         chunk_size=2, stdout=out)
+            return out.getvalue()
+
+        self.assertIn("6 usuarios no coinciden", check_stats())
+        self.assertIn("6 usuarios no coinciden (6 corregidos)",
+                      check_stats('--fix'))
+        self.assertIn("0 usuarios no coinciden", check_stats())
+        stats = UserStats.objects.get(user=users[1])
+        self.assertEqual((stats.games_as_cat, stats.games_as_mouse,
+                          stats.wins_as_mouse), (1, 1, 1))
@@ -0,0 +1,169 @@
+"""
+    Tests de los torneos.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import random
+from collections import Counter
+from io import StringIO
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from . import tests, tournament
+from .models import Game, GameStatus, Move, Tournament, TournamentGame
+from .sample_games import CAT_WIN_MOVES
+
+
+def fake_entries(n):
+    return [SimpleNamespace(id=i, score=0, byes=0, games_as_cat=0,
+                            games_as_mouse=0) for i in range(1, n + 1)]
+
+
+def apply_round(pairs, bye, rng=None):
+    for cat, mouse in pairs:
+        cat.games_as_cat += 1
+        mouse.games_as_mouse += 1
+        if rng is None or rng.random() < 0.5:
+            cat.score += 1
+        else:
+            mouse.score += 1
+    if bye is not None:
+        bye.byes += 1
+        bye.score += 1
+
+
+class PairingTests(tests.BaseModelTest):
+    def test1(self):
+        """ En round robin todos juegan contra todos una vez """
+        for n in (2, 5, 6, 9):
+            entries = fake_entries(n)
+            meetings = Counter()
+            byes = Counter()
+            for round_number in range(1, tournament.round_robin_rounds(n) + 1):
+                pairs, bye = tournament.round_robin_pairings(entries,
+                                                             round_number)
+                apply_round(pairs, bye)
+                meetings.update(frozenset((cat.id, mouse.id))
+                                for cat, mouse in pairs)
+                if bye is not None:
+                    byes[bye.id] += 1
+            self.assertEqual(len(meetings), n * (n - 1) // 2)
+            self.assertEqual(set(meetings.values()), {1})
+            self.assertEqual(sum(byes.values()), n if n % 2 else 0)
+            for entry in entries:
+                self.assertLessEqual(
+                    abs(entry.games_as_cat - entry.games_as_mouse), 2)
+
+    def test2(self):
+        """ El suizo evita repetir rival, reparte los descansos y equilibra
+        los colores """
+        entries = fake_entries(201)
+        rng = random.Random(45)
+        played = set()
+        for round_number in range(1, 9):
+            pairs, bye = tournament.swiss_pairings(entries, played,
+                                                   round_number)
+            self.assertEqual(len(pairs), 100)
+            ids = [entry.id for pair in pairs for entry in pair] + [bye.id]
+            self.assertEqual(len(set(ids)), 201)
+            pair_ids = {frozenset((cat.id, mouse.id)) for cat, mouse in pairs}
+            self.assertFalse(pair_ids & played)
+            played |= pair_ids
+            apply_round(pairs, bye, rng)
+
+        self.assertEqual(max(entry.byes for entry in entries), 1)
+        for entry in entries:
+            self.assertLessEqual(
+                abs(entry.games_as_cat - entry.games_as_mouse), 2)
+
+    def test3(self):
+        """ El suizo empareja a los de la misma puntuación """
+        entries = fake_entries(4)
+        entries[0].score = entries[2].score = 1
+        pairs, bye = tournament.swiss_pairings(entries, set(), 2)
+        self.assertIsNone(bye)
+        self.assertEqual({frozenset((cat.id, mouse.id))
+                          for cat, mouse in pairs},
+                         {frozenset((1, 3)), frozenset((2, 4))})
+
+
+class TournamentTests(tests.BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        self.players = [User.objects.create_user('tournament_%d' % i)
+                        for i in range(5)]
+
+    def play_round(self, current):
+        for link in TournamentGame.objects.filter(
+                tournament=current, round=current.current_round):
+            game = link.game
+            for ply, (origin, target) in enumerate(CAT_WIN_MOVES):
+                Move.objects.create(game=game, origin=origin, target=target,
+                                    player_id=game.cat_user_id
+                                    if ply % 2 == 0 else game.mouse_user_id)
+        current.refresh_from_db()
+
+    def test1(self):
+        """ La primera ronda se crea con las partidas activas """
+        current = tournament.create_tournament('t', Tournament.SWISS,
+                                               self.players)
+        self.assertEqual(current.current_round, 1)
+        self.assertEqual(current.rounds, 3)
+        games = Game.objects.filter(tournament_game__tournament=current)
+        self.assertEqual(games.count(), 2)
+        self.assertEqual({game.status for game in games}, {GameStatus.ACTIVE})
+        self.assertEqual(current.entries.filter(byes=1, score=1).count(), 1)
+
+    def test2(self):
+        """ Al terminar la última partida de la ronda se empareja la
+        siguiente y, tras la última ronda, termina el torneo """
+        current = tournament.create_tournament(
+            't', Tournament.ROUND_ROBIN, self.players)
+        self.assertEqual(current.rounds, 5)
+        for round_number in range(1, 6):
+            self.assertEqual(current.current_round, round_number)
+            self.assertEqual(current.status, GameStatus.ACTIVE)
+            self.play_round(current)
+        self.assertEqual(current.status, GameStatus.FINISHED)
+        self.assertEqual(current.current_round, 5)
+
+        # Cada partida da un punto al ganador y cada descanso otro
+        entries = list(current.entries.all())
+        self.assertEqual(sum(entry.score for entry in entries), 10 + 5)
+        self.assertEqual({entry.byes for entry in entries}, {1})
+        for entry in entries:
+            # Siempre ganan los gatos
+            self.assertEqual(entry.score, entry.games_as_cat + entry.byes)
+
+    def test3(self):
+        """ Una ronda a medias no avanza """
+        current = tournament.create_tournament('t', Tournament.SWISS,
+                                               self.players[:4], rounds=2)
+        link = TournamentGame.objects.filter(tournament=current).first()
+        for ply, (origin, target) in enumerate(CAT_WIN_MOVES):
+            Move.objects.create(game=link.game, origin=origin, target=target,
+                                player_id=link.game.cat_user_id
+                                if ply % 2 == 0 else link.game.mouse_user_id)
+        current.refresh_from_db()
+        self.assertEqual(current.current_round, 1)
+        self.assertEqual(current.entries.filter(score=1).count(), 1)
+
+    def test4(self):
+        """ El comando crea el torneo con los usuarios indicados """
+        out = StringIO()
+        call_command('create_tournament', 'Liga', 'tournament_0',
+                     'tournament_1', 'tournament_2', '--kind', 'round-robin',
+                     stdout=out)
+        current = Tournament.objects.get(name='Liga')
+        self.assertEqual(current.kind, Tournament.ROUND_ROBIN)
+        self.assertEqual(current.entries.count(), 3)
+        self.assertEqual(current.games.count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('create_tournament', 'X', 'tournament_0', 'nadie',
+                         stdout=out)
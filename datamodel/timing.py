@@ -0,0 +1,133 @@
+"""
+    Medición de tiempos por petición. Cada hilo puede tener un colector
+    activo; las funciones decoradas con timed acumulan en él su tiempo de
+    ejecución. Sin colector activo, el decorador solo añade una
+    comprobación.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import functools
+import threading
+import time
+
+_local = threading.local()
+
+
+class Collector(object):
+    """
+        Acumula tiempos y número de llamadas por nombre durante una
+        petición.
+
+        Attributes
+        ----------
+        totals : dict
+            Segundos acumulados por nombre
+        calls : dict
+            Número de llamadas por nombre
+        depth : int
+            Nivel de anidamiento de funciones medidas. Las llamadas
+            anidadas se cuentan dentro de la función exterior.
+
+        Methods
+        -------
+        add(self, name, elapsed)
+            Acumula una medición.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.calls = {}
+        self.depth = 0
+
+    def add(self, name, elapsed):
+        """
+            Acumula una medición.
+
+            Parameters
+            ----------
+            name : str
+                Nombre de la medición
+            elapsed : float
+                Segundos
+
+            Author
+            -------
+                Eric Morales
+        """
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+
+def start():
+    """
+        Activa un colector nuevo en el hilo actual y lo devuelve.
+
+        Returns
+        -------
+        Collector : colector activo
+
+        Author
+        -------
+            Eric Morales
+    """
+    _local.collector = Collector()
+    return _local.collector
+
+
+def stop():
+    """
+        Desactiva el colector del hilo actual y lo devuelve.
+
+        Returns
+        -------
+        Collector : colector que estaba activo (o None)
+
+        Author
+        -------
+            Eric Morales
+    """
+    collector = getattr(_local, 'collector', None)
+    _local.collector = None
+    return collector
+
+
+def timed(name):
+    """
+        Decorador que acumula el tiempo de la función en el colector activo
+        del hilo, bajo el nombre indicado.
+
+        Parameters
+        ----------
+        name : str
+            Nombre de la medición
+
+        Returns
+        -------
+        function : decorador
+
+        Author
+        -------
+            Eric Morales
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            collector = getattr(_local, 'collector', None)
+            if collector is None or collector.depth:
+                return func(*args, **kwargs)
+
+            collector.depth += 1
+            begin = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                collector.depth -= 1
+                collector.add(name, time.perf_counter() - begin)
+
+        return wrapped
+
+    return decorator
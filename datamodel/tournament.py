@@ -0,0 +1,288 @@
+"""
+    Torneos por sistema suizo o de todos contra todos (round robin).
+
+    - create_tournament apunta a los jugadores y empieza la primera ronda.
+    - Cada ronda se empareja en memoria (swiss_pairings o
+      round_robin_pairings) y sus partidas se crean ya activas con
+      bulk_create, sin pasar por Game.save.
+    - Cuando termina una partida del torneo (Game.save llama a
+      game_finished), se suma la victoria en la clasificación y, si era la
+      última de la ronda, se empareja la siguiente o se termina el torneo.
+
+    Los colores se equilibran: de cada pareja juega con los gatos el que lo
+    ha hecho menos veces. Si hay un número impar de jugadores, uno descansa
+    cada ronda y se le suma un punto.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.db import transaction
+from django.db.models import F
+
+from datamodel.bulk import build_game, bulk_create_with_ids
+from datamodel.engine import GameState
+from datamodel.models import Game, GameStatus, Tournament, \
+    TournamentEntry, TournamentGame
+
+
+def default_swiss_rounds(n_players):
+    # Las necesarias para que solo un jugador pueda ganarlas todas
+    return max(1, (n_players - 1).bit_length())
+
+
+def colours(first, second, round_number):
+    """
+        Decide quién juega con los gatos: el que menos veces lo ha hecho
+        respecto a las que ha jugado de PAC. Si están igual, se alterna por
+        ronda.
+
+        Returns
+        -------
+        tuple : (participación del gato, participación del PAC)
+
+        Author
+        -------
+            Eric Morales
+    """
+    first_balance = first.games_as_cat - first.games_as_mouse
+    second_balance = second.games_as_cat - second.games_as_mouse
+    if first_balance < second_balance or \
+            (first_balance == second_balance and round_number % 2 == 1):
+        return first, second
+    return second, first
+
+
+def swiss_pairings(entries, played, round_number):
+    """
+        Emparejamiento suizo: los jugadores se ordenan por puntuación y cada
+        uno se empareja con el siguiente de la lista contra el que no haya
+        jugado todavía. Si hay un número impar, descansa el peor clasificado
+        de los que menos veces lo han hecho.
+
+        Parameters
+        ----------
+        entries : list
+            Participaciones (TournamentEntry) del torneo
+        played : set
+            frozensets con los ids de cada pareja que ya ha jugado
+        round_number : int
+            Ronda que se empareja
+
+        Returns
+        -------
+        tuple : (lista de parejas (gato, PAC), participación que descansa o
+        None)
+
+        Author
+        -------
+            Eric Morales
+    """
+    pending = sorted(entries, key=lambda entry: (-entry.score, entry.id))
+    bye = None
+    if len(pending) % 2 == 1:
+        fewest = min(entry.byes for entry in pending)
+        bye = next(entry for entry in reversed(pending)
+                   if entry.byes == fewest)
+        pending.remove(bye)
+
+    pairs = []
+    while pending:
+        first = pending.pop(0)
+        # Si ya ha jugado contra todos los que quedan, se repite el rival
+        # más cercano en la clasificación
+        second = next((entry for entry in pending
+                       if frozenset((first.id, entry.id)) not in played),
+                      pending[0])
+        pending.remove(second)
+        pairs.append(colours(first, second, round_number))
+    return pairs, bye
+
+
+def round_robin_rounds(n_players):
+    return n_players - 1 if n_players % 2 == 0 else n_players
+
+
+def round_robin_pairings(entries, round_number):
+    """
+        Emparejamiento de todos contra todos por el método del círculo: el
+        primer jugador queda fijo y el resto rota una posición por ronda,
+        así que en round_robin_rounds rondas todos juegan contra todos una
+        vez.
+
+        Returns
+        -------
+        tuple : (lista de parejas (gato, PAC), participación que descansa o
+        None)
+
+        Author
+        -------
+            Eric Morales
+    """
+    players = sorted(entries, key=lambda entry: entry.id)
+    if len(players) % 2 == 1:
+        players.append(None)
+    shift = (round_number - 1) % (len(players) - 1)
+    rest = players[1:]
+    circle = [players[0]] + rest[-shift:] + rest[:-shift] if shift \
+        else players
+
+    pairs = []
+    bye = None
+    half = len(circle) // 2
+    for first, second in zip(circle[:half], reversed(circle[half:])):
+        if first is None or second is None:
+            bye = first or second
+        else:
+            pairs.append(colours(first, second, round_number))
+    return pairs, bye
+
+
+def played_pairs(tournament):
+    """
+        Parejas que ya se han enfrentado en el torneo.
+
+        Returns
+        -------
+        set : frozensets con los ids de las dos participaciones
+
+        Author
+        -------
+            Eric Morales
+    """
+    entry_ids = dict(tournament.entries.values_list('user_id', 'id'))
+    return {frozenset((entry_ids[cat], entry_ids[mouse]))
+            for cat, mouse in TournamentGame.objects.filter(
+                tournament=tournament).values_list(
+                'game__cat_user_id', 'game__mouse_user_id')}
+
+
+def schedule_round(tournament):
+    """
+        Empareja la siguiente ronda y crea sus partidas. Debe llamarse
+        dentro de una transacción con el torneo bloqueado.
+
+        Returns
+        -------
+        int : número de partidas creadas
+
+        Author
+        -------
+            Eric Morales
+    """
+    tournament.current_round += 1
+    round_number = tournament.current_round
+    entries = list(tournament.entries.all())
+    if tournament.kind == Tournament.SWISS:
+        pairs, bye = swiss_pairings(entries, played_pairs(tournament),
+                                    round_number)
+    else:
+        pairs, bye = round_robin_pairings(entries, round_number)
+
+    games = [build_game(cat.user_id, mouse.user_id, [], GameState(), 0)[0]
+             for cat, mouse in pairs]
+    bulk_create_with_ids(Game, games)
+    TournamentGame.objects.bulk_create([
+        TournamentGame(tournament=tournament, round=round_number, game=game)
+        for game in games])
+
+    for cat, mouse in pairs:
+        cat.games_as_cat += 1
+        mouse.games_as_mouse += 1
+    if bye is not None:
+        bye.byes += 1
+        bye.score += 1
+    TournamentEntry.objects.bulk_update(
+        entries, ['games_as_cat', 'games_as_mouse', 'byes', 'score'])
+
+    tournament.status = GameStatus.ACTIVE
+    tournament.save()
+    return len(games)
+
+
+def create_tournament(name, kind, users, rounds=None):
+    """
+        Crea un torneo con los usuarios indicados y empareja la primera
+        ronda.
+
+        Parameters
+        ----------
+        name : str
+            Nombre del torneo
+        kind : int
+            Tournament.SWISS o Tournament.ROUND_ROBIN
+        users : list
+            Usuarios participantes (al menos dos)
+        rounds : int
+            Rondas del torneo suizo (por defecto, default_swiss_rounds). En
+            round robin se juegan siempre round_robin_rounds.
+
+        Returns
+        -------
+        Tournament : torneo creado
+
+        Author
+        -------
+            Eric Morales
+    """
+    users = list(users)
+    if len(users) < 2:
+        raise ValueError("Un torneo necesita al menos dos jugadores")
+    if kind == Tournament.ROUND_ROBIN:
+        rounds = round_robin_rounds(len(users))
+    elif rounds is None:
+        rounds = default_swiss_rounds(len(users))
+
+    with transaction.atomic():
+        tournament = Tournament.objects.create(name=name, kind=kind,
+                                               rounds=rounds)
+        TournamentEntry.objects.bulk_create([
+            TournamentEntry(tournament=tournament, user=user)
+            for user in users])
+        schedule_round(tournament)
+    return tournament
+
+
+def game_finished(game, winner):
+    """
+        Registra el resultado de una partida si es de un torneo. Se llama
+        desde Game.save, en la misma transacción que termina la partida.
+
+        El torneo se bloquea para que, si las dos últimas partidas de la
+        ronda terminan a la vez, una de las dos vea a la otra terminada y
+        empareje la siguiente ronda.
+
+        Parameters
+        ----------
+        game : Game
+            Partida que acaba de terminar
+        winner : int
+            Ganador según check_winner (1 gatos, 2 PAC)
+
+        Author
+        -------
+            Eric Morales
+    """
+    link = TournamentGame.objects.filter(game_id=game.id).first()
+    if link is None:
+        return
+
+    tournament = Tournament.objects.select_for_update().get(
+        id=link.tournament_id)
+    winner_id = game.cat_user_id if winner == 1 else game.mouse_user_id
+    TournamentEntry.objects.filter(tournament=tournament,
+                                   user_id=winner_id).update(
+        score=F('score') + 1)
+
+    if link.round != tournament.current_round or \
+            TournamentGame.objects.filter(
+                tournament=tournament, round=link.round).exclude(
+                game__status=GameStatus.FINISHED).exists():
+        return
+
+    if tournament.current_round >= tournament.rounds:
+        tournament.status = GameStatus.FINISHED
+        tournament.save()
+    else:
+        schedule_round(tournament)
@@ -0,0 +1,469 @@
+"""
+    API versionada de PACCAT. A diferencia de los servicios de views.py, la
+    partida (y el movimiento, en la reproducción) se indican en la url, por
+    lo que no se escribe nada en la sesión: un jugador puede tener varias
+    partidas abiertas a la vez y las respuestas pueden cachearse.
+
+        GET  api/v1/games/<id>/                 estado de la partida
+        POST api/v1/games/<id>/move/            realiza un movimiento
+        GET  api/v1/games/<id>/replay/<ply>/    movimiento número ply
+        GET  api/v1/games/<id>/wait/?since=<v>  espera a un cambio
+        GET  api/v1/users/<username>/stats/     estadísticas de un jugador
+        GET  api/v1/book/?moves=<o-t,o-t...>    libro de aperturas
+        GET  api/v1/positions/?cats=<c,c,c,c>&mouse=<m>&cat_turn=<0|1>
+                                                partidas que han pasado
+                                                por una posición
+        GET  api/v1/heatmaps/                   mapas de calor de las
+                                                casillas
+
+    La espera solo es real con el despliegue ASGI (ratonGato.asgi), donde la
+    atiende logic.consumers.WaitMoveConsumer sin ocupar un hilo; con WSGI
+    devuelve el estado actual inmediatamente.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import hashlib
+import json
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_GET, require_POST
+
+from datamodel import book, clock, heatmap
+from datamodel.models import Game, GamePosition, GameStatus, Move, \
+    UserStats, check_winner
+from datamodel.positions import make_key
+from logic.metrics import REGISTRY
+from logic.notify import notify_game
+
+# Un movimiento de una partida terminada no cambia nunca
+REPLAY_MAX_AGE = 365 * 24 * 3600
+# El libro de aperturas solo cambia al reconstruirlo
+BOOK_MAX_AGE = 3600
+# Partidas por página en la búsqueda por posición
+POSITIONS_PAGE_SIZE = 50
+# Los mapas de calor se actualizan por lotes programados
+HEATMAPS_MAX_AGE = 60
+
+
+def json_response(data, status=200):
+    """
+        Devuelve una respuesta json. Como todas dependen del usuario de la
+        sesión, varían con la cookie.
+
+        Author
+        -------
+            Eric Morales
+    """
+    response = HttpResponse(json.dumps(data), status=status,
+                            content_type="application/json")
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def participant_required(f):
+    """
+        Decorador que obtiene la partida de la url y comprueba que el
+        usuario ha iniciado sesión y es uno de sus jugadores. La vista
+        recibe la partida en lugar de su id.
+
+        Returns
+        -------
+        HttpResponse : 401, 404 o 403 si no se cumple alguna condición, o
+        la respuesta de la vista
+
+        Author
+        -------
+            Eric Morales
+    """
+
+    def wrapped(request, game_id, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response({'status': -2, 'error': 'login'}, 401)
+
+        game = Game.objects.filter(id=game_id).first()
+        if game is None:
+            return json_response({'status': -2, 'error': 'not found'}, 404)
+        if request.user.id not in (game.cat_user_id, game.mouse_user_id):
+            return json_response({'status': -2, 'error': 'forbidden'}, 403)
+        return f(request, game, *args, **kwargs)
+
+    return wrapped
+
+
+def game_version(game):
+    """
+        Versión del estado de una partida. Cada movimiento cambia la posición
+        de una ficha y el turno, así que basta con los campos de la partida.
+
+        Author
+        -------
+            Eric Morales
+    """
+    key = "%d:%d:%d:%d:%d:%d:%d:%d:%s:%s" % (
+        game.id, game.status, game.cat1, game.cat2, game.cat3, game.cat4,
+        game.mouse, game.cat_turn, game.cat_user_id, game.mouse_user_id)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def game_etag(game):
+    return '"%s"' % game_version(game)
+
+
+def state_data(game, user_id):
+    """
+        Estado de la partida visto por un usuario.
+
+        Returns
+        -------
+        dict : diccionario con los campos
+            id: id de la partida
+            version: versión del estado (ver game_version)
+            status: estado de la partida (GameStatus)
+            cats: posiciones de los gatos
+            mouse: posicion del PAC
+            cat_turn: True si es el turno de los gatos
+            my_turn: True si es el turno del usuario
+            winner: 0 sin ganador, 1 gatos, 2 PAC
+            origin, target: último movimiento (-1 si no hay)
+            remaining: segundos que le quedan al jugador que tiene el turno
+                (None si la partida no tiene reloj)
+
+        Author
+        -------
+            Eric Morales
+    """
+    last_move = Move.objects.filter(game=game).order_by('-id').first()
+    turn_user_id = game.cat_user_id if game.cat_turn else game.mouse_user_id
+    return {
+        'id': game.id,
+        'version': game_version(game),
+        'status': game.status,
+        'cats': [game.cat1, game.cat2, game.cat3, game.cat4],
+        'mouse': game.mouse,
+        'cat_turn': game.cat_turn,
+        'my_turn': turn_user_id == user_id,
+        'winner': check_winner(game),
+        'origin': last_move.origin if last_move else -1,
+        'target': last_move.target if last_move else -1,
+        'remaining': clock.remaining(game),
+    }
+
+
+@require_GET
+@participant_required
+def game_state(request, game):
+    """
+        Devuelve el estado de la partida (ver state_data). Admite peticiones
+        condicionales con If-None-Match, en cuyo caso no se consultan los
+        movimientos.
+
+        Author
+        -------
+            Eric Morales
+    """
+    etag = game_etag(game)
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+        patch_vary_headers(response, ['Cookie'])
+    else:
+        response = json_response(state_data(game, request.user.id))
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def play_move(game_id, user_id, origin, target):
+    """
+        Realiza un movimiento de un usuario con las reglas de Move.save. Lo
+        usan la API y el canal WebSocket de la partida
+        (logic.consumers.GameConsumer).
+
+        Returns
+        -------
+        int : status del movimiento, igual que move_service:
+            -1: Movimiento no válido o no es el turno del usuario
+            0: Movimiento ok
+            2: Hay ganador (o se ha agotado el tiempo), finalizar partida
+
+        Author
+        -------
+            Eric Morales
+    """
+    with transaction.atomic():
+        # Bloqueamos la partida para que dos peticiones simultáneas (desde
+        # dos workers) no muevan a partir del mismo estado
+        game = Game.objects.select_for_update().get(id=game_id)
+        if clock.expired(game):
+            game.adjudicate()
+            notify_game(game.id)
+            REGISTRY.inc('paccat_games_finished_total')
+            return 2
+        turn_user_id = game.cat_user_id if game.cat_turn \
+            else game.mouse_user_id
+        if turn_user_id != user_id:
+            return -1
+        try:
+            Move.objects.create(game=game, player_id=user_id, origin=origin,
+                                target=target)
+        except ValidationError:
+            return -1
+
+        REGISTRY.inc('paccat_moves_total')
+        notify_game(game.id)
+        if check_winner(game) != 0:
+            REGISTRY.inc('paccat_games_finished_total')
+            return 2
+        return 0
+
+
+@require_POST
+@participant_required
+def move(request, game):
+    """
+        Realiza un movimiento del usuario en la partida de la url.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Solicitud Http con los campos origin y target
+
+        Returns
+        -------
+        HttpResponse : json con el status del movimiento (ver play_move), o
+        -2 si la petición es incorrecta
+
+        Author
+        -------
+            Eric Morales
+    """
+    try:
+        origin = int(request.POST.get('origin'))
+        target = int(request.POST.get('target'))
+    except (TypeError, ValueError):
+        return json_response({'status': -2}, 400)
+
+    response = json_response({'status': play_move(game.id, request.user.id,
+                                                  origin, target)})
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+@require_GET
+@participant_required
+def replay(request, game, ply):
+    """
+        Devuelve el movimiento número ply (empezando en 0) de una partida
+        terminada. El cursor de la reproducción lo lleva el cliente, por lo
+        que la respuesta solo depende de la url y se puede cachear.
+
+        Returns
+        -------
+        HttpResponse : json con los campos ply, origin, target y plies
+        (número total de movimientos), o 404 si no existe el movimiento
+
+        Author
+        -------
+            Eric Morales
+    """
+    if game.status != GameStatus.FINISHED:
+        return json_response({'status': -2, 'error': 'not finished'}, 409)
+
+    moves = Move.objects.filter(game=game).order_by('id')
+    plies = moves.count()
+    if ply >= plies:
+        return json_response({'status': -2, 'error': 'not found',
+                              'plies': plies}, 404)
+
+    move = moves[ply]
+    response = json_response({'ply': ply, 'origin': move.origin,
+                              'target': move.target, 'plies': plies})
+    patch_cache_control(response, private=True, max_age=REPLAY_MAX_AGE,
+                        immutable=True)
+    return response
+
+
+@require_GET
+@participant_required
+def wait(request, game):
+    """
+        Versión síncrona de la espera de movimientos: devuelve el estado de
+        la partida (ver state_data) sin esperar. Con ASGI la url la atiende
+        antes logic.consumers.WaitMoveConsumer, que sí espera a que cambie
+        la versión indicada en el parámetro since.
+
+        Author
+        -------
+            Eric Morales
+    """
+    response = json_response(state_data(game, request.user.id))
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+def user_stats_or_none(username):
+    """
+        Estadísticas de un jugador leyendo solo UserStats (y su usuario en
+        la misma consulta).
+
+        Returns
+        -------
+        UserStats : estadísticas (sin guardar y a cero si el jugador no ha
+        terminado ninguna partida), o None si no existe el usuario
+
+        Author
+        -------
+            Eric Morales
+    """
+    stats = UserStats.objects.select_related('user').filter(
+        user__username=username).first()
+    if stats is None:
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            return None
+        stats = UserStats(user=user)
+    return stats
+
+
+@require_GET
+def user_stats(request, username):
+    """
+        Devuelve las estadísticas de un jugador (ver UserStats.as_dict).
+
+        Author
+        -------
+            Eric Morales
+    """
+    stats = user_stats_or_none(username)
+    if stats is None:
+        return json_response({'status': -2, 'error': 'not found'}, 404)
+    data = stats.as_dict()
+    data['username'] = stats.user.username
+    return json_response(data)
+
+
+@require_GET
+def opening_book(request):
+    """
+        Qué se ha jugado desde una posición y cómo les fue a los gatos (ver
+        datamodel.book). La posición se indica con los movimientos desde la
+        inicial en el parámetro moves ("0-9,59-50"). Se responde desde el
+        libro en memoria, sin consultar la base de datos.
+
+        Returns
+        -------
+        HttpResponse : json con los campos de OpeningBook.node_data (games
+        0 si ninguna partida del libro pasa por la posición), o -2 si los
+        movimientos no son válidos
+
+        Author
+        -------
+            Eric Morales
+    """
+    try:
+        path = book.parse_path(request.GET.get('moves', ''))
+    except ValueError:
+        return json_response({'status': -2}, 400)
+
+    current = book.get_book()
+    node = current.find(path)
+    if node is None:
+        data = {'games': 0, 'cat_wins': 0, 'moves': []}
+    else:
+        data = current.node_data(node)
+    response = json_response(data)
+    patch_cache_control(response, public=True, max_age=BOOK_MAX_AGE)
+    return response
+
+
+def parse_position(params):
+    """
+        Clave de la posición indicada en los parámetros cats (cuatro
+        casillas separadas por comas), mouse y cat_turn (1 si mueven los
+        gatos).
+
+        Raises
+        -------
+        ValueError
+            Si falta algún parámetro o no es válido
+
+        Author
+        -------
+            Eric Morales
+    """
+    cats = [int(cat) for cat in params.get('cats', '').split(',')]
+    mouse = int(params.get('mouse'))
+    cat_turn = int(params.get('cat_turn', 1))
+    if len(cats) != 4 or cat_turn not in (0, 1) or \
+            not all(0 <= cell < 64 for cell in cats + [mouse]):
+        raise ValueError("Posición no válida")
+    return make_key(cats, mouse, cat_turn)
+
+
+@require_GET
+def positions(request):
+    """
+        Partidas que han pasado por una posición (ver parse_position), en
+        orden de id y de POSITIONS_PAGE_SIZE en POSITIONS_PAGE_SIZE. La
+        página siguiente se pide con after=<next>. Cada página es un
+        recorrido del índice (key, game) de GamePosition.
+
+        Returns
+        -------
+        HttpResponse : json con los campos
+            key: clave de la posición
+            games: lista de dicts (id, ply, status, cat_user, mouse_user)
+            next: cursor de la página siguiente, o None si no hay más
+
+        Author
+        -------
+            Eric Morales
+    """
+    if not request.user.is_authenticated:
+        return json_response({'status': -2, 'error': 'login'}, 401)
+    try:
+        key = parse_position(request.GET)
+        after = int(request.GET.get('after', 0))
+    except (TypeError, ValueError):
+        return json_response({'status': -2}, 400)
+
+    rows = list(GamePosition.objects.filter(
+        key=key, game_id__gt=after).order_by('game_id').values_list(
+        'game_id', 'ply', 'game__status', 'game__cat_user__username',
+        'game__mouse_user__username')[:POSITIONS_PAGE_SIZE + 1])
+    games = [{'id': game_id, 'ply': ply, 'status': status,
+              'cat_user': cat_user, 'mouse_user': mouse_user}
+             for game_id, ply, status, cat_user, mouse_user
+             in rows[:POSITIONS_PAGE_SIZE]]
+    next_cursor = games[-1]['id'] if len(rows) > POSITIONS_PAGE_SIZE \
+        else None
+    response = json_response({'key': key, 'games': games,
+                              'next': next_cursor})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_GET
+def heatmaps(request):
+    """
+        Mapas de calor de ocupación de las casillas por pieza, ganador y
+        tramo de movimientos (ver datamodel.heatmap). Cada mapa son 64
+        contadores, con la casilla como índice.
+
+        Returns
+        -------
+        HttpResponse : json con los campos de heatmap.heatmap_data
+
+        Author
+        -------
+            Eric Morales
+    """
+    response = json_response(heatmap.heatmap_data())
+    patch_cache_control(response, public=True, max_age=HEATMAPS_MAX_AGE)
+    return response
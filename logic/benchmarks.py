@@ -0,0 +1,282 @@
+"""
+    Microbenchmarks de las reglas de datamodel, del guardado de modelos y
+    de las vistas (llamadas con el cliente de test). Se ejecutan con el
+    comando bench y se comparan con bench_compare.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import Client
+from django.urls import reverse
+
+from datamodel import constants
+from datamodel.models import Game, Move, check_winner, \
+    valid_move, validate_position
+from datamodel.sample_games import CAT_WIN_MOVES
+from logic.board_cache import LOCAL_CACHE, game_board
+from logic.views import create_board_from_game
+
+BENCHMARKS = []
+
+
+def benchmark(name, number=1000):
+    """
+        Decorador que registra un benchmark. La función decorada recibe el
+        contexto (ver Context) y devuelve la función sin argumentos que se
+        va a medir.
+
+        Parameters
+        ----------
+        name : str
+            Nombre del benchmark
+        number : int
+            Llamadas por repetición
+
+        Author
+        -------
+            Eric Morales
+    """
+
+    def decorator(setup):
+        BENCHMARKS.append((name, number, setup))
+        return setup
+
+    return decorator
+
+
+class Context(object):
+    """
+        Datos compartidos por los benchmarks: dos usuarios, una partida
+        activa, una terminada y un cliente con sesión iniciada para cada
+        usuario.
+    """
+
+    def __init__(self):
+        self.cat_user, _ = User.objects.get_or_create(username='bench_cat')
+        self.mouse_user, _ = User.objects.get_or_create(
+            username='bench_mouse')
+
+        self.active = Game.objects.create(cat_user=self.cat_user,
+                                          mouse_user=self.mouse_user)
+        self.finished = Game.objects.create(cat_user=self.cat_user,
+                                            mouse_user=self.mouse_user)
+        for ply, (origin, target) in enumerate(CAT_WIN_MOVES):
+            Move.objects.create(game=self.finished, origin=origin,
+                                target=target,
+                                player=self.cat_user if ply % 2 == 0
+                                else self.mouse_user)
+
+        # Algunas partidas más para que las listas no estén vacías
+        for _ in range(10):
+            Game.objects.create(cat_user=self.cat_user,
+                                mouse_user=self.mouse_user)
+            Game.objects.create(cat_user=self.mouse_user)
+
+        self.cat_client = Client()
+        self.cat_client.force_login(self.cat_user)
+        self.mouse_client = Client()
+        self.mouse_client.force_login(self.mouse_user)
+        self.anonymous_client = Client()
+
+    def select(self, client, game):
+        session = client.session
+        session[constants.GAME_SELECTED_SESSION_ID] = game.id
+        session.save()
+
+
+@benchmark('validate_position', number=2000)
+def bench_validate_position(ctx):
+    def run():
+        for cell in range(Game.MIN_CELL, Game.MAX_CELL + 1):
+            try:
+                validate_position(cell)
+            except ValidationError:
+                pass
+
+    return run
+
+
+@benchmark('valid_move', number=20000)
+def bench_valid_move(ctx):
+    game = Game(cat_user=ctx.cat_user, mouse_user=ctx.mouse_user)
+
+    def run():
+        valid_move(game, 0, 9)
+        try:
+            valid_move(game, 0, 8)
+        except ValidationError:
+            pass
+
+    return run
+
+
+@benchmark('check_winner', number=2000)
+def bench_check_winner(ctx):
+    game = Game(cat_user=ctx.cat_user, mouse_user=ctx.mouse_user,
+                cat_turn=False)
+
+    def run():
+        check_winner(game)
+
+    return run
+
+
+@benchmark('create_board_from_game', number=20000)
+def bench_create_board(ctx):
+    def run():
+        create_board_from_game(ctx.active)
+
+    return run
+
+
+@benchmark('game_board', number=20000)
+def bench_game_board(ctx):
+    def run():
+        game_board(ctx.active)
+
+    return run
+
+
+@benchmark('game_board:miss', number=2000)
+def bench_game_board_miss(ctx):
+    def run():
+        LOCAL_CACHE.clear()
+        game_board(ctx.active)
+
+    return run
+
+
+@benchmark('Game.save', number=200)
+def bench_game_save(ctx):
+    def run():
+        ctx.active.save()
+
+    return run
+
+
+@benchmark('Move.save', number=100)
+def bench_move_save(ctx):
+    game = Game.objects.create(cat_user=ctx.cat_user,
+                               mouse_user=ctx.mouse_user)
+
+    def run():
+        # Movimiento de ida y vuelta del PAC tras el del gato, para que
+        # la partida pueda seguir indefinidamente
+        if game.cat_turn:
+            origin = game.cat1
+            Move.objects.create(game=game, player=ctx.cat_user,
+                                origin=origin, target=origin + 9)
+        else:
+            target = 50 if game.mouse == 59 else 59
+            Move.objects.create(game=game, player=ctx.mouse_user,
+                                origin=game.mouse, target=target)
+        if game.cat1 > 40:
+            Game.objects.filter(id=game.id).update(cat1=0)
+            game.cat1 = 0
+
+    return run
+
+
+def view_benchmark(name, method, url_name, client='cat', number=100,
+                   data=None, select=None, **kwargs):
+    """
+        Registra un benchmark que llama a una vista con el cliente de test.
+
+        Author
+        -------
+            Eric Morales
+    """
+
+    @benchmark('view:' + name, number=number)
+    def setup(ctx):
+        http = getattr(ctx, client + '_client')
+        if select:
+            ctx.select(http, getattr(ctx, select))
+        url = reverse(url_name, kwargs={
+            key: getattr(ctx, value).id if isinstance(value, str) else value
+            for key, value in kwargs.items()})
+        call = getattr(http, method)
+
+        def run():
+            response = call(url, data or {})
+            if response.status_code >= 500:
+                raise RuntimeError("%s devuelve %d" % (
+                    url, response.status_code))
+
+        return run
+
+    return setup
+
+
+view_benchmark('index', 'get', 'index')
+view_benchmark('counter', 'get', 'counter')
+view_benchmark('login', 'get', 'login', client='anonymous')
+view_benchmark('select_game_playing', 'get', 'select_game', tipo=1)
+view_benchmark('select_game_join', 'get', 'select_game', client='mouse',
+               tipo=2)
+view_benchmark('select_game_finished', 'get', 'select_game', tipo=3)
+view_benchmark('show_game', 'get', 'show_game', select='active')
+view_benchmark('turn', 'post', 'turn', game_id='active', number=200)
+view_benchmark('move_rejected', 'post', 'move', select='active',
+               data={'origin': 0, 'target': 1}, number=200)
+view_benchmark('create_only_board', 'get', 'create_only_board',
+               game_id='active')
+view_benchmark('reproduce_game', 'get', 'reproduce_game',
+               select='finished')
+view_benchmark('get_move', 'post', 'get_move', select='finished',
+               data={'shift': 1}, number=200)
+
+
+def run_benchmarks(names=None, repeat=5, scale=1.0, output=None):
+    """
+        Ejecuta los benchmarks sobre la base de datos actual.
+
+        Parameters
+        ----------
+        names : list (default None)
+            Subconjunto de benchmarks a ejecutar (por defecto todos)
+        repeat : int
+            Repeticiones de cada benchmark
+        scale : float
+            Factor que multiplica el número de llamadas por repetición
+        output : callable
+            Función que recibe una línea de progreso
+
+        Returns
+        -------
+        dict : nombre -> {'min_us', 'median_us', 'number', 'repeat'}
+
+        Author
+        -------
+            Eric Morales
+    """
+    ctx = Context()
+    results = {}
+    for name, number, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        run = setup(ctx)
+        number = max(1, int(number * scale))
+        run()
+
+        timings = []
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            for _ in range(number):
+                run()
+            timings.append((time.perf_counter() - begin) / number * 1e6)
+
+        results[name] = {'min_us': round(min(timings), 3),
+                         'median_us': round(statistics.median(timings), 3),
+                         'number': number, 'repeat': repeat}
+        if output:
+            output("%-28s %12.2f us (min %.2f us)" % (
+                name, results[name]['median_us'], results[name]['min_us']))
+    return results
@@ -0,0 +1,195 @@
+"""
+    Caché del html del tablero (mouse_cat/board.html). El tablero solo
+    depende de la posición de las fichas, y en las partidas se repiten
+    muchas posiciones (empezando por la inicial), así que se guarda el html
+    ya generado por posición:
+
+        - en una caché LRU en memoria de cada proceso (settings.
+          BOARD_CACHE_SIZE entradas)
+        - opcionalmente, en una caché compartida entre procesos
+          (settings.BOARD_CACHE, alias de settings.CACHES)
+
+    La clave incluye un hash de la plantilla, así que al desplegar una
+    versión distinta de board.html no se usan los tableros antiguos de la
+    caché compartida.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from logic.metrics import record_cache
+
+BOARD_TEMPLATE = 'mouse_cat/board.html'
+
+# Posición inicial de los gatos y del PAC
+INITIAL_CATS = (0, 2, 4, 6)
+INITIAL_MOUSE = 59
+
+
+class LRUCache(object):
+    """
+        Caché en memoria que descarta la entrada usada hace más tiempo
+        cuando se llena. Se comparte entre los hilos del proceso.
+
+        Methods
+        -------
+        get(self, key)
+            Devuelve el valor de la clave (o None) y la marca como usada.
+        set(self, key, value)
+            Guarda un valor, descartando el más antiguo si no cabe.
+        clear(self)
+            Vacía la caché.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+LOCAL_CACHE = LRUCache(getattr(settings, 'BOARD_CACHE_SIZE', 1024))
+
+_template = None
+_template_hash = None
+
+
+def board_rows(cats, mouse):
+    """
+        Tablero como lista de 8 filas de 8 casillas: 1-4 para cada gato, -1
+        para el PAC y 0 si está vacía.
+
+        Parameters
+        ----------
+        cats : tuple
+            Posiciones de los cuatro gatos, en orden
+        mouse : int
+            Posición del PAC
+
+        Author
+        -------
+            Eric Morales
+    """
+    board = [0] * 64
+    for number, cat in enumerate(cats, 1):
+        board[cat] = number
+    board[mouse] = -1
+    return [board[c: c + 8] for c in range(0, 64, 8)]
+
+
+def board_key(cats, mouse):
+    """
+        Clave de un tablero. Cada gato tiene su imagen, así que importa la
+        posición de cada uno y no solo el conjunto; el turno no cambia el
+        html y no forma parte de la clave.
+
+        Author
+        -------
+            Eric Morales
+    """
+    global _template, _template_hash
+    if _template_hash is None:
+        _template = get_template(BOARD_TEMPLATE)
+        _template_hash = hashlib.sha1(
+            _template.template.source.encode()).hexdigest()[:8]
+    return "board:%s:%s:%d" % (_template_hash,
+                               ",".join(str(cat) for cat in cats), mouse)
+
+
+def shared_cache():
+    alias = getattr(settings, 'BOARD_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def render_board(cats, mouse):
+    """
+        Devuelve el html del tablero para una posición, de la caché si
+        está. Los aciertos y fallos se ven en /metrics (caché "board" para
+        la local y "board_shared" para la compartida).
+
+        Parameters
+        ----------
+        cats : tuple
+            Posiciones de los cuatro gatos, en orden
+        mouse : int
+            Posición del PAC
+
+        Returns
+        -------
+        SafeString : html del tablero
+
+        Author
+        -------
+            Eric Morales
+    """
+    cats = tuple(cats)
+    key = board_key(cats, mouse)
+    html = LOCAL_CACHE.get(key)
+    record_cache('board', html is not None)
+    if html is not None:
+        return mark_safe(html)
+
+    shared = shared_cache()
+    if shared is not None:
+        html = shared.get(key)
+        record_cache('board_shared', html is not None)
+
+    if html is None:
+        html = _template.render({'board': board_rows(cats, mouse)})
+        if shared is not None:
+            shared.set(key, str(html), None)
+    LOCAL_CACHE.set(key, str(html))
+    return mark_safe(html)
+
+
+def game_board(game):
+    """
+        html del tablero de una partida (ver render_board).
+
+        Author
+        -------
+            Eric Morales
+    """
+    return render_board((game.cat1, game.cat2, game.cat3, game.cat4),
+                        game.mouse)
+
+
+def initial_board():
+    """
+        html del tablero en la posición inicial (ver render_board).
+
+        Author
+        -------
+            Eric Morales
+    """
+    return render_board(INITIAL_CATS, INITIAL_MOUSE)
@@ -0,0 +1,244 @@
+"""
+    Capa de canales en ficheros, para varios procesos de una misma máquina
+    (p.ej. varios workers de daphne) sin un servidor Redis. Hace lo mismo
+    que channels_redis a escala local: settings.CHANNEL_LAYER_DIR la activa.
+
+    Cada canal es un directorio con un fichero por mensaje, y cada grupo un
+    directorio con un fichero vacío por canal suscrito:
+
+        <directory>/channels/<canal>/<us>-<n>-<uuid>.json
+        <directory>/groups/<grupo>/<canal>
+
+    Los directorios se borran en cuanto se quedan vacíos, así que los
+    canales de vida corta (uno por cada espera) no dejan rastro.
+
+    Los mensajes se escriben en un fichero temporal que luego se renombra, y
+    quien los recibe los renombra antes de leerlos, así que cada mensaje lo
+    lee un único receptor. La antigüedad de los mensajes y de las
+    suscripciones se mide con la fecha de modificación de los ficheros.
+    Como en channels_redis, los mensajes se serializan (aquí en json).
+
+    receive no recibe avisos: cada receptor consulta su directorio, primero
+    cada poll_interval segundos y, mientras no llega nada, cada vez más
+    despacio, hasta max_poll_interval (así que un mensaje puede tardar
+    hasta ese tiempo en recibirse). Un receptor inactivo cuesta una
+    consulta al directorio por segundo, lo que vale para cientos de esperas
+    en una máquina; para miles hay que usar channels_redis.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+# Desempata los mensajes de un proceso enviados en el mismo microsegundo
+_sequence = itertools.count()
+
+
+class FileChannelLayer(BaseChannelLayer):
+    """
+        Capa de canales compartida entre procesos mediante ficheros.
+
+        Methods
+        -------
+        send(self, channel, message)
+            Envía un mensaje a un canal.
+        receive(self, channel)
+            Espera al primer mensaje de un canal.
+        new_channel(self, prefix)
+            Nombre de un canal nuevo, propio del proceso.
+        group_add(self, group, channel)
+        group_discard(self, group, channel)
+        group_send(self, group, message)
+        flush(self)
+            Borra todos los mensajes y grupos.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, directory=None, expiry=60, group_expiry=86400,
+                 capacity=100, channel_capacity=None, poll_interval=0.05,
+                 max_poll_interval=1.0, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(channel_capacity or
+                                                        {})
+        self.directory = directory or os.path.join(tempfile.gettempdir(),
+                                                   'paccat_channels')
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval)
+
+    def channel_dir(self, channel):
+        return os.path.join(self.directory, 'channels', channel)
+
+    def group_dir(self, group):
+        return os.path.join(self.directory, 'groups', group)
+
+    def remove_if_empty(self, directory):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            # No existe o le queda algo
+            pass
+
+    def pending(self, directory):
+        """
+            Mensajes de un canal, del más antiguo al más reciente. Los
+            caducados se borran.
+
+            Returns
+            -------
+            list : rutas de los mensajes
+
+            Author
+            -------
+                Eric Morales
+        """
+        try:
+            names = sorted(name for name in os.listdir(directory)
+                           if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+        oldest = time.time() - self.expiry
+        paths = []
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < oldest:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                # Otro receptor se lo ha llevado
+                continue
+            paths.append(path)
+        return paths
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert '__asgi_channel__' not in message
+
+        directory = self.channel_dir(channel)
+        if len(self.pending(directory)) >= self.get_capacity(channel):
+            raise ChannelFull(channel)
+        name = '%017d-%010d-%s.json' % (int(time.time() * 1e6),
+                                        next(_sequence), uuid.uuid4().hex)
+        while True:
+            os.makedirs(directory, exist_ok=True)
+            try:
+                with tempfile.NamedTemporaryFile('w', dir=directory,
+                                                 suffix='.tmp',
+                                                 delete=False) as f:
+                    json.dump(message, f)
+                os.replace(f.name, os.path.join(directory, name))
+                return
+            except FileNotFoundError:
+                # El receptor ha borrado el directorio vacío entre medias
+                continue
+
+    def take(self, channel):
+        """
+            Saca el primer mensaje de un canal, si lo hay.
+
+            Returns
+            -------
+            dict : mensaje, o None si el canal está vacío
+
+            Author
+            -------
+                Eric Morales
+        """
+        for path in self.pending(self.channel_dir(channel)):
+            taken = '%s.%s' % (path, uuid.uuid4().hex)
+            try:
+                os.rename(path, taken)
+            except FileNotFoundError:
+                continue
+            try:
+                with open(taken) as f:
+                    return json.load(f)
+            finally:
+                os.remove(taken)
+                self.remove_if_empty(self.channel_dir(channel))
+        self.remove_if_empty(self.channel_dir(channel))
+        return None
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        interval = self.poll_interval
+        while True:
+            message = self.take(channel)
+            if message is not None:
+                return message
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+
+    async def new_channel(self, prefix='specific.'):
+        return '%s.file!%s' % (prefix, uuid.uuid4().hex)
+
+    async def flush(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    async def close(self):
+        pass
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        directory = self.group_dir(group)
+        path = os.path.join(directory, channel)
+        while True:
+            os.makedirs(directory, exist_ok=True)
+            try:
+                with open(path, 'a'):
+                    pass
+                # La suscripción se renueva cada vez que se vuelve a añadir
+                os.utime(path)
+                return
+            except FileNotFoundError:
+                # Otro proceso ha borrado el grupo vacío entre medias
+                continue
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        directory = self.group_dir(group)
+        try:
+            os.remove(os.path.join(directory, channel))
+        except FileNotFoundError:
+            pass
+        self.remove_if_empty(directory)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_group_name(group), "Group name not valid"
+        directory = self.group_dir(group)
+        try:
+            channels = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        oldest = time.time() - self.group_expiry
+        for channel in channels:
+            path = os.path.join(directory, channel)
+            try:
+                if os.path.getmtime(path) < oldest:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            try:
+                await self.send(channel, message)
+            except ChannelFull:
+                pass
+        self.remove_if_empty(directory)
@@ -0,0 +1,197 @@
+"""
+    Consumidores asíncronos de PACCAT para el despliegue ASGI (ver
+    ratonGato.asgi).
+        - WaitMoveConsumer
+        - GameConsumer
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs, urlparse
+
+from channels.db import database_sync_to_async
+from channels.generic.http import AsyncHttpConsumer
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.http.request import validate_host
+
+from datamodel.models import Game
+from logic.api import play_move, state_data
+from logic.notify import game_group
+
+
+@database_sync_to_async
+def load_state(user, game_id):
+    """
+        Obtiene el estado de la partida para el usuario, con las mismas
+        comprobaciones que logic.api.participant_required.
+
+        Returns
+        -------
+        tuple : (código HTTP, diccionario con el estado o el error)
+
+        Author
+        -------
+            Eric Morales
+    """
+    if not user.is_authenticated:
+        return 401, {'status': -2, 'error': 'login'}
+    game = Game.objects.filter(id=game_id).first()
+    if game is None:
+        return 404, {'status': -2, 'error': 'not found'}
+    if user.id not in (game.cat_user_id, game.mouse_user_id):
+        return 403, {'status': -2, 'error': 'forbidden'}
+    return 200, state_data(game, user.id)
+
+
+def same_origin(scope):
+    """
+        Comprueba que la cabecera Origin de una conexión WebSocket es uno de
+        los settings.ALLOWED_HOSTS. El navegador envía la cookie de sesión a
+        cualquier página que abra el socket, así que sin esta comprobación
+        otra web podría mover por el jugador.
+
+        Author
+        -------
+            Eric Morales
+    """
+    origin = dict(scope.get('headers', [])).get(b'origin')
+    if not origin:
+        return False
+    host = urlparse(origin.decode('latin1')).hostname
+    allowed = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed:
+        allowed = ['localhost', '127.0.0.1', '[::1]']
+    return bool(host) and validate_host(host, allowed)
+
+
+class WaitMoveConsumer(AsyncHttpConsumer):
+    """
+        Espera a que cambie el estado de una partida:
+
+            GET api/v1/games/<id>/wait/?since=<version>
+
+        Si la versión actual es distinta de since, responde inmediatamente.
+        Si no, se suscribe al grupo de la partida y responde cuando llega un
+        aviso (logic.notify.notify_game) o cuando pasan
+        settings.WAIT_MOVE_TIMEOUT segundos. Mientras espera no ocupa ningún
+        hilo, así que un proceso puede atender miles de jugadores esperando.
+        La respuesta es la misma que la de logic.api.wait.
+
+        Methods
+        -------
+        handle(self, body)
+            Atiende la petición.
+    """
+
+    async def handle(self, body):
+        game_id = int(self.scope['url_route']['kwargs']['game_id'])
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        since = query.get('since', [''])[0]
+        user = self.scope['user']
+
+        # Nos suscribimos antes de leer el estado para no perder un aviso
+        # que llegue entre la lectura y la espera. Usamos un canal propio,
+        # ya que el bucle del consumidor no recibe mensajes hasta que
+        # handle termina
+        layer = self.channel_layer
+        group = game_group(game_id)
+        channel = await layer.new_channel()
+        await layer.group_add(group, channel)
+        try:
+            status, data = await load_state(user, game_id)
+            if status == 200 and data['version'] == since:
+                try:
+                    await asyncio.wait_for(
+                        layer.receive(channel),
+                        getattr(settings, 'WAIT_MOVE_TIMEOUT', 25))
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    status, data = await load_state(user, game_id)
+        finally:
+            await layer.group_discard(group, channel)
+            # La capa en memoria guarda una cola por canal
+            getattr(layer, 'channels', {}).pop(channel, None)
+
+        await self.send_response(status, json.dumps(data).encode(), headers=[
+            (b'Content-Type', b'application/json'),
+            (b'Cache-Control', b'no-store'),
+        ])
+
+
+class GameConsumer(AsyncJsonWebsocketConsumer):
+    """
+        Canal WebSocket de una partida (ws/games/<id>/). Sustituye al POST
+        de movimientos y a la espera del turno con una sola conexión.
+
+        Mensajes del cliente:
+            {"type": "move", "origin": o, "target": t}
+
+        Mensajes del servidor:
+            {"type": "state", ...}      estado (ver logic.api.state_data),
+                                        al conectar y tras cada cambio
+            {"type": "move", "status": s}  resultado de un movimiento (ver
+                                        logic.api.play_move)
+            {"type": "error", "error": e}  mensaje incorrecto
+
+        Los cambios llegan a través del grupo de la partida en la capa de
+        canales, así que los dos jugadores pueden estar en procesos
+        distintos si la capa es compartida.
+
+        Methods
+        -------
+        connect(self)
+            Comprueba el usuario, se suscribe y envía el estado.
+        receive_json(self, content)
+            Atiende un mensaje del cliente.
+        game_update(self, message)
+            Envía el estado nuevo tras un aviso de logic.notify.
+    """
+
+    group = None
+
+    async def connect(self):
+        self.game_id = int(self.scope['url_route']['kwargs']['game_id'])
+        self.user = self.scope['user']
+        if not same_origin(self.scope):
+            await self.close()
+            return
+        status, data = await load_state(self.user, self.game_id)
+        if status != 200:
+            await self.close(code=4000 + status)
+            return
+
+        self.group = game_group(self.game_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        await self.send_json(dict(data, type='state'))
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group,
+                                                   self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict) or content.get('type') != 'move':
+            await self.send_json({'type': 'error', 'error': 'unknown'})
+            return
+        try:
+            origin = int(content['origin'])
+            target = int(content['target'])
+        except (KeyError, TypeError, ValueError):
+            await self.send_json({'type': 'move', 'status': -2})
+            return
+
+        status = await database_sync_to_async(play_move)(
+            self.game_id, self.user.id, origin, target)
+        await self.send_json({'type': 'move', 'status': status})
+
+    async def game_update(self, message):
+        status, data = await load_state(self.user, self.game_id)
+        if status == 200:
+            await self.send_json(dict(data, type='state'))
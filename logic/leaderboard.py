@@ -0,0 +1,98 @@
+"""
+    Páginas de la clasificación (ver Rating.objects.top).
+
+    Cada página se identifica por un cursor con la puntuación y el id de su
+    última fila y la posición en la que termina:
+
+        leaderboard/?after=1532.25_17_20
+
+    Las primeras settings.LEADERBOARD_CACHED_PAGES páginas, que son las que
+    más se consultan, se guardan en la caché durante
+    settings.LEADERBOARD_CACHE_TIMEOUT segundos; la puntuación cambia al
+    terminar cada partida, así que la clasificación puede ir unos segundos
+    por detrás.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from datamodel.models import Rating
+from logic.metrics import record_cache
+
+
+def parse_cursor(value):
+    """
+        Interpreta el parámetro after.
+
+        Returns
+        -------
+        tuple : ((rating, id), posición), o (None, 0) para la primera página
+        o un cursor no válido
+
+        Author
+        -------
+            Eric Morales
+    """
+    try:
+        rating, rating_id, rank = value.split('_')
+        return (float(rating), int(rating_id)), max(int(rank), 0)
+    except (AttributeError, ValueError):
+        return None, 0
+
+
+def make_cursor(row):
+    return "%r_%d_%d" % (row['rating'], row['id'], row['rank'])
+
+
+def load_page(after, rank, size):
+    """
+        Lee una página de la base de datos.
+
+        Returns
+        -------
+        tuple : (filas, cursor de la página siguiente o None)
+
+        Author
+        -------
+            Eric Morales
+    """
+    ratings = list(Rating.objects.top(size + 1, after))
+    rows = [{'id': rating.id, 'rank': rank + position,
+             'username': rating.user.username, 'rating': rating.rating,
+             'games': rating.games, 'wins': rating.wins}
+            for position, rating in enumerate(ratings[:size], 1)]
+    next_cursor = make_cursor(rows[-1]) if len(ratings) > size else None
+    return rows, next_cursor
+
+
+def leaderboard_page(cursor=None):
+    """
+        Página de la clasificación que empieza después del cursor, de la
+        caché si es una de las primeras.
+
+        Returns
+        -------
+        tuple : (filas, cursor de la página siguiente o None)
+
+        Author
+        -------
+            Eric Morales
+    """
+    size = settings.LEADERBOARD_PAGE_SIZE
+    after, rank = parse_cursor(cursor)
+    if rank >= size * settings.LEADERBOARD_CACHED_PAGES:
+        return load_page(after, rank, size)
+
+    key = "leaderboard:%d:%s" % (size, make_cursor(
+        {'rating': after[0], 'id': after[1], 'rank': rank})
+        if after else 'first')
+    page = cache.get(key)
+    record_cache('leaderboard', page is not None)
+    if page is None:
+        page = load_page(after, rank, size)
+        cache.set(key, page, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return page
@@ -0,0 +1,122 @@
+"""
+    Comando que ejecuta los microbenchmarks (ver logic.benchmarks) sobre una
+    base de datos de test desechable y guarda los resultados en un fichero
+    JSON, indexados por el commit actual.
+
+        python manage.py bench
+        python manage.py bench --only valid_move check_winner
+        python manage.py bench --keep-db
+
+    Con --keep-db se reutiliza la base de datos de test entre ejecuciones,
+    como en "manage.py test --keepdb"; la base de datos configurada no se
+    toca nunca.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import datetime
+import json
+import os
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+
+from logic.benchmarks import run_benchmarks
+
+DEFAULT_OUTPUT = os.path.join(settings.BASE_DIR, 'bench_results.json')
+
+
+def current_commit():
+    """
+        Devuelve el commit actual (con el sufijo -dirty si hay cambios sin
+        guardar), o "unknown" si no estamos en un repositorio git.
+
+        Author
+        -------
+            Eric Morales
+    """
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def load_results(path):
+    """
+        Carga el fichero de resultados (vacío si no existe).
+
+        Author
+        -------
+            Eric Morales
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class Command(BaseCommand):
+    help = "Ejecuta los microbenchmarks y guarda los resultados por commit."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+',
+                            help="Benchmarks a ejecutar")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Multiplica las llamadas por repetición")
+        parser.add_argument('--output', default=DEFAULT_OUTPUT)
+        parser.add_argument('--commit', default=None,
+                            help="Clave con la que guardar los resultados "
+                                 "(por defecto, el commit actual)")
+        parser.add_argument('--keep-db', action='store_true',
+                            help="Reutiliza la base de datos de test y no la "
+                                 "borra al terminar")
+
+    def handle(self, *args, **options):
+        # Igual que al ejecutar los tests: el cliente de test usa el host
+        # "testserver", que no está en ALLOWED_HOSTS
+        try:
+            setup_test_environment()
+            test_environment = True
+        except RuntimeError:
+            # Ya estamos dentro de los tests, con su base de datos
+            test_environment = False
+        # Los benchmarks crean usuarios y partidas: nunca se ejecutan sobre
+        # la base de datos configurada, siempre sobre la de test
+        old_name = None
+        if test_environment:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=options['keep_db'])
+        try:
+            results = run_benchmarks(options['only'], options['repeat'],
+                                     options['scale'], self.stdout.write)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options['keep_db'])
+            if test_environment:
+                teardown_test_environment()
+
+        commit = options['commit'] or current_commit()
+        data = load_results(options['output'])
+        entry = data.setdefault(commit, {'results': {}})
+        entry['date'] = datetime.datetime.utcnow().isoformat()
+        entry['results'].update(results)
+        with open(options['output'], 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        self.stdout.write("Resultados guardados como %s en %s" % (
+            commit, options['output']))
@@ -0,0 +1,66 @@
+"""
+    Comando que compara dos ejecuciones del comando bench y marca las
+    regresiones que superan un umbral.
+
+        python manage.py bench_compare                # dos últimas
+        python manage.py bench_compare abc1234 def5678 --threshold 10
+
+    Termina con error si hay alguna regresión, para poder usarlo en CI.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from logic.management.commands.bench import DEFAULT_OUTPUT, load_results
+
+
+class Command(BaseCommand):
+    help = "Compara dos ejecuciones de bench y marca las regresiones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', nargs='?',
+                            help="Commit de referencia (por defecto, la "
+                                 "penúltima ejecución)")
+        parser.add_argument('head', nargs='?',
+                            help="Commit a comparar (por defecto, la última "
+                                 "ejecución)")
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help="Porcentaje de empeoramiento de la mediana "
+                                 "que se considera regresión")
+        parser.add_argument('--input', default=DEFAULT_OUTPUT)
+
+    def handle(self, *args, **options):
+        data = load_results(options['input'])
+        by_date = sorted(data, key=lambda commit: data[commit].get('date',
+                                                                   ''))
+        head = options['head'] or (by_date[-1] if by_date else None)
+        base = options['base'] or (by_date[-2] if len(by_date) > 1
+                                   else None)
+        for commit in (base, head):
+            if commit not in data:
+                raise CommandError("No hay resultados para %s en %s" % (
+                    commit, options['input']))
+
+        base_results = data[base]['results']
+        head_results = data[head]['results']
+        regressions = []
+        self.stdout.write("%-28s %12s %12s %9s" % (
+            "benchmark", base, head, "cambio"))
+        for name in sorted(set(base_results) & set(head_results)):
+            before = base_results[name]['median_us']
+            after = head_results[name]['median_us']
+            change = (after - before) / before * 100 if before else 0.0
+            flag = ""
+            if change > options['threshold']:
+                regressions.append(name)
+                flag = "  REGRESIÓN"
+            self.stdout.write("%-28s %10.2fus %10.2fus %+8.1f%%%s" % (
+                name, before, after, change, flag))
+
+        if regressions:
+            raise CommandError("%d regresiones por encima del %.1f%%: %s" % (
+                len(regressions), options['threshold'],
+                ", ".join(regressions)))
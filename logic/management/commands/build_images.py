@@ -0,0 +1,197 @@
+"""
+    Comando que prepara las imágenes de static antes de collectstatic.
+
+        python manage.py build_images
+
+    - Junta las fichas del tablero (img/personajes) y los iconos
+      (img/icons) en una imagen por carpeta (img/sprites/<carpeta>.png) y
+      genera css/sprites.css con una clase por imagen:
+
+          <span class="sprite sprite-personajes-char1"></span>
+
+      La clase sprite-small ajusta la imagen a 2rem de alto, igual que
+      imagestylesmall.
+    - Genera versiones de los fondos (img/wallpaper*.jpg) en WebP y JPEG
+      progresivo para cada ancho de WALLPAPER_WIDTHS
+      (img/wallpapers/<nombre>-<ancho>.webp|jpg). main.js elige la adecuada
+      según el tamaño de la pantalla.
+
+    Los ficheros generados se guardan en el repositorio, así que hay que
+    volver a ejecutar el comando al cambiar alguna de las imágenes.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+# Carpetas (relativas a static) que se juntan en un sprite
+SPRITE_SHEETS = ('img/personajes', 'img/icons')
+# Separación entre imágenes, para que al escalar no se vea la vecina
+SPRITE_GAP = 2
+# Alto de la clase sprite-small, en rem
+SMALL_HEIGHT = 2
+
+WALLPAPERS = ('img/wallpaper1.jpg', 'img/wallpaper2.jpg')
+WALLPAPER_WIDTHS = (960, 1680)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def percent(value):
+    return ('%.4f' % value).rstrip('0').rstrip('.') + '%'
+
+
+def pack(images):
+    """
+        Coloca las imágenes una debajo de otra.
+
+        Parameters
+        ----------
+        images : list
+            Lista de tuplas (nombre, Image)
+
+        Returns
+        -------
+        tuple : (Image con todas las imágenes, lista de tuplas
+        (nombre, x, y, ancho, alto))
+
+        Author
+        -------
+            Eric Morales
+    """
+    width = max(image.width for _, image in images)
+    height = sum(image.height for _, image in images) + \
+        SPRITE_GAP * (len(images) - 1)
+    sheet = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    boxes = []
+    y = 0
+    for name, image in images:
+        sheet.paste(image.convert('RGBA'), (0, y))
+        boxes.append((name, 0, y, image.width, image.height))
+        y += image.height + SPRITE_GAP
+    return sheet, boxes
+
+
+def sprite_css(sheet_name, url, size, boxes):
+    """
+        Reglas css de un sprite. Las posiciones y el tamaño del fondo van en
+        porcentajes, así que la imagen se escala con el elemento.
+
+        Author
+        -------
+            Eric Morales
+    """
+    sheet_width, sheet_height = size
+    lines = []
+    for name, x, y, width, height in boxes:
+        selector = ".sprite-%s-%s" % (sheet_name, name)
+        position_x = x / (sheet_width - width) * 100 \
+            if sheet_width != width else 0
+        position_y = y / (sheet_height - height) * 100 \
+            if sheet_height != height else 0
+        lines.append(
+            "%s { background-image: url(%s); width: %dpx; height: %dpx; "
+            "background-size: %s %s; background-position: %s %s; }" % (
+                selector, url, width, height,
+                percent(sheet_width / width * 100),
+                percent(sheet_height / height * 100),
+                percent(position_x), percent(position_y)))
+        lines.append(".sprite-small%s { width: %.3frem; height: %drem; }" % (
+            selector, SMALL_HEIGHT * width / height, SMALL_HEIGHT))
+    return lines
+
+
+class Command(BaseCommand):
+    help = "Genera los sprites y las versiones de los fondos de static."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--static-dir', default=settings.STATIC_DIR,
+                            help="Carpeta static de origen y destino")
+
+    def handle(self, *args, **options):
+        self.static_dir = options['static_dir']
+        css = ["/* Generado con 'python manage.py build_images'. "
+               "No editar. */",
+               ".sprite { display: inline-block; vertical-align: middle; "
+               "box-sizing: content-box; "
+               "background-repeat: no-repeat; "
+               "background-origin: content-box; "
+               "background-clip: content-box; }"]
+        for folder in SPRITE_SHEETS:
+            css += self.build_sprite(folder)
+        self.write('css/sprites.css', ("\n".join(css) + "\n").encode())
+
+        for wallpaper in WALLPAPERS:
+            self.build_wallpaper(wallpaper)
+
+    def path(self, name):
+        return os.path.join(self.static_dir, *name.split('/'))
+
+    def write(self, name, data):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), 'wb') as f:
+            f.write(data)
+        self.stdout.write("%s (%d bytes)" % (name, len(data)))
+
+    def save(self, image, name, **params):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        image.save(self.path(name), **params)
+        self.stdout.write("%s (%d bytes)" % (name, os.path.getsize(
+            self.path(name))))
+
+    def build_sprite(self, folder):
+        """
+            Junta las imágenes png de una carpeta en un sprite.
+
+            Returns
+            -------
+            list : reglas css del sprite
+
+            Author
+            -------
+                Eric Morales
+        """
+        sheet_name = folder.split('/')[-1]
+        images = []
+        for filename in sorted(os.listdir(self.path(folder))):
+            name, extension = os.path.splitext(filename)
+            if extension.lower() == '.png':
+                with Image.open(self.path(folder + '/' + filename)) as image:
+                    image.load()
+                    images.append((name, image))
+
+        sheet, boxes = pack(images)
+        self.save(sheet, 'img/sprites/%s.png' % sheet_name, optimize=True)
+        # La url es relativa a css/sprites.css; collectstatic le añade el
+        # hash
+        return sprite_css(sheet_name, '../img/sprites/%s.png' % sheet_name,
+                          sheet.size, boxes)
+
+    def build_wallpaper(self, wallpaper):
+        """
+            Genera las versiones de un fondo para cada ancho de
+            WALLPAPER_WIDTHS (sin ampliar nunca la imagen).
+
+            Author
+            -------
+                Eric Morales
+        """
+        name = os.path.splitext(wallpaper.split('/')[-1])[0]
+        with Image.open(self.path(wallpaper)) as image:
+            image = image.convert('RGB')
+            for width in WALLPAPER_WIDTHS:
+                resized = image
+                if width < image.width:
+                    height = round(image.height * width / image.width)
+                    resized = image.resize((width, height), Image.LANCZOS)
+                base = 'img/wallpapers/%s-%d' % (name, width)
+                self.save(resized, base + '.webp', quality=WEBP_QUALITY,
+                          method=6)
+                self.save(resized, base + '.jpg', quality=JPEG_QUALITY,
+                          optimize=True, progressive=True)
@@ -0,0 +1,360 @@
+"""
+    Generador de carga que simula partidas completas contra un servidor
+    local (runserver, gunicorn o uno propio con --serve).
+
+        python manage.py loadtest --url http://127.0.0.1:8000 --pairs 50
+
+        python manage.py loadtest --serve --pairs 50 --target api
+
+    Cada pareja de jugadores se registra, inicia sesión, crea y se une a una
+    partida, la juega con move_service (consultando turn para ver el
+    movimiento del rival, igual que game.html) y después la reproduce con
+    get_move_service. Con --target api usa en su lugar la API versionada:
+    movimientos, espera y reproducción. Al final se muestra el rendimiento
+    y los percentiles de latencia de cada endpoint.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from datamodel.engine import GameState, apply_move, fast_check_winner, \
+    legal_moves
+
+NEW_GAME_PATTERN = re.compile(r"Partida <b>(\d+)</b>")
+
+# Endpoints con los que se juega: los servicios de views.py (move_service,
+# turn, get_move_service) o la API versionada (logic.api)
+LEGACY = 'legacy'
+API = 'api'
+
+# Status de un movimiento aceptado: sigue la partida (0) o la termina (2)
+MOVE_OK = (0, 2)
+
+
+def percentile(values, pct):
+    """
+        Percentil por el método del rango más cercano.
+
+        Parameters
+        ----------
+        values : list
+            Valores ordenados
+        pct : float
+            Percentil (0-100)
+
+        Returns
+        -------
+        float : valor del percentil
+
+        Author
+        -------
+            Eric Morales
+    """
+    if not values:
+        return 0.0
+    rank = max(1, int(math.ceil(pct / 100.0 * len(values))))
+    return values[min(rank, len(values)) - 1]
+
+
+def move_ok(body):
+    """
+        Indica si la respuesta de un movimiento lo acepta.
+
+        Parameters
+        ----------
+        body : str
+            Cuerpo de la respuesta de move o api_move
+
+        Returns
+        -------
+        boolean : True si el status es de un movimiento aceptado
+
+        Author
+        -------
+            Eric Morales
+    """
+    try:
+        return json.loads(body).get('status') in MOVE_OK
+    except (ValueError, AttributeError):
+        return False
+
+
+class Stats(object):
+    """
+        Latencias por endpoint, compartidas entre hilos.
+
+        Methods
+        -------
+        add(self, endpoint, elapsed, ok)
+            Registra una petición.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, endpoint, elapsed, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+class Player(object):
+    """
+        Cliente HTTP con sus propias cookies (sesión y csrftoken).
+
+        Methods
+        -------
+        request(self, endpoint, path, data=None, csrf=False, check=None)
+            Realiza una petición GET (o POST si hay datos) y la mide.
+    """
+
+    def __init__(self, base_url, stats, username, password):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.username = username
+        self.password = password
+        self.jar = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.jar))
+
+    def csrftoken(self):
+        for cookie in self.jar:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, endpoint, path, data=None, csrf=False, check=None):
+        """
+            Realiza una petición GET (o POST si hay datos) y registra su
+            latencia bajo el nombre endpoint. Si se da check, la petición
+            solo cuenta como correcta si check(cuerpo) es cierto.
+
+            Returns
+            -------
+            str : cuerpo de la respuesta (vacío si hay error)
+
+            Author
+            -------
+                Eric Morales
+        """
+        headers = {}
+        if data is not None:
+            if csrf:
+                data = dict(data, csrfmiddlewaretoken=self.csrftoken())
+                headers['Referer'] = self.base_url + path
+            data = urlencode(data).encode()
+
+        url = self.base_url + path
+        begin = time.perf_counter()
+        ok = True
+        body = ''
+        try:
+            response = self.opener.open(Request(url, data, headers),
+                                        timeout=30)
+            body = response.read().decode('utf-8', 'replace')
+        except HTTPError as err:
+            ok = False
+            err.read()
+        except URLError:
+            ok = False
+        if ok and check is not None:
+            ok = check(body)
+        self.stats.add(endpoint, time.perf_counter() - begin, ok)
+        return body
+
+
+def play_pair(base_url, stats, prefix, index, max_plies, seed,
+              target_api=LEGACY):
+    """
+        Simula una pareja de jugadores de principio a fin. Si el servidor
+        rechaza un movimiento, la partida se abandona.
+
+        Returns
+        -------
+        int : número de movimientos realizados
+
+        Author
+        -------
+            Eric Morales
+    """
+    rng = random.Random(seed)
+    password = uuid.uuid4().hex
+    suffix = "%s_%d_%s" % (prefix, index, uuid.uuid4().hex[:6])
+    cat = Player(base_url, stats, "cat_" + suffix, password)
+    mouse = Player(base_url, stats, "pac_" + suffix, password)
+
+    for player in (cat, mouse):
+        player.request('signup_form', reverse('signup'))
+        player.request('signup', reverse('signup'), {
+            'username': player.username, 'password': password,
+            'password2': password}, csrf=True)
+        player.request('logout', reverse('logout'))
+        player.request('login_form', reverse('login'))
+        player.request('login', reverse('login'), {
+            'username': player.username, 'password': password}, csrf=True)
+
+    body = cat.request('create_game', reverse('create_game'))
+    m = NEW_GAME_PATTERN.search(body)
+    if not m:
+        raise CommandError("No se ha podido crear la partida (%s)" %
+                           cat.username)
+    game_id = int(m.group(1))
+
+    mouse.request('join_game', reverse('select_game', kwargs={
+        'tipo': 2, 'game_id': game_id}))
+    cat.request('select_game', reverse('select_game', kwargs={
+        'tipo': 1, 'game_id': game_id}))
+
+    state = GameState()
+    n_moves = 0
+    turn_url = reverse('turn', kwargs={'game_id': game_id})
+    wait_url = reverse('api_wait', kwargs={'game_id': game_id})
+    move_url = reverse('api_move', kwargs={'game_id': game_id})
+    while n_moves < max_plies and fast_check_winner(state) == 0:
+        moves = legal_moves(state)
+        if not moves:
+            break
+        origin, target = rng.choice(moves)
+        mover, waiting = (cat, mouse) if state.cat_turn else (mouse, cat)
+        if target_api == API:
+            body = mover.request('api_move', move_url,
+                                 {'origin': origin, 'target': target},
+                                 csrf=True, check=move_ok)
+        else:
+            body = mover.request('move', reverse('move'),
+                                 {'origin': origin, 'target': target},
+                                 check=move_ok)
+        if not move_ok(body):
+            # El servidor lo ha rechazado (y ya cuenta como error): el
+            # estado local ya no coincide con el suyo, así que la pareja
+            # deja de jugar
+            break
+        apply_move(state, origin, target)
+        n_moves += 1
+        # El rival detecta el movimiento como game.html: consultando turn
+        # o, con la API, con la espera
+        if target_api == API:
+            waiting.request('api_wait', wait_url)
+        else:
+            waiting.request('turn', turn_url, {})
+
+    if fast_check_winner(state) != 0:
+        cat.request('reproduce_game', reverse('select_game', kwargs={
+            'tipo': 3, 'game_id': game_id}))
+        for ply in range(n_moves):
+            if target_api == API:
+                cat.request('api_replay', reverse('api_replay', kwargs={
+                    'game_id': game_id, 'ply': ply}))
+            else:
+                cat.request('get_move', reverse('get_move'), {'shift': 1})
+
+    return n_moves
+
+
+class Command(BaseCommand):
+    help = "Simula parejas de jugadores concurrentes contra un servidor " \
+           "local y muestra latencias por endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help="URL base del servidor")
+        parser.add_argument('--serve', action='store_true',
+                            help="Arranca un servidor WSGI multihilo en este "
+                                 "proceso (ignora --url)")
+        parser.add_argument('--pairs', type=int, default=10,
+                            help="Número de parejas de jugadores")
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help="Parejas jugando a la vez")
+        parser.add_argument('--max-plies', type=int, default=60,
+                            help="Máximo de movimientos por partida")
+        parser.add_argument('--prefix', default='load',
+                            help="Prefijo de los usuarios creados")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--target', choices=(LEGACY, API),
+                            default=LEGACY,
+                            help="Endpoints con los que se juega: los "
+                                 "servicios de views.py (por defecto) o la "
+                                 "API versionada")
+
+    def handle(self, *args, **options):
+        server = None
+        base_url = options['url']
+        if options['serve']:
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+            server.set_app(get_wsgi_application())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = 'http://127.0.0.1:%d' % server.server_port
+
+        stats = Stats()
+        rng = random.Random(options['seed'])
+        begin = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max(1, options['concurrency'])) as pool:
+                futures = [pool.submit(play_pair, base_url, stats,
+                                       options['prefix'], i,
+                                       options['max_plies'],
+                                       rng.getrandbits(32),
+                                       options['target'])
+                           for i in range(options['pairs'])]
+                n_moves = sum(future.result() for future in futures)
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+        elapsed = time.perf_counter() - begin
+
+        self.report(stats, elapsed, n_moves)
+
+    def report(self, stats, elapsed, n_moves):
+        """
+            Muestra el resumen de la prueba de carga.
+
+            Author
+            -------
+                Eric Morales
+        """
+        total = sum(len(values) for values in stats.latencies.values())
+        self.stdout.write("%d peticiones en %.2fs (%.1f peticiones/s), "
+                          "%d movimientos (%.1f movimientos/s)" % (
+                              total, elapsed, total / elapsed, n_moves,
+                              n_moves / elapsed))
+        self.stdout.write("%-16s %8s %7s %9s %9s %9s %9s" % (
+            "endpoint", "n", "errores", "req/s", "p50 ms", "p95 ms",
+            "p99 ms"))
+        for endpoint in sorted(stats.latencies):
+            values = sorted(stats.latencies[endpoint])
+            self.stdout.write("%-16s %8d %7d %9.1f %9.2f %9.2f %9.2f" % (
+                endpoint, len(values), stats.errors.get(endpoint, 0),
+                len(values) / elapsed, percentile(values, 50) * 1000,
+                percentile(values, 95) * 1000,
+                percentile(values, 99) * 1000))
+
+
+class QuietHandler(WSGIRequestHandler):
+    """
+        Manejador que no escribe una línea por petición.
+    """
+
+    def log_message(self, format, *args):
+        pass
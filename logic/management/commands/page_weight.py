@@ -0,0 +1,277 @@
+"""
+    Comando que mide el peso de las páginas principales: el html y los
+    ficheros estáticos que cargan, separando los que bloquean el primer
+    pintado (hojas de estilo y scripts sin defer/async) de los diferidos.
+
+        python manage.py page_weight
+        python manage.py page_weight --compare <commit>
+        python manage.py page_weight --keep-db
+
+    Los resultados se guardan en un fichero JSON indexados por el commit
+    actual, igual que los de bench, para poder comparar antes y después de
+    un cambio. Los tamaños comprimidos son los de gzip, que es lo que se
+    transfiere con ratonGato.static.
+
+    Como bench, mide sobre una base de datos de test (--keep-db la reutiliza
+    entre ejecuciones); la base de datos configurada no se toca nunca.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import datetime
+import json
+import os
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+from django.urls import reverse
+
+from logic.benchmarks import Context
+from logic.management.commands.bench import current_commit, load_results
+from ratonGato.static import COMPRESSIBLE, gzip_bytes
+
+DEFAULT_OUTPUT = os.path.join(settings.BASE_DIR, 'page_weight.json')
+
+# Páginas medidas: (nombre, url, kwargs con atributos de Context, partida
+# que se selecciona en la sesión, False si se pide sin iniciar sesión)
+PAGES = [
+    ('landing', 'landing', {}, None, False),
+    ('login', 'login', {}, None, False),
+    ('select_game', 'select_game', {'tipo': 1}, None, True),
+    ('game', 'show_game', {}, 'active', True),
+    ('replay', 'reproduce_game', {'game_id': 'finished'}, None, True),
+]
+
+STATIC_URL_RE = re.compile(r'%s[^\'"\s)]+' % re.escape(settings.STATIC_URL))
+
+
+class AssetParser(HTMLParser):
+    """
+        Obtiene los recursos que carga una página.
+
+        Attributes
+        ----------
+        blocking : list
+            Hojas de estilo y scripts síncronos (en orden)
+        deferred : list
+            Scripts con defer/async, hojas de estilo cargadas con
+            rel=preload e imágenes
+        on_demand : list
+            Ficheros estáticos referenciados desde los scripts de la página
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.blocking = []
+        self.deferred = []
+        self.on_demand = []
+        self.in_script = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link' and attrs.get('href'):
+            rel = (attrs.get('rel') or '').lower()
+            if rel == 'stylesheet' and attrs.get('media') != 'print':
+                self.blocking.append(attrs['href'])
+            elif rel in ('stylesheet', 'preload'):
+                self.deferred.append(attrs['href'])
+        elif tag == 'script':
+            self.in_script = 'src' not in attrs
+            if attrs.get('src'):
+                if 'defer' in attrs or 'async' in attrs:
+                    self.deferred.append(attrs['src'])
+                else:
+                    self.blocking.append(attrs['src'])
+        elif tag == 'img' and attrs.get('src'):
+            self.deferred.append(attrs['src'])
+
+    def handle_endtag(self, tag):
+        if tag == 'script':
+            self.in_script = False
+
+    def handle_data(self, data):
+        if self.in_script:
+            self.on_demand += STATIC_URL_RE.findall(data)
+
+
+def asset_size(url):
+    """
+        Tamaño de un fichero estático, sin comprimir y con gzip.
+
+        Returns
+        -------
+        tuple : (bytes, bytes con gzip), o (None, None) si no es un fichero
+        estático local
+
+        Author
+        -------
+            Eric Morales
+    """
+    if not url.startswith(settings.STATIC_URL):
+        return None, None
+    path = finders.find(url[len(settings.STATIC_URL):].split('?')[0])
+    if not path:
+        return None, None
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.lower().endswith(COMPRESSIBLE):
+        return len(data), len(gzip_bytes(data))
+    return len(data), len(data)
+
+
+def measure_html(html):
+    """
+        Mide una página a partir de su html. Cada url cuenta una sola vez
+        aunque se cargue varias veces (el navegador la tiene en caché).
+
+        Returns
+        -------
+        dict : requests, bloqueantes y bytes (sin comprimir y con gzip) del
+        html, de lo que bloquea el pintado y del total, además de los
+        recursos externos y los que cargan los scripts bajo demanda
+
+        Author
+        -------
+            Eric Morales
+    """
+    parser = AssetParser()
+    parser.feed(html)
+    html_bytes = html.encode()
+    html_gzip = len(gzip_bytes(html_bytes))
+
+    result = {
+        'html': len(html_bytes), 'html_gzip': html_gzip,
+        'blocking_requests': 0, 'blocking': 0,
+        'blocking_gzip': html_gzip,
+        'requests': 1, 'total': len(html_bytes), 'total_gzip': html_gzip,
+        'external': [], 'on_demand': sorted(set(parser.on_demand)),
+    }
+    seen = set()
+    for urls, blocking in ((parser.blocking, True), (parser.deferred, False)):
+        for url in urls:
+            if url in seen:
+                continue
+            seen.add(url)
+            size, size_gzip = asset_size(url)
+            result['requests'] += 1
+            if blocking:
+                result['blocking_requests'] += 1
+            if size is None:
+                result['external'].append(url)
+                continue
+            result['total'] += size
+            result['total_gzip'] += size_gzip
+            if blocking:
+                result['blocking'] += size
+                result['blocking_gzip'] += size_gzip
+    return result
+
+
+def kb(value):
+    return "%.1f" % (value / 1024)
+
+
+class Command(BaseCommand):
+    help = "Mide el peso de las páginas y lo guarda por commit."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=DEFAULT_OUTPUT)
+        parser.add_argument('--commit', default=None,
+                            help="Clave con la que guardar los resultados "
+                                 "(por defecto, el commit actual)")
+        parser.add_argument('--compare', default=None,
+                            help="Commit guardado con el que comparar")
+        parser.add_argument('--keep-db', action='store_true',
+                            help="Reutiliza la base de datos de test y no la "
+                                 "borra al terminar")
+
+    def handle(self, *args, **options):
+        data = load_results(options['output'])
+        if options['compare'] and options['compare'] not in data:
+            raise CommandError("No hay resultados de %s en %s" % (
+                options['compare'], options['output']))
+
+        try:
+            setup_test_environment()
+            test_environment = True
+        except RuntimeError:
+            # Ya estamos dentro de los tests, con su base de datos
+            test_environment = False
+        # Las páginas se miden con usuarios y partidas creados por
+        # benchmarks.Context: siempre en la base de datos de test
+        old_name = None
+        if test_environment:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=options['keep_db'])
+        try:
+            results = self.measure_pages()
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options['keep_db'])
+            if test_environment:
+                teardown_test_environment()
+
+        base = data[options['compare']]['results'] \
+            if options['compare'] else {}
+        self.report(results, base)
+
+        commit = options['commit'] or current_commit()
+        data[commit] = {'date': datetime.datetime.utcnow().isoformat(),
+                        'results': results}
+        with open(options['output'], 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        self.stdout.write("Resultados guardados como %s en %s" % (
+            commit, options['output']))
+
+    def measure_pages(self):
+        """
+            Descarga y mide cada página de PAGES.
+
+            Author
+            -------
+                Eric Morales
+        """
+        ctx = Context()
+        results = {}
+        for name, url_name, kwargs, select, logged in PAGES:
+            client = ctx.cat_client if logged else Client()
+            if select:
+                ctx.select(client, getattr(ctx, select))
+            url = reverse(url_name, kwargs={
+                key: getattr(ctx, value).id if isinstance(value, str)
+                else value for key, value in kwargs.items()})
+            response = client.get(url, HTTP_HOST='localhost')
+            if response.status_code != 200:
+                raise CommandError("%s devuelve %d" % (
+                    url, response.status_code))
+            results[name] = measure_html(response.content.decode())
+        return results
+
+    def report(self, results, base):
+        self.stdout.write("%-12s %9s %14s %12s %11s" % (
+            "página", "peticiones", "bloqueantes", "crítico KB",
+            "total KB"))
+        for name, result in results.items():
+            line = "%-12s %9d %14d %12s %11s" % (
+                name, result['requests'], result['blocking_requests'],
+                kb(result['blocking_gzip']), kb(result['total_gzip']))
+            if name in base:
+                line += "   (antes %d / %d / %s / %s)" % (
+                    base[name]['requests'], base[name]['blocking_requests'],
+                    kb(base[name]['blocking_gzip']),
+                    kb(base[name]['total_gzip']))
+            self.stdout.write(line)
+            if result['on_demand']:
+                self.stdout.write("    bajo demanda: %s" % ", ".join(
+                    result['on_demand']))
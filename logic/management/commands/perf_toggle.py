@@ -0,0 +1,44 @@
+"""
+    Comando que activa o desactiva en caliente la instrumentación de
+    rendimiento (logic.middleware.PerformanceMiddleware) en todos los
+    procesos que compartan settings.PERF_TOGGLE_FILE.
+
+        python manage.py perf_toggle on|off|status
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Activa (on), desactiva (off) o consulta (status) la " \
+           "instrumentación de rendimiento por petición."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['on', 'off', 'status'])
+
+    def handle(self, *args, **options):
+        path = getattr(settings, 'PERF_TOGGLE_FILE', None)
+        if not path:
+            raise CommandError("PERF_TOGGLE_FILE no está configurado")
+
+        if options['action'] != 'status':
+            # Escritura atómica para que ningún proceso lea el fichero a
+            # medias
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(options['action'])
+            os.replace(tmp_path, path)
+
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            value = "on" if settings.PERF_INSTRUMENTATION else "off"
+        self.stdout.write("Instrumentación de rendimiento: %s" % value)
@@ -0,0 +1,64 @@
+"""
+    Comando que borra las sesiones caducadas de la tabla django_session por
+    bloques, para no bloquear la tabla con un único DELETE como hace
+    clearsessions.
+
+        python manage.py purge_sessions --chunk-size 5000 --sleep 0.1
+
+    Con SESSION_MODE cache o signed_cookies no hay nada que borrar: las
+    sesiones caducan solas en la caché o en la cookie.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Backends que guardan las sesiones en la tabla
+DB_ENGINES = ('django.contrib.sessions.backends.db',
+              'django.contrib.sessions.backends.cached_db')
+
+
+class Command(BaseCommand):
+    help = "Borra por bloques las sesiones caducadas de la base de datos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Sesiones borradas por sentencia")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Segundos de espera entre bloques")
+        parser.add_argument('--force', action='store_true',
+                            help="Purga la tabla aunque el backend de "
+                                 "sesiones actual no la use")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in DB_ENGINES and not options['force']:
+            self.stdout.write("El backend de sesiones (%s) no usa la base de "
+                              "datos; no hay nada que purgar" %
+                              settings.SESSION_ENGINE)
+            return
+
+        now = timezone.now()
+        chunk_size = max(1, options['chunk_size'])
+        deleted = 0
+        while True:
+            # Cada bloque es una transacción corta (autocommit)
+            keys = list(Session.objects.filter(expire_date__lt=now)
+                        .values_list('session_key', flat=True)[:chunk_size])
+            if not keys:
+                break
+            # Volvemos a comprobar la fecha por si alguna se ha renovado
+            deleted += Session.objects.filter(
+                session_key__in=keys, expire_date__lt=now).delete()[0]
+            if options['verbosity'] > 1:
+                self.stdout.write("%d sesiones borradas" % deleted)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write("Sesiones caducadas borradas: %d" % deleted)
@@ -0,0 +1,58 @@
+"""
+    Comando que termina las partidas con reloj cuyo jugador ha agotado el
+    tiempo del movimiento (ver datamodel.clock) y avisa a sus clientes.
+
+        python manage.py sweep_clocks
+        python manage.py sweep_clocks --every 5
+
+    Con --every se queda barriendo cada tantos segundos: un único proceso
+    vigila todos los relojes, sin un temporizador ni un hilo por partida,
+    porque cada barrido es una consulta por el índice de move_deadline.
+    Aunque no se ejecute, los plazos se comprueban igualmente al mover.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from datamodel.reaper import BATCH_SIZE, reap_timeouts
+from logic.notify import notify_game
+
+
+class Command(BaseCommand):
+    help = "Termina las partidas con el tiempo del movimiento agotado."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=None,
+                            help="Repite el barrido cada tantos segundos")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Partidas por lote")
+
+    def sweep(self, batch_size, report):
+        begin = time.perf_counter()
+        timed_out, batches = reap_timeouts(batch_size)
+        # reap_timeouts ya ha confirmado cada lote, así que el aviso sale
+        # al momento
+        for game_id in timed_out:
+            notify_game(game_id)
+        # En bucle solo se informa de los barridos que terminan partidas
+        if timed_out or report:
+            self.stdout.write("%d partidas con el tiempo agotado en %d lotes "
+                              "(%.2f s)" % (len(timed_out), batches,
+                                            time.perf_counter() - begin))
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("El tamaño de lote debe ser positivo")
+
+        if options['every'] is None:
+            self.sweep(options['batch_size'], True)
+            return
+
+        while True:
+            self.sweep(options['batch_size'], options['verbosity'] > 1)
+            time.sleep(options['every'])
@@ -0,0 +1,488 @@
+"""
+    Registro de métricas en memoria con salida en formato de texto de
+    Prometheus.
+        - Registry
+        - REGISTRY
+
+    Con varios procesos (gunicorn con varios workers) cada proceso guarda
+    periódicamente una copia de sus métricas en settings.METRICS_MULTIPROC_DIR
+    y el endpoint /metrics suma las de todos los procesos. Los contadores y
+    los histogramas de los procesos que terminan (p.ej. workers reiniciados)
+    se suman a un fichero de archivo, como en el modo multiproceso de
+    prometheus_client, para que los totales exportados nunca bajen.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import fcntl
+import glob
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+# Límites (en segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+ACTIVE_SET = 'active_set'
+
+# Métricas conocidas: nombre -> (tipo, descripción)
+METRICS = {
+    'paccat_view_requests_total': (
+        COUNTER, "Peticiones atendidas por vista y clase de código HTTP"),
+    'paccat_view_latency_seconds': (
+        HISTOGRAM, "Latencia de las peticiones por vista"),
+    'paccat_moves_total': (COUNTER, "Movimientos realizados"),
+    'paccat_games_created_total': (COUNTER, "Partidas creadas"),
+    'paccat_games_joined_total': (COUNTER, "Partidas a las que se ha unido "
+                                           "un PAC"),
+    'paccat_games_finished_total': (COUNTER, "Partidas terminadas"),
+    'paccat_matches_total': (COUNTER, "Partidas creadas desde la cola de "
+                                      "partida rápida"),
+    'paccat_errors_total': (COUNTER, "Errores contabilizados por el "
+                                     "Counter"),
+    'paccat_cache_requests_total': (
+        COUNTER, "Consultas a caché por caché y resultado (hit/miss)"),
+    'paccat_active_polling_clients': (
+        ACTIVE_SET, "Clientes que han consultado turn recientemente"),
+}
+
+# Ficheros de METRICS_MULTIPROC_DIR con las métricas de los procesos
+# terminados y con el cerrojo que protege su actualización
+ARCHIVE = 'archive.json'
+ARCHIVE_LOCK = 'archive.lock'
+
+# Segundos durante los que un cliente que consulta turn cuenta como activo
+ACTIVE_WINDOW = 30.0
+
+logger = logging.getLogger('paccat.metrics')
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry(object):
+    """
+        Registro de contadores, histogramas y conjuntos de clientes activos
+        de un proceso.
+
+        Methods
+        -------
+        inc(self, name, value=1, **labels)
+            Incrementa un contador.
+        observe(self, name, value, **labels)
+            Añade una observación a un histograma.
+        touch(self, name, member)
+            Marca un miembro de un conjunto de activos como visto ahora.
+        snapshot(self)
+            Devuelve el estado del registro como un diccionario serializable.
+        render(self)
+            Devuelve las métricas (de todos los procesos) en formato de
+            texto de Prometheus.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.active = {}
+        self.flush_lock = threading.Lock()
+        self.flushed_at = 0.0
+
+    def inc(self, name, value=1, **labels):
+        """
+            Incrementa un contador.
+
+            Author
+            -------
+                Eric Morales
+        """
+        key = (name, _key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.maybe_flush()
+
+    def observe(self, name, value, **labels):
+        """
+            Añade una observación a un histograma.
+
+            Author
+            -------
+                Eric Morales
+        """
+        key = (name, _key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # Un contador por límite, más la suma y el total
+                histogram = self.histograms[key] = \
+                    [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+        self.maybe_flush()
+
+    def touch(self, name, member):
+        """
+            Marca un miembro de un conjunto de activos como visto ahora.
+
+            Author
+            -------
+                Eric Morales
+        """
+        now = time.time()
+        with self.lock:
+            members = self.active.setdefault(name, {})
+            members[str(member)] = now
+            if len(members) > 1000:
+                # Purgamos los que ya no están activos
+                for key in [key for key, seen in members.items()
+                            if now - seen > ACTIVE_WINDOW]:
+                    del members[key]
+        self.maybe_flush()
+
+    def snapshot(self):
+        """
+            Devuelve el estado del registro como un diccionario serializable.
+
+            Returns
+            -------
+            dict : estado del registro
+
+            Author
+            -------
+                Eric Morales
+        """
+        now = time.time()
+        with self.lock:
+            return {
+                'counters': [[name, list(map(list, labels)), value]
+                             for (name, labels), value in
+                             self.counters.items()],
+                'histograms': [[name, list(map(list, labels)), list(values)]
+                               for (name, labels), values in
+                               self.histograms.items()],
+                'active': {name: {member: seen
+                                  for member, seen in members.items()
+                                  if now - seen <= ACTIVE_WINDOW}
+                           for name, members in self.active.items()},
+            }
+
+    def multiproc_dir(self):
+        return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+    def maybe_flush(self):
+        """
+            En modo multiproceso, guarda las métricas del proceso en disco
+            como mucho una vez por intervalo. El intervalo se comprueba con
+            el cerrojo, así que de varios hilos a la vez solo escribe uno.
+            Un fallo al escribir se registra, pero no llega a la petición
+            que estaba contando la métrica.
+
+            Author
+            -------
+                Eric Morales
+        """
+        if not self.multiproc_dir():
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now - self.flushed_at < getattr(
+                    settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+                return
+            self.flushed_at = now
+        try:
+            self.flush()
+        except OSError:
+            logger.exception("No se han podido guardar las métricas")
+
+    def flush(self):
+        """
+            Guarda las métricas del proceso en METRICS_MULTIPROC_DIR. Cada
+            escritura va a su propio fichero temporal, que luego se renombra,
+            para que otro proceso nunca lea un fichero a medias.
+
+            Author
+            -------
+                Eric Morales
+        """
+        directory = self.multiproc_dir()
+        if not directory:
+            return
+        with self.lock:
+            self.flushed_at = time.monotonic()
+        path = os.path.join(directory, 'metrics_%d.json' % os.getpid())
+        with self.flush_lock:
+            # La instantánea se toma con el cerrojo de escritura, así que el
+            # último fichero renombrado es siempre el más reciente
+            _write(path, self.snapshot())
+
+    def collect(self):
+        """
+            Devuelve las instantáneas de todos los procesos (o solo la del
+            actual si no estamos en modo multiproceso). Los contadores y los
+            histogramas de los procesos que ya no existen se suman al
+            archivo y sus ficheros se borran; sus clientes activos se
+            descartan. Todo se hace con el cerrojo del archivo, así que dos
+            procesos no pueden archivar el mismo fichero dos veces.
+
+            Returns
+            -------
+            list : lista de instantáneas, con el archivo la primera
+
+            Author
+            -------
+                Eric Morales
+        """
+        directory = self.multiproc_dir()
+        if not directory:
+            return [self.snapshot()]
+
+        self.flush()
+        archive_path = os.path.join(directory, ARCHIVE)
+        with open(os.path.join(directory, ARCHIVE_LOCK), 'a') as lock:
+            # El cerrojo se libera al cerrar el fichero
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = _read(archive_path) or \
+                {'counters': [], 'histograms': [], 'active': {}}
+            snapshots = []
+            dead = []
+            for path in glob.glob(os.path.join(directory,
+                                               'metrics_*.json')):
+                snapshot = _read(path)
+                if snapshot is None:
+                    # El proceso puede estar reescribiendo su fichero
+                    continue
+                if _alive(path):
+                    snapshots.append(snapshot)
+                else:
+                    archive = _fold(archive, snapshot)
+                    dead.append(path)
+            if dead:
+                _write(archive_path, archive)
+                for path in dead:
+                    os.remove(path)
+        return [archive] + snapshots
+
+    def render(self):
+        """
+            Devuelve las métricas de todos los procesos en formato de texto
+            de Prometheus.
+
+            Returns
+            -------
+            str : métricas
+
+            Author
+            -------
+                Eric Morales
+        """
+        counters, histograms, active = _merge(self.collect())
+
+        lines = []
+        for name in sorted(METRICS):
+            kind, description = METRICS[name]
+            lines.append("# HELP %s %s" % (name, description))
+            lines.append("# TYPE %s %s" % (
+                name, 'gauge' if kind == ACTIVE_SET else kind))
+
+            if kind == COUNTER:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append("%s%s %s" % (name, _labels(labels),
+                                                  _number(value)))
+            elif kind == HISTOGRAM:
+                for (metric, labels), values in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(self.buckets, values):
+                        lines.append("%s_bucket%s %s" % (
+                            name, _labels(labels + (('le', repr(bound)),)),
+                            count))
+                    lines.append("%s_bucket%s %s" % (
+                        name, _labels(labels + (('le', '+Inf'),)),
+                        values[-1]))
+                    lines.append("%s_sum%s %s" % (name, _labels(labels),
+                                                  _number(values[-2])))
+                    lines.append("%s_count%s %s" % (name, _labels(labels),
+                                                    values[-1]))
+            else:
+                lines.append("%s %d" % (name, len(active.get(name, {}))))
+
+        # Ratio de aciertos por caché, derivado de los contadores
+        lines.append("# HELP paccat_cache_hit_ratio Proporción de aciertos "
+                     "por caché")
+        lines.append("# TYPE paccat_cache_hit_ratio gauge")
+        caches = {}
+        for (metric, labels), value in counters.items():
+            if metric == 'paccat_cache_requests_total':
+                labels = dict(labels)
+                totals = caches.setdefault(labels.get('cache'), [0, 0])
+                totals[0 if labels.get('result') == 'hit' else 1] += value
+        for cache, (hits, misses) in sorted(caches.items()):
+            lines.append("paccat_cache_hit_ratio%s %s" % (
+                _labels((('cache', cache),)),
+                _number(hits / (hits + misses) if hits + misses else 0)))
+
+        return "\n".join(lines) + "\n"
+
+
+def _merge(snapshots):
+    """
+        Suma varias instantáneas.
+
+        Returns
+        -------
+        tuple : (contadores, histogramas, activos), como diccionarios
+
+        Author
+        -------
+            Eric Morales
+    """
+    counters = {}
+    histograms = {}
+    active = {}
+    now = time.time()
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+        for name, members in snapshot['active'].items():
+            merged = active.setdefault(name, {})
+            for member, seen in members.items():
+                if now - seen <= ACTIVE_WINDOW:
+                    merged[member] = max(seen, merged.get(member, 0))
+    return counters, histograms, active
+
+
+def _fold(archive, snapshot):
+    """
+        Suma al archivo los contadores y los histogramas de una instantánea
+        (los clientes activos de un proceso terminado ya no cuentan).
+
+        Returns
+        -------
+        dict : archivo actualizado
+
+        Author
+        -------
+            Eric Morales
+    """
+    counters, histograms, _ = _merge([archive, snapshot])
+    return {
+        'counters': [[name, list(map(list, labels)), value]
+                     for (name, labels), value in counters.items()],
+        'histograms': [[name, list(map(list, labels)), values]
+                       for (name, labels), values in histograms.items()],
+        'active': {},
+    }
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    """
+        Escribe un fichero json en un fichero temporal que luego se
+        renombra, para que otro proceso nunca lea un fichero a medias.
+
+        Author
+        -------
+            Eric Morales
+    """
+    directory, name = os.path.split(path)
+    with tempfile.NamedTemporaryFile(
+            'w', dir=directory, prefix='%s.' % name[:-len('.json')],
+            suffix='.tmp', delete=False) as f:
+        json.dump(data, f)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
+
+
+def _alive(path):
+    """
+        Indica si sigue vivo el proceso que escribió un fichero de métricas
+        (metrics_<pid>.json).
+
+        Author
+        -------
+            Eric Morales
+    """
+    match = re.search(r'metrics_(\d+)\.json$', path)
+    if match is None:
+        return False
+    pid = int(match.group(1))
+    if pid == os.getpid():
+        return True
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except (ProcessLookupError, OverflowError):
+        return False
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        pass
+    return True
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\')
+                     .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+
+def record_cache(cache, hit):
+    """
+        Registra un acierto o un fallo de caché.
+
+        Parameters
+        ----------
+        cache : str
+            Nombre de la caché
+        hit : boolean
+            True si ha sido un acierto
+
+        Author
+        -------
+            Eric Morales
+    """
+    REGISTRY.inc('paccat_cache_requests_total', cache=cache,
+                 result='hit' if hit else 'miss')
@@ -0,0 +1,190 @@
+"""
+    Middlewares de la aplicación de PACCAT.
+        - PerformanceMiddleware
+        - MetricsMiddleware
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.template.base import Template
+
+from datamodel import timing
+from logic.metrics import REGISTRY
+
+logger = logging.getLogger('paccat.perf')
+
+# Medimos el tiempo de renderizado de las plantillas. Los include anidados
+# se cuentan dentro de la plantilla exterior.
+if not hasattr(Template.render, '__wrapped__'):
+    Template.render = timing.timed('template')(Template.render)
+
+# Mediciones que se exponen, con su nombre en la cabecera Server-Timing
+TIMINGS = (
+    ('template', 'tpl'),
+    ('check_winner', 'winner'),
+    ('valid_move', 'move'),
+)
+
+
+class PerfSwitch(object):
+    """
+        Interruptor de la instrumentación. El valor por defecto es
+        settings.PERF_INSTRUMENTATION, y puede cambiarse en caliente
+        escribiendo "on" u "off" en settings.PERF_TOGGLE_FILE (ver el comando
+        perf_toggle). El fichero se consulta como mucho una vez cada
+        settings.PERF_TOGGLE_INTERVAL segundos.
+
+        Methods
+        -------
+        enabled(self)
+            Indica si la instrumentación está activa.
+    """
+
+    def __init__(self):
+        self.checked_at = 0.0
+        self.mtime = None
+        self.value = None
+
+    def enabled(self):
+        """
+            Indica si la instrumentación está activa.
+
+            Returns
+            -------
+            boolean : True si hay que medir la petición
+
+            Author
+            -------
+                Eric Morales
+        """
+        path = getattr(settings, 'PERF_TOGGLE_FILE', None)
+        default = getattr(settings, 'PERF_INSTRUMENTATION', False)
+        if not path:
+            return default
+
+        now = time.monotonic()
+        if now - self.checked_at >= getattr(settings,
+                                            'PERF_TOGGLE_INTERVAL', 1.0):
+            self.checked_at = now
+            try:
+                mtime = os.stat(path).st_mtime
+                if mtime != self.mtime:
+                    with open(path) as f:
+                        self.value = f.read().strip().lower() == 'on'
+                    self.mtime = mtime
+            except OSError:
+                self.mtime = self.value = None
+
+        return default if self.value is None else self.value
+
+
+class PerformanceMiddleware(object):
+    """
+        Mide, para cada petición, el tiempo total, el número de consultas y
+        el tiempo en base de datos, el tiempo de renderizado de plantillas
+        y el tiempo en check_winner/valid_move. Los resultados se añaden a
+        la cabecera Server-Timing y se escriben como una línea JSON en el
+        logger paccat.perf.
+
+        Methods
+        -------
+        __call__(self, request)
+            Procesa la petición midiendo los tiempos si está activo.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.switch = PerfSwitch()
+
+    def __call__(self, request):
+        if not self.switch.enabled():
+            return self.get_response(request)
+
+        db = {'queries': 0, 'time': 0.0}
+
+        def db_wrapper(execute, sql, params, many, context):
+            begin = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db['queries'] += 1
+                db['time'] += time.perf_counter() - begin
+
+        collector = timing.start()
+        begin = time.perf_counter()
+        try:
+            with connection.execute_wrapper(db_wrapper):
+                response = self.get_response(request)
+        finally:
+            timing.stop()
+        total = time.perf_counter() - begin
+
+        metrics = [('total', total, None),
+                   ('db', db['time'], "%d queries" % db['queries'])]
+        for name, header_name in TIMINGS:
+            metrics.append((header_name, collector.totals.get(name, 0.0),
+                            None))
+
+        response['Server-Timing'] = ", ".join(
+            "%s;dur=%.2f" % (name, seconds * 1000) +
+            (';desc="%s"' % desc if desc else "")
+            for name, seconds, desc in metrics)
+
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            'db_ms': round(db['time'] * 1000, 3),
+            'db_queries': db['queries'],
+        }
+        for name, _ in TIMINGS:
+            record[name + '_ms'] = round(collector.totals.get(name, 0.0) *
+                                         1000, 3)
+            record[name + '_calls'] = collector.calls.get(name, 0)
+        logger.info(json.dumps(record, sort_keys=True))
+
+        return response
+
+
+class MetricsMiddleware(object):
+    """
+        Registra el número de peticiones y el histograma de latencia de
+        cada vista en el registro de métricas (ver logic.metrics).
+
+        Methods
+        -------
+        __call__(self, request)
+            Procesa la petición y registra sus métricas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        begin = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - begin
+
+        # Usamos el nombre de la url sin espacio de nombres, ya que las
+        # vistas están publicadas con y sin el prefijo mouse_cat/
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unresolved'
+        REGISTRY.inc('paccat_view_requests_total', view=view,
+                     code='%dxx' % (response.status_code // 100))
+        REGISTRY.observe('paccat_view_latency_seconds', elapsed, view=view)
+        return response
@@ -0,0 +1,64 @@
+"""
+    Avisos de cambios en las partidas a través de la capa de canales
+    (settings.CHANNEL_LAYERS). Los consumidores asíncronos de
+    logic.consumers se suscriben al grupo de la partida y se despiertan
+    cuando se confirma un movimiento.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger('paccat.notify')
+
+# Tipo del mensaje que se envía al grupo (game.update -> game_update)
+GAME_UPDATE = 'game.update'
+
+
+def game_group(game_id):
+    """
+        Nombre del grupo de la capa de canales de una partida.
+
+        Author
+        -------
+            Eric Morales
+    """
+    return 'game_%d' % int(game_id)
+
+
+def notify_game(game_id):
+    """
+        Avisa a los suscriptores de una partida de que ha cambiado. El aviso
+        se envía cuando se confirma la transacción actual, para que quien lo
+        reciba lea ya el estado nuevo.
+
+        Parameters
+        ----------
+        game_id : int
+            Id de la partida
+
+        Author
+        -------
+            Eric Morales
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+
+    def send():
+        try:
+            async_to_sync(layer.group_send)(game_group(game_id), {
+                'type': GAME_UPDATE, 'game_id': int(game_id)})
+        except Exception:
+            # Un fallo de la capa de canales no debe afectar al movimiento;
+            # los clientes lo verán al agotar su espera
+            logger.exception("No se ha podido notificar la partida %s",
+                             game_id)
+
+    transaction.on_commit(send)
@@ -0,0 +1,284 @@
+"""
+    Tests de la API versionada (logic.api).
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from datamodel import book, constants, heatmap
+from datamodel.bulk import build_game, bulk_insert_games
+from datamodel.engine import replay
+from datamodel.models import Game, GameStatus, Move
+from datamodel.sample_games import CAT_WIN_MOVES
+from logic import api
+from logic.tests_services import PlayGameBaseServiceTests
+
+MOVES = [(0, 9), (59, 50), (2, 11)]
+
+
+class ApiTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.game = Game.objects.create(
+            cat_user=self.user1, mouse_user=self.user2,
+            status=GameStatus.ACTIVE)
+        self.loginTestUser(self.client1, self.user1)
+        self.loginTestUser(self.client2, self.user2)
+
+    def tearDown(self):
+        super().tearDown()
+
+    def move(self, client, origin, target, game=None):
+        response = client.post(
+            reverse('api_move', args=[(game or self.game).id]),
+            {'origin': origin, 'target': target})
+        return response.status_code, json.loads(self.decode(
+            response.content))['status']
+
+    def finish(self):
+        for ply, (origin, target) in enumerate(MOVES):
+            Move.objects.create(game=self.game, origin=origin, target=target,
+                                player=self.user1 if ply % 2 == 0
+                                else self.user2)
+        self.game.status = GameStatus.FINISHED
+        self.game.save()
+
+    def test1(self):
+        """ Movimientos por url, sin usar la sesión """
+        self.assertEqual(self.move(self.client1, 0, 9), (200, 0))
+        self.assertEqual(self.move(self.client2, 59, 50), (200, 0))
+        self.assertEqual(self.move(self.client1, 0, 1), (200, -1))
+        self.assertNotIn(constants.GAME_SELECTED_SESSION_ID,
+                         self.client1.session)
+
+        game = Game.objects.get(id=self.game.id)
+        self.assertEqual((game.cat1, game.mouse, game.cat_turn),
+                         (9, 50, True))
+
+    def test2(self):
+        """ Solo puede mover el jugador al que le toca """
+        self.assertEqual(self.move(self.client2, 59, 50), (200, -1))
+        self.assertEqual(self.move(self.client1, 0, 9), (200, 0))
+        self.assertEqual(self.move(self.client1, 2, 11), (200, -1))
+        self.assertEqual(Move.objects.filter(game=self.game).count(), 1)
+
+    def test3(self):
+        """ Autorización: sesión iniciada y participante de la partida """
+        other = User.objects.create(username='api_other')
+        foreign = Game.objects.create(cat_user=other)
+        self.assertEqual(self.move(self.client1, 0, 9, foreign), (403, -2))
+
+        self.logoutTestUser(self.client1)
+        self.assertEqual(self.move(self.client1, 0, 9), (401, -2))
+
+        response = self.client2.get(reverse('api_game', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client2.get(reverse('api_move', args=[self.game.id]))
+        self.assertEqual(response.status_code, 405)
+
+    def test4(self):
+        """ Estado de la partida con peticiones condicionales """
+        self.move(self.client1, 0, 9)
+        url = reverse('api_game', args=[self.game.id])
+        response = self.client2.get(url)
+        data = json.loads(self.decode(response.content))
+        self.assertEqual(data['cats'], [9, 2, 4, 6])
+        self.assertEqual((data['origin'], data['target']), (0, 9))
+        self.assertTrue(data['my_turn'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        etag = response['ETag']
+        response = self.client2.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.move(self.client2, 59, 50)
+        response = self.client2.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test5(self):
+        """ Reproducción por número de movimiento """
+        url = reverse('api_replay', args=[self.game.id, 0])
+        self.assertEqual(self.client1.get(url).status_code, 409)
+
+        self.finish()
+        for ply, (origin, target) in enumerate(MOVES):
+            response = self.client2.get(reverse('api_replay',
+                                                args=[self.game.id, ply]))
+            data = json.loads(self.decode(response.content))
+            self.assertEqual((data['origin'], data['target'], data['plies']),
+                             (origin, target, len(MOVES)))
+            self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client2.get(reverse('api_replay', args=[
+            self.game.id, len(MOVES)]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn(constants.GAME_SELECTED_MOVE_NUMBER,
+                         self.client2.session)
+
+    def test6(self):
+        """ Las páginas de juego y reproducción usan la API """
+        response = self.client1.get(reverse('select_game', kwargs={
+            'tipo': 1, 'game_id': self.game.id}))
+        self.assertContains(response, reverse('api_move',
+                                              args=[self.game.id]))
+
+        self.finish()
+        response = self.client1.get(reverse('reproduce_game', kwargs={
+            'game_id': self.game.id}))
+        self.assertContains(response, reverse('api_replay',
+                                              args=[self.game.id, 0]))
+
+
+class OpeningBookApiTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'book.bin')
+        book.OpeningBook.build([(MOVES, 1), (MOVES[:1], 2)],
+                               max_depth=10).save(path)
+        settings = override_settings(OPENING_BOOK_FILE=path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        book.reset_book()
+        self.addCleanup(book.reset_book)
+
+    def tearDown(self):
+        super().tearDown()
+
+    def get(self, moves):
+        response = self.client1.get(reverse('api_book'), {'moves': moves})
+        return response.status_code, json.loads(self.decode(
+            response.content))
+
+    def test1(self):
+        """ El libro se consulta en memoria, sin ir a la base de datos """
+        self.get('')
+        with self.assertNumQueries(0):
+            status, data = self.get('0-9')
+        self.assertEqual(status, 200)
+        self.assertEqual((data['games'], data['cat_wins']), (2, 1))
+        self.assertEqual(data['moves'], [{'origin': 59, 'target': 50,
+                                          'games': 1, 'cat_wins': 1}])
+
+        self.assertEqual(self.get('2-11')[1]['games'], 0)
+        self.assertEqual(self.get('0-99')[0], 400)
+
+    def test2(self):
+        """ Las páginas de juego y reproducción consultan el libro """
+        game = Game.objects.create(cat_user=self.user1, mouse_user=self.user2)
+        Move.objects.create(game=game, origin=0, target=9, player=self.user1)
+        self.loginTestUser(self.client1, self.user1)
+        response = self.client1.get(reverse('select_game', kwargs={
+            'tipo': 1, 'game_id': game.id}))
+        self.assertContains(response, reverse('api_book'))
+        self.assertContains(response, "'0-9'.split")
+
+        for ply, (origin, target) in enumerate(MOVES[1:], 1):
+            Move.objects.create(game=game, origin=origin, target=target,
+                                player=self.user1 if ply % 2 == 0
+                                else self.user2)
+        game.status = GameStatus.FINISHED
+        game.save()
+        response = self.client1.get(reverse('reproduce_game', kwargs={
+            'game_id': game.id}))
+        self.assertContains(response, reverse('api_book'))
+
+
+class PositionSearchTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.loginTestUser(self.client1, self.user1)
+
+    def tearDown(self):
+        super().tearDown()
+
+    def search(self, **params):
+        response = self.client1.get(reverse('api_positions'), params)
+        return response.status_code, json.loads(self.decode(
+            response.content))
+
+    def test1(self):
+        """ Partidas que pasan por una posición, paginadas por id """
+        n_games = api.POSITIONS_PAGE_SIZE + 5
+        bulk_insert_games([build_game(self.user1.id, self.user2.id,
+                                      MOVES[:2], *replay(MOVES[:2]))
+                           for _ in range(n_games)])
+        bulk_insert_games([build_game(self.user1.id, self.user2.id,
+                                      MOVES[:1], *replay(MOVES[:1]))])
+        call_command('index_positions', stdout=StringIO())
+
+        # Tras 0-9 y 59-50 vuelven a mover los gatos
+        position = {'cats': '9,2,4,6', 'mouse': 50, 'cat_turn': 1}
+        status, data = self.search(**position)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(data['games']), api.POSITIONS_PAGE_SIZE)
+        self.assertEqual(data['games'][0]['ply'], 2)
+        self.assertEqual(data['games'][0]['cat_user'], self.user1.username)
+        status, page = self.search(after=data['next'], **position)
+        self.assertEqual(len(page['games']), 5)
+        self.assertIsNone(page['next'])
+        ids = [game['id'] for game in data['games'] + page['games']]
+        self.assertEqual(ids, sorted(set(ids)))
+
+        # Tras 0-9 mueve el PAC: también la partida de un solo movimiento
+        status, data = self.search(cats='2,4,6,9', mouse=59, cat_turn=0)
+        self.assertEqual(len(data['games']), api.POSITIONS_PAGE_SIZE)
+
+    def test2(self):
+        """ Posiciones no válidas y usuarios anónimos """
+        self.assertEqual(self.search(cats='0,2,4', mouse=59)[0], 400)
+        self.assertEqual(self.search(cats='0,2,4,6', mouse=64)[0], 400)
+        self.assertEqual(self.search(cats='0,2,4,6')[0], 400)
+        status, data = self.search(cats='0,2,4,6', mouse=59)
+        self.assertEqual((status, data['games']), (200, []))
+
+        self.client1.logout()
+        self.assertEqual(self.search(cats='0,2,4,6', mouse=59)[0], 401)
+
+
+class HeatmapApiTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+
+    def test1(self):
+        """ Mapas de calor por pieza, ganador y tramo, con una sola
+        consulta y cacheables """
+        bulk_insert_games([build_game(self.user1.id, self.user2.id,
+                                      CAT_WIN_MOVES, *replay(CAT_WIN_MOVES))])
+        call_command('index_positions', stdout=StringIO())
+        # Las partidas cargadas en bloque no tienen fecha de fin: solo las
+        # cuenta la reconstrucción
+        heatmap.rebuild(settle_seconds=0)
+
+        with self.assertNumQueries(1):
+            response = self.client1.get(reverse('api_heatmaps'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        data = json.loads(self.decode(response.content))
+        self.assertEqual(data['bucket_plies'], heatmap.BUCKET_PLIES)
+        self.assertEqual(len(data['mouse']['cat_wins']), heatmap.BUCKETS)
+        self.assertEqual([len(counts) for counts in data['cat']['cat_wins']],
+                         [64] * heatmap.BUCKETS)
+        self.assertEqual(data['cat']['cat_wins'][0][0], 1)
+        # El PAC sigue en 59 tras el primer movimiento de los gatos
+        self.assertEqual(data['mouse']['cat_wins'][0][59], 2)
+        self.assertEqual(sum(map(sum, data['mouse']['cat_wins'])),
+                         len(CAT_WIN_MOVES) + 1)
+        self.assertFalse(any(map(any, data['cat']['mouse_wins'])))
@@ -0,0 +1,138 @@
+"""
+    Tests del despliegue ASGI y de la espera asíncrona de movimientos.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import HttpCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+from datamodel.models import Game, GameStatus, Move
+from logic.api import game_version
+from logic.notify import notify_game
+from logic.tests_services import PlayGameBaseServiceTests
+from ratonGato.asgi import application
+
+
+class AsgiWaitTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.game = Game.objects.create(
+            cat_user=self.user1, mouse_user=self.user2,
+            status=GameStatus.ACTIVE)
+        self.loginTestUser(self.client1, self.user1)
+        self.loginTestUser(self.client2, self.user2)
+
+    def tearDown(self):
+        super().tearDown()
+
+    def headers(self, client):
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+        return [(b'cookie', ('%s=%s' % (settings.SESSION_COOKIE_NAME,
+                                        cookie)).encode())]
+
+    def wait_url(self, since=''):
+        return reverse('api_wait', args=[self.game.id]) + '?since=' + since
+
+    def communicator(self, path, client=None):
+        path, _, query = path.partition('?')
+        communicator = HttpCommunicator(
+            application, 'GET', path,
+            headers=self.headers(client) if client else None)
+        communicator.scope['query_string'] = query.encode()
+        return communicator
+
+    def get(self, path, client=None, timeout=5):
+        """
+            Realiza la petición y devuelve (código, cuerpo). El adaptador
+            WSGI puede enviar un último mensaje sin cuerpo, así que no usamos
+            HttpCommunicator.get_response.
+
+            Author
+            -------
+                Eric Morales
+        """
+
+        async def request():
+            communicator = self.communicator(path, client)
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(timeout)
+            body = b''
+            while True:
+                message = await communicator.receive_output(timeout)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    return start['status'], body
+
+        return async_to_sync(request)()
+
+    @database_sync_to_async
+    def move(self, player, origin, target):
+        game = Game.objects.get(id=self.game.id)
+        Move.objects.create(game=game, player=player, origin=origin,
+                            target=target)
+        notify_game(game.id)
+
+    def test1(self):
+        """ Sin ASGI, la espera devuelve el estado inmediatamente """
+        response = self.client2.get(self.wait_url())
+        data = json.loads(self.decode(response.content))
+        self.assertEqual(data['version'], game_version(self.game))
+        self.assertFalse(data['my_turn'])
+
+    def test2(self):
+        """ El consumidor espera hasta que se confirma un movimiento """
+        version = game_version(self.game)
+
+        async def scenario():
+            communicator = self.communicator(self.wait_url(version),
+                                             self.client2)
+            await communicator.send_input({'type': 'http.request'})
+            self.assertTrue(await communicator.receive_nothing(0.3))
+
+            await self.move(self.user1, 0, 9)
+            start = await communicator.receive_output(5)
+            body = await communicator.receive_output(5)
+            return start, json.loads(body['body'].decode())
+
+        start, data = async_to_sync(scenario)()
+        self.assertEqual(start['status'], 200)
+        self.assertNotEqual(data['version'], version)
+        self.assertEqual((data['origin'], data['target']), (0, 9))
+        self.assertTrue(data['my_turn'])
+
+    @override_settings(WAIT_MOVE_TIMEOUT=0.2)
+    def test3(self):
+        """ Si no cambia nada, responde al agotar la espera """
+        version = game_version(self.game)
+        status, body = self.get(self.wait_url(version), self.client2)
+        self.assertEqual(json.loads(body.decode())['version'], version)
+
+        # Con una versión antigua responde sin esperar
+        status, body = self.get(self.wait_url('antigua'), self.client2,
+                                timeout=1)
+        self.assertEqual(status, 200)
+
+    def test4(self):
+        """ Autorización igual que en la API """
+        self.assertEqual(self.get(self.wait_url())[0], 401)
+
+        other = User.objects.create(username='asgi_other')
+        self.game.mouse_user = other
+        self.game.save()
+        self.assertEqual(self.get(self.wait_url(), self.client2)[0], 403)
+
+    def test5(self):
+        """ El resto de las urls las atiende la aplicación WSGI """
+        status, body = self.get(reverse('counter'), self.client1)
+        self.assertEqual(status, 200)
+        self.assertIn(b'Contador', body)
@@ -0,0 +1,68 @@
+"""
+    Tests de los comandos bench y bench_compare.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+
+class BenchTests(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, data):
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+
+    def test1(self):
+        """ Los resultados se guardan por commit """
+        out = StringIO()
+        call_command('bench', '--keep-db', '--only', 'valid_move',
+                     'view:turn', '--repeat', '2', '--scale', '0.01',
+                     '--commit', 'abc', '--output', self.path, stdout=out)
+        with open(self.path) as f:
+            data = json.load(f)
+        self.assertEqual(set(data['abc']['results']),
+                         {'valid_move', 'view:turn'})
+        self.assertGreater(data['abc']['results']['valid_move']['median_us'],
+                           0)
+        self.assertIn('abc', out.getvalue())
+
+    def test2(self):
+        """ Se marcan las regresiones por encima del umbral """
+        self.write({
+            'base': {'date': '1', 'results': {
+                'a': {'median_us': 100.0}, 'b': {'median_us': 100.0}}},
+            'head': {'date': '2', 'results': {
+                'a': {'median_us': 105.0}, 'b': {'median_us': 150.0}}},
+        })
+        out = StringIO()
+        with self.assertRaisesRegex(CommandError, r'1 regresiones.*: b'):
+            call_command('bench_compare', '--input', self.path, stdout=out)
+        self.assertIn('REGRESIÓN', out.getvalue())
+
+        call_command('bench_compare', 'base', 'head', '--threshold', '60',
+                     '--input', self.path, stdout=StringIO())
+
+    def test3(self):
+        """ Error si falta alguno de los commits """
+        self.write({'base': {'date': '1', 'results': {}}})
+        with self.assertRaises(CommandError):
+            call_command('bench_compare', '--input', self.path,
+                         stdout=StringIO())
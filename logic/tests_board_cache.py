@@ -0,0 +1,99 @@
+"""
+    Tests de la caché del html del tablero (logic.board_cache).
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import override_settings
+from django.urls import reverse
+
+from datamodel.models import Game, GameStatus, Move
+from logic import board_cache
+from logic.board_cache import LOCAL_CACHE, LRUCache, board_rows, \
+    game_board, initial_board, render_board
+from logic.metrics import REGISTRY, _key
+from logic.tests_services import PlayGameBaseServiceTests
+
+
+class BoardCacheTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        LOCAL_CACHE.clear()
+        cache.clear()
+
+    def tearDown(self):
+        super().tearDown()
+
+    def hits(self, name='board'):
+        return REGISTRY.counters.get(('paccat_cache_requests_total', _key({
+            'cache': name, 'result': 'hit'})), 0)
+
+    def test1(self):
+        """ LRU: se descarta la entrada usada hace más tiempo """
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c'), len(lru)), (1, 3, 2))
+
+    def test2(self):
+        """ El html cacheado es el de la plantilla y se reutiliza """
+        html = render_board((9, 2, 4, 6), 50)
+        self.assertEqual(html, render_to_string(
+            'mouse_cat/board.html', {'board': board_rows((9, 2, 4, 6), 50)}))
+        self.assertIn('sprite-personajes-char1" id="1_1"', html)
+
+        hits = self.hits()
+        self.assertEqual(render_board((9, 2, 4, 6), 50), html)
+        self.assertEqual(self.hits(), hits + 1)
+
+        # Cada gato tiene su imagen: el orden importa
+        self.assertNotEqual(render_board((2, 9, 4, 6), 50), html)
+        self.assertEqual(initial_board(), render_board((0, 2, 4, 6), 59))
+
+    def test3(self):
+        """ El turno no forma parte de la clave """
+        game = Game(cat1=9, mouse=50, cat_turn=True)
+        other = Game(cat1=9, mouse=50, cat_turn=False)
+        self.assertEqual(board_cache.board_key((9, 2, 4, 6), 50),
+                         board_cache.board_key((game.cat1, game.cat2,
+                                                game.cat3, game.cat4),
+                                               other.mouse))
+        self.assertEqual(game_board(game), game_board(other))
+
+    @override_settings(BOARD_CACHE='default')
+    def test4(self):
+        """ Caché compartida entre procesos """
+        html = render_board((0, 2, 4, 6), 50)
+        self.assertEqual(cache.get(board_cache.board_key((0, 2, 4, 6), 50)),
+                         html)
+
+        # Otro proceso (caché local vacía) lo encuentra en la compartida
+        LOCAL_CACHE.clear()
+        hits = self.hits('board_shared')
+        self.assertEqual(render_board((0, 2, 4, 6), 50), html)
+        self.assertEqual(self.hits('board_shared'), hits + 1)
+
+    def test5(self):
+        """ Las vistas usan el tablero de la posición actual """
+        game = Game.objects.create(cat_user=self.user1,
+                                   mouse_user=self.user2,
+                                   status=GameStatus.ACTIVE)
+        self.loginTestUser(self.client1, self.user1)
+        self.set_game_in_session(self.client1, self.user1, game.id)
+        response = self.client1.get(reverse('show_game'))
+        self.assertContains(response, initial_board(), html=False)
+
+        Move.objects.create(game=game, player=self.user1, origin=0, target=9)
+        game.refresh_from_db()
+        response = self.client1.get(reverse('create_only_board',
+                                            args=[game.id]))
+        self.assertEqual(response.content.decode(), game_board(game))
+        self.assertIn('id="cell_1_1"', response.content.decode())
+        self.assertNotEqual(game_board(game), initial_board())
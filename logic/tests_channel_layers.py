@@ -0,0 +1,136 @@
+"""
+    Tests de la capa de canales en ficheros (logic.channel_layers).
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, override_settings
+
+from logic.channel_layers import FileChannelLayer
+from logic import tests_websocket
+
+
+class FileChannelLayerTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def layer(self, **kwargs):
+        return FileChannelLayer(directory=self.directory, poll_interval=0.01,
+                                max_poll_interval=0.05, **kwargs)
+
+    def test1(self):
+        """ Dos procesos con el mismo directorio comparten canales y
+        grupos """
+        worker1, worker2 = self.layer(), self.layer()
+
+        async def scenario():
+            channel = await worker1.new_channel()
+            await worker1.group_add('game_1', channel)
+            await worker2.group_send('game_1', {'type': 'game.update',
+                                                'game_id': 1})
+            await worker2.send(channel, {'type': 'other'})
+            first = await worker1.receive(channel)
+            second = await worker1.receive(channel)
+            await worker1.group_discard('game_1', channel)
+            await worker2.group_send('game_1', {'type': 'game.update'})
+            return first, second, worker1.take(channel)
+
+        first, second, left = async_to_sync(scenario)()
+        self.assertEqual(first, {'type': 'game.update', 'game_id': 1})
+        self.assertEqual(second, {'type': 'other'})
+        self.assertIsNone(left)
+
+    def test2(self):
+        """ Capacidad, caducidad de los mensajes y de los grupos """
+        layer = self.layer(capacity=2, expiry=60, group_expiry=60)
+
+        async def scenario():
+            await layer.send('full', {'n': 1})
+            await layer.send('full', {'n': 2})
+            with self.assertRaises(ChannelFull):
+                await layer.send('full', {'n': 3})
+            # En group_send, los canales llenos no impiden el envío al resto
+            await layer.group_add('group', 'full')
+            await layer.group_add('group', 'empty')
+            await layer.group_send('group', {'n': 4})
+            return layer.take('empty')
+
+        self.assertEqual(async_to_sync(scenario)(), {'n': 4})
+
+        old = time.time() - 120
+        for name in os.listdir(layer.channel_dir('full')):
+            os.utime(os.path.join(layer.channel_dir('full'), name),
+                     (old, old))
+        os.utime(os.path.join(layer.group_dir('group'), 'empty'), (old, old))
+        self.assertIsNone(layer.take('full'))
+        async_to_sync(layer.group_send)('group', {'n': 5})
+        self.assertIsNone(layer.take('empty'))
+        self.assertEqual(layer.take('full'), {'n': 5})
+
+        async_to_sync(layer.flush)()
+        self.assertFalse(os.path.exists(self.directory))
+
+
+    def test3(self):
+        """ Los directorios de los canales y los grupos se borran en cuanto
+        se quedan vacíos """
+        layer = self.layer()
+
+        async def scenario():
+            channel = await layer.new_channel()
+            await layer.group_add('game_1', channel)
+            await layer.group_send('game_1', {'n': 1})
+            await layer.send(channel, {'n': 2})
+            received = [await layer.receive(channel),
+                        await layer.receive(channel)]
+            await layer.group_discard('game_1', channel)
+            return received
+
+        self.assertEqual(async_to_sync(scenario)(), [{'n': 1}, {'n': 2}])
+        self.assertEqual(os.listdir(os.path.join(self.directory,
+                                                 'channels')), [])
+        self.assertEqual(os.listdir(os.path.join(self.directory,
+                                                 'groups')), [])
+
+        # Un receptor sin mensajes consulta cada vez más despacio
+        waits = []
+
+        async def sleep(delay):
+            waits.append(delay)
+            if len(waits) == 6:
+                await layer.send('idle', {'n': 3})
+
+        with mock.patch('logic.channel_layers.asyncio.sleep', sleep):
+            self.assertEqual(async_to_sync(layer.receive)('idle'),
+                             {'n': 3})
+        self.assertEqual(waits, [0.01, 0.02, 0.04, 0.05, 0.05, 0.05])
+
+
+class FileLayerGameConsumerTests(tests_websocket.GameConsumerTests):
+    """
+        El canal WebSocket de las partidas, con la capa en ficheros.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        settings = override_settings(CHANNEL_LAYERS={'default': {
+            'BACKEND': 'logic.channel_layers.FileChannelLayer',
+            'CONFIG': {'directory': directory, 'poll_interval': 0.01,
+                       'max_poll_interval': 0.05}}})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.assertIsInstance(get_channel_layer(), FileChannelLayer)
+        super().setUp()
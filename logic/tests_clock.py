@@ -0,0 +1,95 @@
+"""
+    Tests de las partidas con reloj por movimiento.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from datamodel import clock, constants
+from datamodel.models import Game, GameStatus, check_winner
+from logic.tests_services import PlayGameBaseServiceTests
+
+
+class ClockServiceTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.game = Game.objects.create(cat_user=self.user1,
+                                        mouse_user=self.user2, move_time=30)
+        self.loginTestUser(self.client1, self.user1)
+        self.loginTestUser(self.client2, self.user2)
+
+    def tearDown(self):
+        super().tearDown()
+
+    def expire(self):
+        Game.objects.filter(id=self.game.id).update(
+            move_deadline=clock.now() - 1)
+
+    def get_json(self, client, url):
+        return json.loads(self.decode(client.get(url).content))
+
+    def test1(self):
+        """ El estado y turn informan del tiempo que queda """
+        data = self.get_json(self.client2, reverse('api_game',
+                                                   args=[self.game.id]))
+        self.assertAlmostEqual(data['remaining'], 30, delta=1)
+        data = self.get_json(self.client2, reverse('turn', kwargs={
+            'game_id': self.game.id}))
+        self.assertAlmostEqual(data['remaining'], 30, delta=1)
+
+        untimed = Game.objects.create(cat_user=self.user1,
+                                      mouse_user=self.user2)
+        data = self.get_json(self.client2, reverse('turn', kwargs={
+            'game_id': untimed.id}))
+        self.assertIsNone(data['remaining'])
+
+    def test2(self):
+        """ Mover con el tiempo agotado termina la partida """
+        self.expire()
+        response = self.client1.post(reverse('api_move',
+                                             args=[self.game.id]),
+                                     {'origin': 0, 'target': 9})
+        self.assertEqual(json.loads(self.decode(response.content)),
+                         {'status': 2})
+        game = Game.objects.get(id=self.game.id)
+        self.assertEqual(game.status, GameStatus.FINISHED)
+        self.assertEqual(check_winner(game), 2)
+
+    def test3(self):
+        """ Igual con move_service, que toma la partida de la sesión """
+        self.client1.get(reverse('select_game', kwargs={
+            'tipo': 1, 'game_id': self.game.id}))
+        self.expire()
+        response = self.client1.post(reverse('move'),
+                                     {'origin': 0, 'target': 9})
+        self.assertEqual(json.loads(self.decode(response.content)),
+                         {'status': 2})
+        self.assertEqual(Game.objects.get(id=self.game.id).status,
+                         GameStatus.FINISHED)
+
+    def test4(self):
+        """ Se elige el tiempo por movimiento al crear la partida """
+        response = self.client1.get(reverse('create_game') + '?move_time=15')
+        self.assertContains(response, "Tiempo por movimiento")
+        self.assertEqual(Game.objects.order_by('-id').first().move_time, 15)
+
+        response = self.client1.get(reverse('create_game') + '?move_time=7')
+        self.assertContains(response, constants.ERROR_INVALID_MOVE_TIME)
+        self.assertEqual(Game.objects.filter(move_time=7).count(), 0)
+
+    def test5(self):
+        """ El comando barre los relojes vencidos """
+        self.expire()
+        out = StringIO()
+        call_command('sweep_clocks', stdout=out)
+        self.assertIn("1 partidas con el tiempo agotado en 1 lotes",
+                      out.getvalue())
+        self.assertEqual(Game.objects.get(id=self.game.id).status,
+                         GameStatus.FINISHED)
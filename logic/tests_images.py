@@ -0,0 +1,98 @@
+"""
+    Tests del comando build_images (sprites y versiones de los fondos).
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import glob
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from PIL import Image
+
+from logic.management.commands.build_images import SPRITE_GAP, WALLPAPERS
+
+
+class BuildImagesTests(SimpleTestCase):
+    def setUp(self):
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_dir)
+        self.image('img/personajes/char1.png', (30, 20), (255, 0, 0, 255))
+        self.image('img/personajes/main.png', (20, 20), (0, 255, 0, 255))
+        self.image('img/icons/stop.png', (10, 10), (0, 0, 255, 255))
+        for wallpaper in WALLPAPERS:
+            self.image(wallpaper, (1200, 600), (10, 20, 30))
+
+    def image(self, name, size, color):
+        path = os.path.join(self.static_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGBA' if len(color) == 4 else 'RGB', size, color).save(
+            path)
+
+    def path(self, name):
+        return os.path.join(self.static_dir, name)
+
+    def test1(self):
+        """ Sprites y reglas css """
+        call_command('build_images', static_dir=self.static_dir,
+                     stdout=StringIO())
+        with Image.open(self.path('img/sprites/personajes.png')) as sheet:
+            self.assertEqual(sheet.size, (30, 40 + SPRITE_GAP))
+            self.assertEqual(sheet.getpixel((0, 0)), (255, 0, 0, 255))
+            self.assertEqual(sheet.getpixel((0, 20 + SPRITE_GAP)),
+                             (0, 255, 0, 255))
+
+        with open(self.path('css/sprites.css')) as f:
+            css = f.read()
+        self.assertIn(".sprite-personajes-char1 { background-image: "
+                      "url(../img/sprites/personajes.png); width: 30px; "
+                      "height: 20px; background-size: 100% 210%; "
+                      "background-position: 0% 0%; }", css)
+        self.assertIn("background-position: 0% 100%;", css)
+        self.assertIn(".sprite-small.sprite-personajes-char1 { width: "
+                      "3.000rem; height: 2rem; }", css)
+        self.assertIn(".sprite-icons-stop {", css)
+
+    def test2(self):
+        """ Versiones de los fondos, sin ampliar la imagen """
+        call_command('build_images', static_dir=self.static_dir,
+                     stdout=StringIO())
+        for width, expected in ((960, (960, 480)), (1680, (1200, 600))):
+            for extension, image_format in (('webp', 'WEBP'),
+                                            ('jpg', 'JPEG')):
+                with Image.open(self.path('img/wallpapers/wallpaper1-%d.%s' % (
+                        width, extension))) as image:
+                    self.assertEqual((image.format, image.size),
+                                     (image_format, expected))
+
+    def test3(self):
+        """ Los ficheros generados del repositorio cubren las plantillas """
+        with open(os.path.join(settings.STATIC_DIR, 'css',
+                               'sprites.css')) as f:
+            defined = set(re.findall(r'\.(sprite-[\w-]+) \{', f.read()))
+
+        used = set()
+        sources = glob.glob(os.path.join(settings.BASE_DIR, 'templates',
+                                         'mouse_cat', '*.html'))
+        sources.append(os.path.join(settings.STATIC_DIR, 'js', 'main.js'))
+        for source in sources:
+            with open(source) as f:
+                used.update(re.findall(r'sprite-(?:personajes|icons)-[\w-]+',
+                                       f.read()))
+        # El tablero compone el nombre de los gatos con su número
+        used.discard('sprite-personajes-char')
+        self.assertTrue(used)
+        self.assertFalse(used - defined)
+
+        for wallpaper in WALLPAPERS:
+            name = os.path.splitext(os.path.basename(wallpaper))[0]
+            self.assertTrue(glob.glob(os.path.join(
+                settings.STATIC_DIR, 'img', 'wallpapers', name + '-*.webp')))
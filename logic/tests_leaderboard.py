@@ -0,0 +1,90 @@
+"""
+    Tests de la clasificación y del perfil de los jugadores.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from datamodel.models import Rating, UserStats
+from logic.leaderboard import leaderboard_page, parse_cursor
+
+
+@override_settings(LEADERBOARD_PAGE_SIZE=2, LEADERBOARD_CACHED_PAGES=1)
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i, rating in enumerate([1600, 1550, 1550, 1400, 1300]):
+            user = User.objects.create_user('leader_%d' % i)
+            Rating.objects.create(user=user, rating=rating, games=1)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test1(self):
+        """ Las páginas siguen a la anterior sin repetir ni saltar filas """
+        seen = []
+        cursor = None
+        while True:
+            rows, cursor = leaderboard_page(cursor)
+            seen += rows
+            if cursor is None:
+                break
+        self.assertEqual([row['username'] for row in seen],
+                         ['leader_0', 'leader_2', 'leader_1', 'leader_3',
+                          'leader_4'])
+        self.assertEqual([row['rank'] for row in seen], [1, 2, 3, 4, 5])
+
+    def test2(self):
+        """ Las primeras páginas se sirven de la caché """
+        leaderboard_page()
+        with self.assertNumQueries(0):
+            rows, cursor = leaderboard_page()
+        with self.assertNumQueries(1):
+            leaderboard_page(cursor)
+        with self.assertNumQueries(1):
+            leaderboard_page(cursor)
+
+    def test3(self):
+        """ Un cursor no válido muestra la primera página """
+        self.assertEqual(parse_cursor('x_y'), (None, 0))
+        response = self.client.get(reverse('leaderboard'), {'after': 'x'})
+        self.assertContains(response, 'leader_0')
+        self.assertContains(response, '1600')
+
+
+class ProfileTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('profile_user')
+        UserStats.objects.create(user=self.user, games_as_cat=3,
+                                 wins_as_cat=2, games_as_mouse=1, plies=60)
+
+    def test1(self):
+        """ Las estadísticas se leen en una sola consulta """
+        url = reverse('api_user_stats', kwargs={'username': 'profile_user'})
+        with self.assertNumQueries(1):
+            data = self.client.get(url).json()
+        self.assertEqual(data['games'], 4)
+        self.assertEqual(data['wins'], 2)
+        self.assertEqual(data['losses'], 2)
+        self.assertEqual(data['average_length'], 15.0)
+
+        response = self.client.get(reverse(
+            'profile', kwargs={'username': 'profile_user'}))
+        self.assertContains(response, 'Duración media: 15.0')
+
+    def test2(self):
+        """ Un jugador sin partidas tiene todo a cero; uno que no existe da
+        error """
+        User.objects.create_user('profile_new')
+        data = self.client.get(reverse(
+            'api_user_stats', kwargs={'username': 'profile_new'})).json()
+        self.assertEqual(data['games'], 0)
+        response = self.client.get(reverse(
+            'api_user_stats', kwargs={'username': 'nobody'}))
+        self.assertEqual(response.status_code, 404)
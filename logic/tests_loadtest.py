@@ -0,0 +1,74 @@
+"""
+    Tests del generador de carga.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import LiveServerTestCase
+from django.urls import reverse
+
+from datamodel.models import Game, GameStatus
+from logic.management.commands.loadtest import Player, Stats, move_ok, \
+    percentile
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    def play(self, *args):
+        out = StringIO()
+        call_command('loadtest', '--url', self.live_server_url, '--pairs',
+                     '1', '--concurrency', '1', '--max-plies', '6',
+                     '--seed', '3', *args, stdout=out)
+        game = Game.objects.get()
+        self.assertEqual(game.status, GameStatus.ACTIVE)
+        self.assertEqual(game.moves.count(), 6)
+        return out.getvalue()
+
+    def test1(self):
+        """ Una pareja juega una partida completa con los servicios de
+        views.py """
+        report = self.play()
+        for endpoint in ['signup', 'login', 'create_game', 'join_game',
+                         'move', 'turn']:
+            self.assertRegex(report, r'\n%s +\d+ +0 ' % endpoint)
+        self.assertRegex(report, r'\nmove +6 +0 ')
+        self.assertNotIn('api_', report)
+
+    def test2(self):
+        """ Percentiles por rango más cercano """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test3(self):
+        """ Con --target api juega con la API versionada """
+        report = self.play('--target', 'api')
+        for endpoint in ['create_game', 'join_game', 'api_move',
+                         'api_wait']:
+            self.assertRegex(report, r'\n%s +\d+ +0 ' % endpoint)
+        self.assertRegex(report, r'\napi_move +6 +0 ')
+        self.assertNotRegex(report, r'\n(move|turn) ')
+
+    def test4(self):
+        """ Un movimiento rechazado cuenta como error aunque la respuesta
+        sea 200 """
+        self.assertTrue(move_ok('{"status": 0}'))
+        self.assertTrue(move_ok('{"status": 2}'))
+        self.assertFalse(move_ok('{"status": -1}'))
+        self.assertFalse(move_ok('<html></html>'))
+        self.assertFalse(move_ok(''))
+
+        # Sin sesión, move redirige al login
+        stats = Stats()
+        player = Player(self.live_server_url, stats, 'nobody', 'secret')
+        body = player.request('move', reverse('move'),
+                              {'origin': 0, 'target': 9}, check=move_ok)
+        self.assertFalse(move_ok(body))
+        self.assertEqual(stats.errors, {'move': 1})
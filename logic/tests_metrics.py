@@ -0,0 +1,179 @@
+"""
+    Tests del registro de métricas y del endpoint /metrics.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from datamodel.models import Game, GameStatus
+from logic.metrics import Registry, record_cache
+from logic.tests_services import PlayGameBaseServiceTests
+
+
+class RegistryTests(SimpleTestCase):
+    def test1(self):
+        """ Contadores, histogramas y ratio de aciertos de caché """
+        registry = Registry(buckets=(0.1, 1.0))
+        registry.inc('paccat_moves_total')
+        registry.inc('paccat_moves_total', 2)
+        registry.observe('paccat_view_latency_seconds', 0.05, view='turn')
+        registry.observe('paccat_view_latency_seconds', 0.5, view='turn')
+        registry.inc('paccat_cache_requests_total', cache='board',
+                     result='hit')
+        registry.inc('paccat_cache_requests_total', 3, cache='board',
+                     result='miss')
+        registry.touch('paccat_active_polling_clients', 'a')
+        registry.touch('paccat_active_polling_clients', 'a')
+        registry.touch('paccat_active_polling_clients', 'b')
+
+        text = registry.render()
+        self.assertIn("paccat_moves_total 3\n", text)
+        self.assertIn('paccat_view_latency_seconds_bucket{view="turn",'
+                      'le="0.1"} 1\n', text)
+        self.assertIn('paccat_view_latency_seconds_bucket{view="turn",'
+                      'le="+Inf"} 2\n', text)
+        self.assertIn('paccat_view_latency_seconds_count{view="turn"} 2\n',
+                      text)
+        self.assertIn('paccat_cache_hit_ratio{cache="board"} 0.25\n', text)
+        self.assertIn("paccat_active_polling_clients 2\n", text)
+
+    def test2(self):
+        """ Agregación entre procesos mediante ficheros """
+        directory = tempfile.mkdtemp()
+        try:
+            with override_settings(METRICS_MULTIPROC_DIR=directory):
+                worker1, worker2 = Registry(), Registry()
+                worker1.inc('paccat_games_created_total')
+                worker1.touch('paccat_active_polling_clients', 'a')
+                worker1.flush()
+                # Simulamos un segundo proceso vivo con otro fichero
+                with open(directory + '/metrics_%d.json' % os.getppid(),
+                          'w') as f:
+                    worker2.inc('paccat_games_created_total', 4)
+                    worker2.touch('paccat_active_polling_clients', 'a')
+                    worker2.touch('paccat_active_polling_clients', 'b')
+                    json.dump(worker2.snapshot(), f)
+
+                text = worker1.render()
+            self.assertIn("paccat_games_created_total 5\n", text)
+            self.assertIn("paccat_active_polling_clients 2\n", text)
+        finally:
+            shutil.rmtree(directory)
+
+    def test3(self):
+        """ Los contadores de los procesos que ya no existen se archivan,
+        así que los totales no bajan; sus clientes activos se descartan """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            registry = Registry()
+            registry.inc('paccat_moves_total')
+            stale = os.path.join(directory, 'metrics_%d.json' % dead.pid)
+            other = Registry()
+            other.inc('paccat_moves_total', 10)
+            other.observe('paccat_view_latency_seconds', 0.2, view='index')
+            other.touch('paccat_active_polling_clients', 'dead')
+            with open(stale, 'w') as f:
+                json.dump(other.snapshot(), f)
+
+            for _ in range(2):
+                text = registry.render()
+                self.assertIn("paccat_moves_total 11\n", text)
+                self.assertIn('paccat_view_latency_seconds_count'
+                              '{view="index"} 1\n', text)
+                self.assertIn("paccat_active_polling_clients 0\n", text)
+                self.assertFalse(os.path.exists(stale))
+
+    def test4(self):
+        """ Varios hilos pueden guardar a la vez """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        errors = []
+
+        def work():
+            try:
+                for _ in range(50):
+                    registry.inc('paccat_moves_total')
+                    registry.flush()
+            except Exception as e:  # pragma: no cover - fallo del test
+                errors.append(e)
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory,
+                               METRICS_FLUSH_INTERVAL=0):
+            registry = Registry()
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertIn("paccat_moves_total 400\n", registry.render())
+        self.assertEqual(sorted(name for name in os.listdir(directory)
+                                if name.startswith('metrics_')),
+                         ['metrics_%d.json' % os.getpid()])
+
+
+class MetricsServiceTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+
+    def metric(self, text, name):
+        m = re.search(r'^%s (\d+)$' % re.escape(name), text, re.M)
+        return int(m.group(1)) if m else 0
+
+    def test1(self):
+        """ Las vistas de juego actualizan las métricas """
+        before = self.client1.get(reverse('metrics')).content.decode()
+
+        self.loginTestUser(self.client1, self.user1)
+        self.client1.get(reverse('create_game'))
+        game = Game.objects.get(cat_user=self.user1)
+        self.loginTestUser(self.client2, self.user2)
+        self.client2.get(reverse('select_game', kwargs={
+            'tipo': 2, 'game_id': game.id}))
+        self.set_game_in_session(self.client1, self.user1, game.id)
+        self.client1.post(reverse('move'), {'origin': 0, 'target': 9})
+        self.client2.post(reverse('turn', args=[game.id]))
+        record_cache('board', True)
+
+        response = self.client1.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        for name in ['paccat_games_created_total',
+                     'paccat_games_joined_total', 'paccat_moves_total']:
+            self.assertEqual(self.metric(text, name),
+                             self.metric(before, name) + 1)
+        self.assertGreaterEqual(
+            self.metric(text, 'paccat_active_polling_clients'), 1)
+        self.assertIn('paccat_view_latency_seconds_count{view="move"}', text)
+        self.assertIn('paccat_view_requests_total{code="2xx",view="turn"}',
+                      text)
+        self.assertEqual(Game.objects.get(id=game.id).status,
+                         GameStatus.ACTIVE)
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test2(self):
+        """ Acceso protegido con token """
+        self.assertEqual(self.client1.get(reverse('metrics')).status_code,
+                         403)
+        response = self.client1.get(reverse('metrics'),
+                                    HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,69 @@
+"""
+    Tests del comando page_weight y de la ruta crítica de las páginas.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from logic.management.commands.page_weight import asset_size, measure_html
+
+HTML = """<html><head>
+<link rel="stylesheet" href="/static/css/style.css">
+<link rel="stylesheet" href="/static/css/animate.css" media="print">
+<script src="/static/js/jquery-3.2.1.min.js"></script>
+<script src="/static/js/main.js" defer></script>
+<script src="https://example.com/externo.js" defer></script>
+</head><body>
+<script src="/static/js/jquery-3.2.1.min.js"></script>
+<script>var song = '/static/music/song.mp3';</script>
+</body></html>"""
+
+
+class PageWeightTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test1(self):
+        """ Recursos bloqueantes, diferidos, externos y bajo demanda """
+        result = measure_html(HTML)
+        css, css_gzip = asset_size('/static/css/style.css')
+        jquery, jquery_gzip = asset_size('/static/js/jquery-3.2.1.min.js')
+        self.assertLess(css_gzip, css)
+
+        # jQuery cuenta una sola vez aunque se cargue dos
+        self.assertEqual(result['blocking_requests'], 2)
+        self.assertEqual(result['requests'], 6)
+        self.assertEqual(result['blocking'], css + jquery)
+        self.assertEqual(result['blocking_gzip'],
+                         result['html_gzip'] + css_gzip + jquery_gzip)
+        self.assertEqual(result['external'], ['https://example.com/externo.js'])
+        self.assertEqual(result['on_demand'], ['/static/music/song.mp3'])
+        self.assertEqual(asset_size('/static/no_existe.css'), (None, None))
+
+    def test2(self):
+        """ Las páginas de juego no bloquean con los recursos de la portada """
+        output = os.path.join(self.tmp, 'page_weight.json')
+        call_command('page_weight', output=output,
+                     commit='test', stdout=StringIO())
+        with open(output) as f:
+            results = json.load(f)['test']['results']
+
+        self.assertEqual(set(results), {'landing', 'login', 'select_game',
+                                        'game', 'replay'})
+        for name in ('game', 'replay'):
+            self.assertLessEqual(results[name]['blocking_requests'], 5)
+            # Solo bootstrap, style, jQuery y poco más (en KB con gzip)
+            self.assertLess(results[name]['blocking_gzip'], 80 * 1024)
+        self.assertEqual(results['game']['on_demand'],
+                         ['/static/music/song.mp3'])
@@ -0,0 +1,82 @@
+"""
+    Tests de la instrumentación de rendimiento por petición.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import json
+import os
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+
+from datamodel.models import Game, GameStatus
+from logic.middleware import PerformanceMiddleware
+from logic.tests_services import PlayGameBaseServiceTests
+
+
+class PerformanceMiddlewareTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.game = Game.objects.create(
+            cat_user=self.user1, mouse_user=self.user2,
+            status=GameStatus.ACTIVE)
+
+    def tearDown(self):
+        super().tearDown()
+
+    @override_settings(PERF_INSTRUMENTATION=False, PERF_TOGGLE_FILE=None)
+    def test1(self):
+        """ Sin instrumentación no se añade la cabecera """
+        response = self.client1.get(reverse('turn', args=[self.game.id]))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PERF_INSTRUMENTATION=True, PERF_TOGGLE_FILE=None)
+    def test2(self):
+        """ Cabecera Server-Timing y línea de log por petición """
+        with self.assertLogs('paccat.perf', level='INFO') as logs:
+            response = self.client1.get(reverse('turn',
+                                                args=[self.game.id]))
+
+        header = response['Server-Timing']
+        for name in ['total', 'db', 'tpl', 'winner', 'move']:
+            self.assertRegex(header, r'\b%s;dur=\d+\.\d+' % name)
+        self.assertIn('2 queries', header)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'turn')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 2)
+        self.assertEqual(record['check_winner_calls'], 1)
+        # Las llamadas a valid_move desde check_winner no se cuentan aparte
+        self.assertEqual(record['valid_move_calls'], 0)
+
+        self.loginTestUser(self.client1, self.user1)
+        with self.assertLogs('paccat.perf', level='INFO') as logs:
+            self.client1.get(reverse('index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['template_calls'], 0)
+
+    def test3(self):
+        """ Activación en caliente mediante el fichero de control """
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with override_settings(PERF_INSTRUMENTATION=False,
+                                   PERF_TOGGLE_FILE=path,
+                                   PERF_TOGGLE_INTERVAL=0):
+                middleware = PerformanceMiddleware(None)
+                self.assertFalse(middleware.switch.enabled())
+                with open(path, 'w') as f:
+                    f.write('on')
+                os.utime(path, (1, 1))
+                self.assertTrue(middleware.switch.enabled())
+                with open(path, 'w') as f:
+                    f.write('off')
+                os.utime(path, (2, 2))
+                self.assertFalse(middleware.switch.enabled())
+        finally:
+            os.remove(path)
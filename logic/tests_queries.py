@@ -0,0 +1,310 @@
+"""
+    Tests del número de consultas de las vistas. Cada caso se ejecuta con
+    dos volúmenes de datos distintos y se comprueba que el número de
+    consultas no depende del volumen. Si alguna vista falla, el informe
+    indica la vista y las consultas que han cambiado.
+
+    Para añadir una vista nueva basta con añadir su caso a CASES; test2
+    falla si alguna url de logic.urls no tiene ningún caso.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import random
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from datamodel import constants
+from datamodel.bulk import build_game, bulk_insert_games
+from datamodel.engine import GameState, apply_move, legal_moves, replay
+from datamodel.models import Game, GameStatus, MatchRequest, Move, \
+    Tournament
+from datamodel.sample_games import CAT_WIN_MOVES
+from datamodel.tournament import create_tournament
+from logic import urls
+
+# Partidas de cada tipo por usuario en cada uno de los volúmenes
+SMALL = 6
+LARGE = 30
+
+PASSWORD = 'query_count'
+
+
+class QueryCase(object):
+    """
+        Petición a medir. Los argumentos de la url, los datos y la partida
+        que se guarda en sesión pueden ser nombres de métodos del test, que
+        se llaman en cada ejecución para obtener una partida nueva.
+
+        Methods
+        -------
+        run(self, test)
+            Realiza la petición y devuelve las consultas ejecutadas.
+    """
+
+    def __init__(self, url_name, method='get', kwargs=None, data=None,
+                 game=None, user=True, label=None):
+        self.url_name = url_name
+        self.method = method
+        self.kwargs = kwargs or {}
+        self.data = data
+        self.game = game
+        self.user = user
+        self.label = label or url_name
+
+    def resolve(self, test, value):
+        if isinstance(value, str) and hasattr(test, value):
+            value = getattr(test, value)()
+        return value.id if isinstance(value, Game) else value
+
+    def run(self, test):
+        """
+            Realiza la petición con un cliente nuevo y devuelve las
+            consultas ejecutadas.
+
+            Returns
+            -------
+            list : consultas (diccionarios con sql y time)
+
+            Author
+            -------
+                Eric Morales
+        """
+        client = Client()
+        if self.user:
+            client.force_login(test.user)
+        if self.game:
+            session = client.session
+            session[constants.GAME_SELECTED_SESSION_ID] = self.resolve(
+                test, self.game)
+            session.save()
+
+        url = reverse(self.url_name, kwargs={
+            key: self.resolve(test, value)
+            for key, value in self.kwargs.items()})
+        data = self.resolve(test, self.data) or {}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, self.method)(url, data)
+        test.assertLess(response.status_code, 500, self.label)
+        return queries.captured_queries
+
+
+CASES = [
+    QueryCase('landing', user=False),
+    QueryCase('index'),
+    QueryCase('login', user=False, label='login GET'),
+    QueryCase('login', 'post', user=False, data='login_data',
+              label='login POST'),
+    QueryCase('logout'),
+    QueryCase('signup', user=False, label='signup GET'),
+    QueryCase('signup', 'post', user=False, data='signup_data',
+              label='signup POST'),
+    QueryCase('counter'),
+    QueryCase('create_game'),
+    QueryCase('quick_play', label='quick_play GET'),
+    QueryCase('quick_play', 'post', data='quick_play_data',
+              label='quick_play POST'),
+    QueryCase('quick_play_status'),
+    QueryCase('quick_play_cancel', 'post'),
+    QueryCase('select_game', label='select_game sin tipo'),
+    QueryCase('select_game', kwargs={'tipo': 1}, label='jugando'),
+    QueryCase('select_game', kwargs={'tipo': 1, 'filter': 1},
+              label='jugando como gato'),
+    QueryCase('select_game', kwargs={'tipo': 1, 'filter': 2},
+              label='jugando como PAC'),
+    QueryCase('select_game', kwargs={'tipo': 1, 'filter': 3},
+              label='jugando, mi turno'),
+    QueryCase('select_game', kwargs={'tipo': 1, 'game_id': 'new_active'},
+              label='seleccionar partida activa'),
+    QueryCase('select_game', kwargs={'tipo': 1, 'game_id': 'new_finished'},
+              label='seleccionar partida terminada'),
+    QueryCase('select_game', kwargs={'tipo': 2}, label='unirse'),
+    QueryCase('select_game', kwargs={'tipo': 2, 'filter': 1},
+              label='unirse como gato'),
+    QueryCase('select_game', kwargs={'tipo': 2, 'filter': 2},
+              label='unirse como PAC'),
+    QueryCase('select_game', kwargs={'tipo': 2, 'game_id': 'new_created'},
+              label='unirse a partida'),
+    QueryCase('select_game', kwargs={'tipo': 3}, label='terminadas'),
+    QueryCase('select_game', kwargs={'tipo': 3, 'filter': 1},
+              label='terminadas como gato'),
+    QueryCase('select_game', kwargs={'tipo': 3, 'filter': 2},
+              label='terminadas como PAC'),
+    QueryCase('select_game', kwargs={'tipo': 3, 'filter': 4},
+              label='terminadas, he ganado'),
+    QueryCase('select_game', kwargs={'tipo': 3, 'game_id': 'new_finished'},
+              label='reproducir partida'),
+    QueryCase('show_game', game='new_active'),
+    QueryCase('move', 'post', game='new_active',
+              data={'origin': 0, 'target': 9}, label='move válido'),
+    QueryCase('move', 'post', game='new_active',
+              data={'origin': 0, 'target': 1}, label='move inválido'),
+    QueryCase('get_move', 'post', game='new_finished', data={'shift': 1}),
+    QueryCase('reproduce_game', game='new_finished'),
+    QueryCase('create_only_board', kwargs={'game_id': 'new_active'}),
+    QueryCase('turn', 'post', kwargs={'game_id': 'new_active'}),
+    QueryCase('leaderboard', user=False),
+    QueryCase('leaderboard', user=False, data={'after': '1500.0_1_20'},
+              label='leaderboard, segunda página'),
+    QueryCase('profile', kwargs={'username': 'query_user'}),
+    QueryCase('tournaments'),
+    QueryCase('tournament', kwargs={'tournament_id': 'new_tournament'}),
+    QueryCase('metrics', user=False),
+    QueryCase('api_game', kwargs={'game_id': 'new_active'}),
+    QueryCase('api_move', 'post', kwargs={'game_id': 'new_active'},
+              data={'origin': 0, 'target': 9}),
+    QueryCase('api_replay', kwargs={'game_id': 'new_finished', 'ply': 3}),
+    QueryCase('api_wait', kwargs={'game_id': 'new_active'}),
+    QueryCase('api_user_stats', kwargs={'username': 'query_user'}),
+    QueryCase('api_book', data={'moves': '0-9,59-50'}),
+    QueryCase('api_positions', data={'cats': '0,2,4,6', 'mouse': 59,
+                                     'cat_turn': 1}),
+    QueryCase('api_heatmaps'),
+]
+
+
+def normalize(sql):
+    """
+        Sustituye los literales de una consulta para poder agrupar las
+        consultas iguales.
+
+        Author
+        -------
+            Eric Morales
+    """
+    sql = re.sub(r"'[^']*'", "?", sql)
+    return re.sub(r"\b\d+\b", "?", sql)
+
+
+def report(label, small, large):
+    """
+        Describe las consultas de un caso que cambian con el volumen de
+        datos.
+
+        Author
+        -------
+            Eric Morales
+    """
+    lines = ["%s: %d consultas con %d partidas por tipo, %d con %d" % (
+        label, len(small), SMALL, len(large), LARGE)]
+    counts = {}
+    for index, queries in enumerate((small, large)):
+        for query in queries:
+            counts.setdefault(normalize(query['sql']), [0, 0])[index] += 1
+    for sql, (before, after) in sorted(counts.items()):
+        if before != after:
+            lines.append("    %d -> %d  %s" % (before, after, sql))
+    return "\n".join(lines)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    PERF_INSTRUMENTATION=False, PERF_TOGGLE_FILE=None,
+    LEADERBOARD_CACHED_PAGES=0)
+class QueryCountTests(TestCase):
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.user = User.objects.create_user('query_user', password=PASSWORD)
+        self.rival = User.objects.create_user('query_rival')
+        self.others = []
+        self.signups = 0
+
+    def new_active(self):
+        return Game.objects.create(cat_user=self.user, mouse_user=self.rival,
+                                   status=GameStatus.ACTIVE)
+
+    def new_created(self):
+        return Game.objects.create(cat_user=self.rival)
+
+    def new_finished(self):
+        game = self.new_active()
+        for ply, (origin, target) in enumerate(CAT_WIN_MOVES):
+            Move.objects.create(game=game, origin=origin, target=target,
+                                player=self.user if ply % 2 == 0
+                                else self.rival)
+        return game
+
+    def new_tournament(self):
+        return create_tournament('query', Tournament.SWISS,
+                                 [self.user, self.rival] + self.others).id
+
+    def quick_play_data(self):
+        MatchRequest.objects.create(user=self.rival, role=MatchRequest.MOUSE)
+        return {'role': MatchRequest.CAT}
+
+    def login_data(self):
+        return {'username': self.user.username, 'password': PASSWORD}
+
+    def signup_data(self):
+        self.signups += 1
+        password = 'Query_count_%d' % self.signups
+        return {'username': 'query_signup_%d' % self.signups,
+                'password': password, 'password2': password}
+
+    def random_moves(self, plies):
+        state = GameState()
+        moves = []
+        for _ in range(plies):
+            move = self.rng.choice(legal_moves(state))
+            apply_move(state, *move)
+            moves.append(move)
+        return moves
+
+    def seed(self, n):
+        """
+            Añade n partidas de cada tipo (activas, terminadas y creadas,
+            como gato y como PAC), cada una contra un usuario distinto.
+
+            Author
+            -------
+                Eric Morales
+        """
+        start = len(self.others)
+        User.objects.bulk_create([
+            User(username='query_other_%d' % i)
+            for i in range(start, start + n)])
+        self.others = list(User.objects.filter(
+            username__startswith='query_other_').order_by('id'))
+
+        entries = []
+        for other in self.others[start:]:
+            for cat, mouse in ((self.user, other), (other, self.user)):
+                for moves in (self.random_moves(4), CAT_WIN_MOVES):
+                    state, winner = replay(moves)
+                    entries.append(build_game(cat.id, mouse.id, moves, state,
+                                              winner))
+                state, winner = replay([])
+                entries.append(build_game(cat.id, None, [], state, winner))
+        bulk_insert_games(entries)
+
+    def measure(self):
+        return [case.run(self) for case in CASES]
+
+    def test1(self):
+        """ El número de consultas no depende del volumen de datos """
+        self.seed(SMALL)
+        small = self.measure()
+        self.seed(LARGE - SMALL)
+        large = self.measure()
+
+        failures = [report(case.label, before, after)
+                    for case, before, after in zip(CASES, small, large)
+                    if len(before) != len(after)]
+        if failures:
+            self.fail("Vistas cuyo número de consultas crece con los "
+                      "datos:\n" + "\n".join(failures))
+
+    def test2(self):
+        """ Todas las urls de logic.urls tienen algún caso """
+        covered = {case.url_name for case in CASES}
+        missing = {pattern.name for pattern in urls.urlpatterns} - covered
+        self.assertFalse(missing, "Urls sin caso en CASES: %s" % ", ".join(
+            sorted(missing)))
@@ -0,0 +1,97 @@
+"""
+    Tests de las vistas de partida rápida y de unirse a una partida.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from datamodel import constants
+from datamodel.models import Game, GameStatus, MatchRequest
+from logic.tests_services import PlayGameBaseServiceTests
+
+
+class QuickPlayTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.loginTestUser(self.client1, self.user1)
+        self.loginTestUser(self.client2, self.user2)
+
+    def test1(self):
+        """ El primero espera y el segundo entra en la partida """
+        response = self.client1.post(reverse('quick_play'),
+                                     {'role': MatchRequest.CAT})
+        self.assertRedirects(response, reverse('quick_play'))
+        response = self.client1.get(reverse('quick_play'))
+        self.assertContains(response, 'quick-play-waiting')
+        self.assertEqual(self.client1.get(reverse(
+            'quick_play_status')).json(), {'status': 'waiting'})
+
+        response = self.client2.post(reverse('quick_play'),
+                                     {'role': MatchRequest.MOUSE})
+        self.assertRedirects(response, reverse('show_game'))
+        game_id = self.client2.session[constants.GAME_SELECTED_SESSION_ID]
+
+        data = self.client1.get(reverse('quick_play_status')).json()
+        self.assertEqual(data, {'status': 'matched',
+                                'url': reverse('show_game')})
+        self.assertEqual(
+            self.client1.session[constants.GAME_SELECTED_SESSION_ID], game_id)
+        response = self.client1.get(reverse('show_game'))
+        self.assertEqual(response.context['game'].status, GameStatus.ACTIVE)
+        self.assertEqual(response.context['game'].cat_user, self.user1)
+
+    def test2(self):
+        """ Cancelar saca de la cola """
+        self.client1.post(reverse('quick_play'), {'role': MatchRequest.CAT})
+        response = self.client1.post(reverse('quick_play_cancel'))
+        self.assertRedirects(response, reverse('quick_play'))
+        self.assertEqual(self.client1.get(reverse(
+            'quick_play_status')).json(), {'status': 'none'})
+        self.assertFalse(MatchRequest.objects.exists())
+
+    def test3(self):
+        """ Un papel no válido es un error """
+        response = self.client1.post(reverse('quick_play'), {'role': 7})
+        self.assertContains(response, constants.ERROR_INVALID_ROLE)
+        self.assertFalse(MatchRequest.objects.exists())
+
+
+class JoinGameTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.user3 = User.objects.create_user('join_third_user')
+        self.loginTestUser(self.client1, self.user1)
+
+    def join_url(self, game):
+        return reverse('select_game', kwargs={'tipo': 2, 'game_id': game.id})
+
+    def test1(self):
+        """ Si otro se ha unido antes, se pasa a la siguiente partida """
+        taken = Game.objects.create(cat_user=self.user2)
+        following = Game.objects.create(cat_user=self.user2)
+        taken.mouse_user = self.user3
+        taken.save()
+
+        response = self.client1.get(self.join_url(taken))
+        self.assertRedirects(response, self.join_url(following),
+                             fetch_redirect_response=False)
+        self.client1.get(self.join_url(following))
+        following.refresh_from_db()
+        self.assertEqual(following.mouse_user, self.user1)
+        self.assertEqual(following.status, GameStatus.ACTIVE)
+        self.assertEqual(
+            self.client1.session[constants.GAME_SELECTED_SESSION_ID],
+            str(following.id))
+
+    def test2(self):
+        """ Sin más partidas abiertas no se une a ninguna """
+        taken = Game.objects.create(cat_user=self.user2,
+                                    mouse_user=self.user3)
+        response = self.client1.get(self.join_url(taken))
+        self.assertContains(response, "No hay partidas a las que unirse")
+        taken.refresh_from_db()
+        self.assertEqual(taken.mouse_user, self.user3)
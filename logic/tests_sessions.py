@@ -0,0 +1,108 @@
+"""
+    Tests de las escrituras en la sesión y del comando purge_sessions.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import datetime
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from datamodel import constants
+from datamodel.models import Game, GameStatus
+from logic.tests_services import PlayGameBaseServiceTests
+
+DB_ENGINE = 'django.contrib.sessions.backends.db'
+COOKIE_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+
+def session_writes(queries):
+    return [query['sql'] for query in queries
+            if 'django_session' in query['sql'] and
+            not query['sql'].startswith('SELECT')]
+
+
+class SessionWritesTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.game = Game.objects.create(
+            cat_user=self.user1, mouse_user=self.user2,
+            status=GameStatus.ACTIVE)
+
+    def tearDown(self):
+        super().tearDown()
+
+    @override_settings(SESSION_ENGINE=DB_ENGINE)
+    def test1(self):
+        """ Volver a seleccionar la misma partida no reescribe la sesión """
+        self.loginTestUser(self.client1, self.user1)
+        url = reverse('select_game', kwargs={'tipo': 1,
+                                             'game_id': self.game.id})
+        with CaptureQueriesContext(connection) as queries:
+            self.client1.get(url)
+        self.assertEqual(len(session_writes(queries)), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client1.get(url)
+            self.client1.get(reverse('counter'))
+        self.assertEqual(session_writes(queries), [])
+
+    @override_settings(SESSION_ENGINE=COOKIE_ENGINE)
+    def test2(self):
+        """ Con sesiones en cookie firmada no se escribe en la tabla """
+        self.loginTestUser(self.client1, self.user1)
+        self.client1.get(reverse('select_game', kwargs={
+            'tipo': 1, 'game_id': self.game.id}))
+        self.assertEqual(
+            int(self.client1.session[constants.GAME_SELECTED_SESSION_ID]),
+            self.game.id)
+
+        self.client1.get(reverse('select_game', kwargs={'tipo': 9}))
+        response = self.client1.get(reverse('counter'))
+        self.assertContains(response, "Sesión actual: <b>1</b>")
+        self.assertEqual(Session.objects.count(), 0)
+
+
+class PurgeSessionsTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key='expired%03d' % i, session_data='',
+                     expire_date=now - datetime.timedelta(days=1))
+             for i in range(25)] +
+            [Session(session_key='valid%03d' % i, session_data='',
+                     expire_date=now + datetime.timedelta(days=1))
+             for i in range(5)])
+
+    def tearDown(self):
+        super().tearDown()
+
+    @override_settings(SESSION_ENGINE=DB_ENGINE)
+    def test1(self):
+        """ Borra solo las caducadas, por bloques """
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('purge_sessions', '--chunk-size', '10', stdout=out)
+        self.assertIn("borradas: 25", out.getvalue())
+        self.assertEqual(Session.objects.count(), 5)
+        deletes = [query for query in queries
+                   if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+
+    @override_settings(SESSION_ENGINE=COOKIE_ENGINE)
+    def test2(self):
+        """ Sin tabla de sesiones no hace nada salvo con --force """
+        call_command('purge_sessions', stdout=StringIO())
+        self.assertEqual(Session.objects.count(), 30)
+        call_command('purge_sessions', '--force', stdout=StringIO())
+        self.assertEqual(Session.objects.count(), 5)
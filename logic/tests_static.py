@@ -0,0 +1,153 @@
+"""
+    Tests de los ficheros estáticos con hash y comprimidos
+    (ratonGato.static).
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+from wsgiref.util import setup_testing_defaults
+
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from ratonGato.static import IMMUTABLE_MAX_AGE, StaticFiles
+
+SONG = bytes(range(256)) * 4
+
+CSS = ("body { background: url('../img/fondo.png'); }\n"
+       ".video { background: url(no_existe.png); }\n" * 50)
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        for name, content in (('css/site.css', CSS.encode()),
+                              ('img/fondo.png', b'\x89PNG' + b'\0' * 64),
+                              ('audio/song.mp3', SONG)):
+            path = os.path.join(self.source, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+
+        settings = override_settings(STATICFILES_DIRS=[self.source],
+                                     STATIC_ROOT=self.root,
+                                     INSTALLED_APPS=['django.contrib.'
+                                                     'staticfiles'])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def static_url(self, name):
+        return Template("{% load staticfiles %}{% static name %}").render(
+            Context({'name': name}))
+
+    def request(self, path, **environ):
+        app = StaticFiles(lambda environ, start: [b'django'], self.root)
+        environ['PATH_INFO'] = path
+        setup_testing_defaults(environ)
+        result = {}
+
+        def start_response(status, headers):
+            result['status'] = int(status.split()[0])
+            result['headers'] = dict(headers)
+
+        body = b''.join(app(environ, start_response))
+        return result.get('status'), result.get('headers'), body
+
+    def test1(self):
+        """ collectstatic genera nombres con hash y versiones comprimidas """
+        url = self.static_url('css/site.css')
+        self.assertRegex(url, r'^/static/css/site\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, url[len('/static/'):])
+        with open(path, 'rb') as f:
+            content = f.read()
+        with open(path + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), content)
+
+        # Las referencias se reescriben con hash, salvo las que no existen
+        self.assertIn(self.static_url('img/fondo.png').split('/')[-1],
+                      content.decode())
+        self.assertIn('url(no_existe.png)', content.decode())
+        # Las imágenes no se comprimen
+        self.assertFalse(os.path.exists(os.path.join(
+            self.root, self.static_url('img/fondo.png')[8:] + '.gz')))
+
+    def test2(self):
+        """ Se sirve la versión comprimida, inmutable y con validación """
+        url = self.static_url('css/site.css')
+        status, headers, body = self.request(
+            url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        self.assertEqual(headers['Cache-Control'],
+                         'public, max-age=%d, immutable' % IMMUTABLE_MAX_AGE)
+        self.assertEqual(gzip.decompress(body).decode(),
+                         self.request(url)[2].decode())
+
+        status, _, body = self.request(
+            url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual((status, body), (304, b''))
+
+        # Sin Accept-Encoding se sirve sin comprimir, con otro ETag
+        status, plain, _ = self.request(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertNotEqual(plain['ETag'], headers['ETag'])
+
+    def test3(self):
+        """ Ficheros sin hash, inexistentes y el resto de urls """
+        status, headers, _ = self.request('/static/css/site.css')
+        self.assertEqual(status, 200)
+        self.assertNotIn('immutable', headers['Cache-Control'])
+
+        self.assertEqual(self.request('/static/css/otro.css')[0], 404)
+        self.assertEqual(self.request('/static/../../etc/passwd')[0], 404)
+        self.assertEqual(self.request('/static/css/site.css',
+                                      REQUEST_METHOD='POST')[0], 405)
+        self.assertEqual(self.request('/mouse_cat/')[2], b'django')
+
+    def test4(self):
+        """ Se atiende un único rango de bytes, como los que pide <audio>
+        al saltar a otro punto de la canción """
+        url = self.static_url('audio/song.mp3')
+        status, headers, body = self.request(url)
+        self.assertEqual((status, headers['Accept-Ranges']), (200, 'bytes'))
+
+        status, headers, body = self.request(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(status, 206)
+        self.assertEqual(headers['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(headers['Content-Length'], '10')
+        self.assertEqual(body, SONG[10:20])
+        self.assertEqual(self.request(url, HTTP_RANGE='bytes=1000-')[2],
+                         SONG[1000:])
+        self.assertEqual(self.request(url, HTTP_RANGE='bytes=-4')[2],
+                         SONG[-4:])
+        self.assertEqual(self.request(url, HTTP_RANGE='bytes=1000-5000')[2],
+                         SONG[1000:])
+
+        status, headers, _ = self.request(url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual((status, headers['Content-Range']),
+                         (416, 'bytes */1024'))
+        # Varios rangos, o un If-Range de otra versión: el fichero entero
+        self.assertEqual(self.request(url, HTTP_RANGE='bytes=0-1,5-6')[:3:2],
+                         (200, SONG))
+        self.assertEqual(self.request(url, HTTP_RANGE='bytes=0-1',
+                                      HTTP_IF_RANGE='"otro"')[:3:2],
+                         (200, SONG))
+
+    def test5(self):
+        """ Con manifiesto, un fichero que no está en él es un error """
+        with self.assertRaises(ValueError):
+            self.static_url('css/otro.css')
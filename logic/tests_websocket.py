@@ -0,0 +1,126 @@
+"""
+    Tests del canal WebSocket de las partidas (logic.consumers.GameConsumer).
+
+    Author
+    -------
+        Eric Morales
+"""
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from datamodel.models import Game, GameStatus, Move
+from datamodel.sample_games import CAT_WIN_MOVES
+from logic.tests_services import PlayGameBaseServiceTests
+from ratonGato.asgi import application
+
+
+class GameConsumerTests(PlayGameBaseServiceTests):
+    def setUp(self):
+        super().setUp()
+        self.game = Game.objects.create(
+            cat_user=self.user1, mouse_user=self.user2,
+            status=GameStatus.ACTIVE)
+        self.loginTestUser(self.client1, self.user1)
+        self.loginTestUser(self.client2, self.user2)
+
+    def tearDown(self):
+        super().tearDown()
+
+    def socket(self, client=None, game=None, origin=b'http://localhost'):
+        headers = [(b'origin', origin)]
+        if client:
+            headers.append((b'cookie', ('%s=%s' % (
+                settings.SESSION_COOKIE_NAME,
+                client.cookies[settings.SESSION_COOKIE_NAME].value)).encode()))
+        return WebsocketCommunicator(
+            application, '/ws/games/%d/' % (game or self.game).id,
+            headers=headers)
+
+    def test1(self):
+        """ Movimientos por el canal y aviso al rival """
+
+        async def scenario():
+            cat = self.socket(self.client1)
+            mouse = self.socket(self.client2)
+            self.assertTrue((await cat.connect())[0])
+            self.assertTrue((await mouse.connect())[0])
+            self.assertTrue((await cat.receive_json_from())['my_turn'])
+            self.assertFalse((await mouse.receive_json_from())['my_turn'])
+
+            # El PAC no puede mover en el turno del gato
+            await mouse.send_json_to({'type': 'move', 'origin': 59,
+                                      'target': 50})
+            self.assertEqual(await mouse.receive_json_from(),
+                             {'type': 'move', 'status': -1})
+
+            await cat.send_json_to({'type': 'move', 'origin': 0,
+                                    'target': 9})
+            self.assertEqual(await cat.receive_json_from(),
+                             {'type': 'move', 'status': 0})
+            cat_state = await cat.receive_json_from()
+            mouse_state = await mouse.receive_json_from()
+
+            await cat.send_json_to({'type': 'jump'})
+            error = await cat.receive_json_from()
+            await cat.disconnect()
+            await mouse.disconnect()
+            return cat_state, mouse_state, error
+
+        cat_state, mouse_state, error = async_to_sync(scenario)()
+        self.assertFalse(cat_state['my_turn'])
+        self.assertEqual(mouse_state['type'], 'state')
+        self.assertTrue(mouse_state['my_turn'])
+        self.assertEqual((mouse_state['origin'], mouse_state['target']),
+                         (0, 9))
+        self.assertEqual(error['type'], 'error')
+        self.assertEqual(Game.objects.get(id=self.game.id).cat1, 9)
+
+    def test2(self):
+        """ Fin de partida y ganador """
+        for ply, (origin, target) in enumerate(CAT_WIN_MOVES[:-1]):
+            Move.objects.create(game=self.game, origin=origin, target=target,
+                                player=self.user1 if ply % 2 == 0
+                                else self.user2)
+        origin, target = CAT_WIN_MOVES[-1]
+
+        async def scenario():
+            cat = self.socket(self.client1)
+            mouse = self.socket(self.client2)
+            await cat.connect()
+            await mouse.connect()
+            await cat.receive_json_from()
+            await mouse.receive_json_from()
+            await cat.send_json_to({'type': 'move', 'origin': origin,
+                                    'target': target})
+            result = await cat.receive_json_from()
+            state = await mouse.receive_json_from()
+            await cat.disconnect()
+            await mouse.disconnect()
+            return result, state
+
+        result, state = async_to_sync(scenario)()
+        self.assertEqual(result['status'], 2)
+        self.assertEqual(state['winner'], 1)
+        self.assertEqual(state['status'], GameStatus.FINISHED)
+
+    def test3(self):
+        """ Solo se pueden conectar los jugadores de la partida """
+        other = User.objects.create(username='ws_other')
+        foreign = Game.objects.create(cat_user=other)
+
+        async def connected(client, game=None, **kwargs):
+            communicator = self.socket(client, game, **kwargs)
+            accepted, _ = await communicator.connect()
+            await communicator.disconnect()
+            return accepted
+
+        self.assertFalse(async_to_sync(connected)(None))
+        self.assertFalse(async_to_sync(connected)(self.client1, foreign))
+        self.assertTrue(async_to_sync(connected)(self.client1))
+
+        # Otra web no puede abrir el canal con la cookie del jugador
+        self.assertFalse(async_to_sync(connected)(
+            self.client1, origin=b'http://evil.example.com'))
@@ -9,7 +9,7 @@
 from django.conf.urls import url
 from django.urls import path
 
-from logic import views
+from logic import api, views
 
 urlpatterns = [
     path('', views.index, name='landing'),
@@ -19,6 +19,11 @@ urlpatterns = [
     path('signup/', views.signup_service, name='signup'),
     path('counter/', views.counter_service, name='counter'),
     path('create_game/', views.create_game_service, name='create_game'),
+    path('quick_play/', views.quick_play_service, name='quick_play'),
+    path('quick_play/status/', views.quick_play_status,
+         name='quick_play_status'),
+    path('quick_play/cancel/', views.quick_play_cancel,
+         name='quick_play_cancel'),
     url(r'^select_game/(?P<tipo>\d+)/$', views.select_game_service,
         name='select_game'),
     url(r'^select_game/(?P<tipo>\d+)/(?P<filter>\d+)$',
@@ -41,4 +46,21 @@ urlpatterns = [
         name='turn'),
     path('reproduce_game/', views.reproduce_game_service,
          name='reproduce_game'),
+    path('leaderboard/', views.leaderboard_service, name='leaderboard'),
+    path('profile/<str:username>/', views.profile_service, name='profile'),
+    path('tournaments/', views.tournaments_service, name='tournaments'),
+    path('tournaments/<int:tournament_id>/', views.tournament_service,
+         name='tournament'),
+    path('metrics', views.metrics_service, name='metrics'),
+
+    path('api/v1/games/<int:game_id>/', api.game_state, name='api_game'),
+    path('api/v1/games/<int:game_id>/move/', api.move, name='api_move'),
+    path('api/v1/games/<int:game_id>/replay/<int:ply>/', api.replay,
+         name='api_replay'),
+    path('api/v1/games/<int:game_id>/wait/', api.wait, name='api_wait'),
+    path('api/v1/users/<str:username>/stats/', api.user_stats,
+         name='api_user_stats'),
+    path('api/v1/book/', api.opening_book, name='api_book'),
+    path('api/v1/positions/', api.positions, name='api_positions'),
+    path('api/v1/heatmaps/', api.heatmaps, name='api_heatmaps'),
 ]
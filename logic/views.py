@@ -7,9 +7,11 @@
         Eric Morales
 """
 import json
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.http import HttpResponse
 from django.http import HttpResponseForbidden
 from django.shortcuts import redirect
@@ -18,9 +20,19 @@ from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from itertools import chain
 
-from datamodel import constants
-from datamodel.models import Counter, Game, GameStatus, Move, check_winner
+from datamodel import clock, constants, matchmaking
+from datamodel.models import Counter, Game, GameStatus, MatchRequest, Move, \
+    Tournament, check_winner
+from logic.api import user_stats_or_none
+from logic.board_cache import INITIAL_CATS, INITIAL_MOUSE, board_rows, \
+    game_board, initial_board
 from logic.forms import SignupForm, UserForm
+from logic.leaderboard import leaderboard_page
+from logic.metrics import REGISTRY
+from logic.notify import notify_game
+
+# Torneos que se muestran en la lista
+TOURNAMENTS_SHOWN = 20
 
 
 def countErr(request):
@@ -51,6 +63,34 @@ def countErr(request):
 
     # Incrementamos el contador global
     Counter.objects.inc()
+    REGISTRY.inc('paccat_errors_total')
+
+
+def set_session_value(request, key, value):
+    """
+        Guarda un valor en la sesion solo si cambia. Asignar un valor marca
+        la sesion como modificada, y eso supone escribirla al final de la
+        peticion aunque el valor sea el mismo.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Solicitud Http
+        key : str
+            Clave de la sesion
+        value : object
+            Valor a guardar
+
+        Returns
+        -------
+        void
+
+        Author
+        -------
+            Eric Morales
+    """
+    if key not in request.session or request.session[key] != value:
+        request.session[key] = value
 
 
 def anonymous_required(f):
@@ -172,7 +212,7 @@ def end_game(request, game):
 
     # La partida ha terminado. Imprimiremos una ultima vez el
     # tablero
-    board = create_board_from_game(game)
+    board = game_board(game)
 
     # Borramos de la sesion la partida, porque ya ha terminado
     if constants.GAME_SELECTED_SESSION_ID in request.session:
@@ -243,7 +283,7 @@ def login_service(request):
                 login(request, user)
 
                 # Reseteo el contador
-                request.session["counter"] = 0
+                set_session_value(request, "counter", 0)
 
                 return redirect(reverse('logic:index'))
             else:
@@ -370,13 +410,10 @@ def counter_service(request):
             Eric Morales
     """
 
-    # En caso de no tener todavia contador en la sesion, lo inicializamos a 0
-    # Ya que aun no ha habido errores.
-    if "counter" not in request.session:
-        counter_session = 0
-        request.session["counter"] = counter_session
-
-    context_dict = {'counter_session': request.session["counter"],
+    # En caso de no tener todavia contador en la sesion, es 0 ya que aun no
+    # ha habido errores. No lo guardamos: countErr lo inicializa al contar
+    # el primer error
+    context_dict = {'counter_session': request.session.get("counter", 0),
                     'counter_global': Counter.objects.get_current_value()}
     return render(request, 'mouse_cat/counter.html', context=context_dict)
 
@@ -390,7 +427,8 @@ def create_game_service(request):
         Parameters
         ----------
         request : HttpRequest
-            Solicitud Http
+            Solicitud Http. El parámetro move_time indica los segundos por
+            movimiento (uno de clock.MOVE_TIMES; por defecto, sin reloj).
 
         Returns
         -------
@@ -399,14 +437,113 @@ def create_game_service(request):
         Author
         -------
             Andrés Mena
+            Eric Morales
     """
+    try:
+        move_time = int(request.GET.get('move_time', 0))
+    except ValueError:
+        move_time = -1
+    if move_time not in clock.MOVE_TIMES:
+        return render(request, "mouse_cat/error.html",
+                      {'msg_error': constants.ERROR_INVALID_MOVE_TIME})
 
     # Creamos una partida asignandosela al usuario que esta dentro del sistema
-    new_game = Game(cat_user=request.user)
+    new_game = Game(cat_user=request.user, move_time=move_time)
     new_game.save()
+    REGISTRY.inc('paccat_games_created_total')
     return render(request, 'mouse_cat/new_game.html', {'game': new_game})
 
 
+@login_required
+def quick_play_service(request):
+    """
+        Cola de partida rápida. Con GET muestra la página para apuntarse
+        (o la espera, si ya está en la cola); con POST apunta al usuario con
+        el papel indicado y, si hay rival esperando, selecciona la partida
+        creada y lleva a ella.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Solicitud Http (con POST, campo role: 1 gato, 2 PAC)
+
+        Returns
+        -------
+        HttpResponse : página de la cola o redirección a la partida
+
+        Author
+        -------
+            Eric Morales
+    """
+    if request.method == 'POST':
+        try:
+            role = int(request.POST.get('role'))
+        except (TypeError, ValueError):
+            role = None
+        if role not in (MatchRequest.CAT, MatchRequest.MOUSE):
+            return errorHTTP(request, constants.ERROR_INVALID_ROLE)
+
+        game, _ = matchmaking.enqueue(request.user, role)
+        if game is None:
+            return redirect(reverse('quick_play'))
+        REGISTRY.inc('paccat_games_created_total')
+        REGISTRY.inc('paccat_matches_total')
+        set_session_value(request, constants.GAME_SELECTED_SESSION_ID,
+                          game.id)
+        return redirect(reverse('show_game'))
+
+    return render(request, 'mouse_cat/quick_play.html', {
+        'waiting': matchmaking.waiting_request(request.user),
+        'roles': MatchRequest.ROLES})
+
+
+@login_required
+def quick_play_status(request):
+    """
+        Estado del usuario en la cola de partida rápida. La página de espera
+        lo consulta periódicamente; al emparejarse, selecciona la partida en
+        la sesión.
+
+        Returns
+        -------
+        HttpResponse : json con el campo status ('matched', 'waiting' o
+        'none') y, si se ha emparejado, la url de la partida
+
+        Author
+        -------
+            Eric Morales
+    """
+    game_id = matchmaking.pop_match(request.user)
+    if game_id is not None:
+        set_session_value(request, constants.GAME_SELECTED_SESSION_ID,
+                          game_id)
+        data = {'status': 'matched', 'url': reverse('show_game')}
+    elif matchmaking.waiting_request(request.user) is not None:
+        data = {'status': 'waiting'}
+    else:
+        data = {'status': 'none'}
+    return HttpResponse(json.dumps(data), content_type="application/json")
+
+
+@login_required
+def quick_play_cancel(request):
+    """
+        Saca al usuario de la cola de partida rápida.
+
+        Returns
+        -------
+        HttpResponse : redirección a la página de la cola
+
+        Author
+        -------
+            Eric Morales
+    """
+    if request.method != 'POST':
+        return errorHTTP(request, constants.GET_NOT_ALLOWED)
+    matchmaking.cancel(request.user)
+    return redirect(reverse('quick_play'))
+
+
 @login_required
 def select_game_service(request, tipo=-1, filter=-1, game_id=-1):
     """
@@ -451,10 +588,14 @@ def select_game_service(request, tipo=-1, filter=-1, game_id=-1):
 
         # Filtro los juegos que estan activos, en los que el usuario que
         # hace la solicitud es el gato o el PAC
-        mis_juegos_cat = Game.objects.filter(status=GameStatus.ACTIVE,
-                                             cat_user=request.user)
-        mis_juegos_mouse = Game.objects.filter(status=GameStatus.ACTIVE,
-                                               mouse_user=request.user)
+        # La plantilla muestra los dos usuarios de cada partida, así que los
+        # traemos en la misma consulta
+        mis_juegos_cat = Game.objects.filter(
+            status=GameStatus.ACTIVE, cat_user=request.user).select_related(
+            'cat_user', 'mouse_user')
+        mis_juegos_mouse = Game.objects.filter(
+            status=GameStatus.ACTIVE, mouse_user=request.user).select_related(
+            'cat_user', 'mouse_user')
 
         games_list = []
         if int(filter) == -1:
@@ -493,18 +634,19 @@ def select_game_service(request, tipo=-1, filter=-1, game_id=-1):
             # Si la partida a terminado, nos muestra el ultimo estado de la
             # partida
             if game.status == GameStatus.FINISHED and \
-                    (game.cat_user == request.user or
-                     game.mouse_user == request.user):
+                    request.user.id in (game.cat_user_id,
+                                        game.mouse_user_id):
                 return end_game(request, game)
 
-            if game.cat_user != request.user \
-                    and game.mouse_user != request.user:
+            if request.user.id not in (game.cat_user_id,
+                                       game.mouse_user_id):
                 # Error porque el jugador que solicita el juego no es ni el
                 # gato ni el PAC
                 return errorHTTP(request,
                                  constants.ERROR_SELECTED_GAME_NOT_YOURS)
 
-            request.session[constants.GAME_SELECTED_SESSION_ID] = game_id
+            set_session_value(request, constants.GAME_SELECTED_SESSION_ID,
+                              game_id)
             return show_game_service(request)
 
         # Error porque no se ha encontrado un juego con el id solicitado
@@ -518,27 +660,17 @@ def select_game_service(request, tipo=-1, filter=-1, game_id=-1):
 
         # En funcion de si tenemos aplicado o no el filtro, devuelve unas
         # partidas de un jugador u otras
-        if int(filter) == -1:
-            one_player = Game.objects.filter(mouse_user=None,
-                                             status=GameStatus.CREATED)
-
-        elif int(filter) == 1:
-            one_player = Game.objects.filter(mouse_user=None,
-                                             status=GameStatus.CREATED)
+        # Tengo que dejar en las que el jugador no sea el propio cat_user,
+        # ya que un jugador no puede jugar contra si mismo. El filtro se hace
+        # en la consulta para no cargar el gato de cada partida
+        games_list = Game.objects.none()
+        if int(filter) == -1 or int(filter) == 1:
+            games_list = matchmaking.open_games(request.user).select_related(
+                'cat_user')
 
         # En la seleccion de partidas a las que unirte, no hay partidas como
         # PAC
         # Nunca es nuestro turno tampoco
-        elif int(filter) == 2 or int(filter) == 3:
-            one_player = []
-
-        # Tengo que dejar en las que el jugador no sea el propio mouse_user,
-        # ya que un jugador no puede jugar contra si mismo
-        games_list = []
-        if len(one_player) > 0:
-            for partida in one_player.order_by('id'):
-                if partida.cat_user != request.user:
-                    games_list.append(partida)
 
         # Show 5 games per page
         paginator = Paginator(games_list, 5)
@@ -549,35 +681,39 @@ def select_game_service(request, tipo=-1, filter=-1, game_id=-1):
     # Este caso significa que el usuario ya me ha dicho a que partida se
     # quiere unir
     elif request.method == 'GET' and int(tipo) == 2 and int(game_id) != -1:
-        # Compruebo que la partida siga estando disponible (la puede haber
-        # cogido otro jugador mientras yo esperaba a seleccionarla)
-        game = Game.objects.filter(id=game_id)
-        if len(game) > 0:
-            game = game[0]
-            if game.status != GameStatus.CREATED or \
-                    game.mouse_user is not None:
-                return render(request, 'mouse_cat/join_game.html', {
-                    'msg_error': constants.ERROR_SELECTED_GAME_NOT_AVAILABLE})
-
-            # Le meto en la partida y empieza el juego
-            else:
-                request.session[constants.GAME_SELECTED_SESSION_ID] = game_id
-                game.mouse_user = request.user
-                game.save()
-                print("Le reenvio a la misma pagina")
-                return redirect('select_game', tipo=1, game_id=game_id)
-
-        else:
+        # Me uno solo si la partida sigue disponible (la puede haber cogido
+        # otro jugador mientras yo esperaba a seleccionarla). La
+        # comprobación y la asignación son un único UPDATE, así que si dos
+        # jugadores se unen a la vez solo entra uno
+        if matchmaking.join_game(game_id, request.user):
+            set_session_value(request, constants.GAME_SELECTED_SESSION_ID,
+                              game_id)
+            REGISTRY.inc('paccat_games_joined_total')
+            notify_game(int(game_id))
+            print("Le reenvio a la misma pagina")
+            return redirect('select_game', tipo=1, game_id=game_id)
+
+        if not Game.objects.filter(id=game_id).exists():
             return render(request, 'mouse_cat/join_game.html', {
                 'msg_error': constants.ERROR_SELECTED_GAME_NOT_EXISTS})
 
+        # Otro jugador se ha unido antes: probamos con la siguiente partida
+        # abierta
+        next_game = matchmaking.next_open_game(request.user, game_id)
+        if next_game is not None:
+            return redirect('select_game', tipo=2, game_id=next_game.id)
+        return render(request, 'mouse_cat/join_game.html', {
+            'msg_error': constants.ERROR_SELECTED_GAME_NOT_AVAILABLE})
+
     # Muestro todas las partidas finalizadas en las que yo era alguno de los
     # participantes
     elif request.method == 'GET' and int(tipo) == 3 and int(game_id) == -1:
         finished_as_cat = Game.objects.filter(
-            status=GameStatus.FINISHED, cat_user=request.user).order_by('id')
+            status=GameStatus.FINISHED, cat_user=request.user).select_related(
+            'cat_user', 'mouse_user').order_by('id')
         finished_as_mouse = Game.objects.filter(
-            status=GameStatus.FINISHED, mouse_user=request.user).order_by('id')
+            status=GameStatus.FINISHED, mouse_user=request.user).select_related(
+            'cat_user', 'mouse_user').order_by('id')
 
         games_list = []
         if int(filter) == -1:
@@ -612,7 +748,8 @@ def select_game_service(request, tipo=-1, filter=-1, game_id=-1):
     # Entrar en modo reproduccion
     elif request.method == 'GET' and int(tipo) == 3 and int(game_id) != -1:
         # Almacenamos en la sesion el juego que se está reproduciendo
-        request.session[constants.GAME_SELECTED_SESSION_ID] = game_id
+        set_session_value(request, constants.GAME_SELECTED_SESSION_ID,
+                          game_id)
         return reproduce_game_service(request)
 
     # Si nos intentan meter una url que no es ninguna de las opciones
@@ -638,6 +775,7 @@ def show_game_service(request):
         Author
         -------
             Andrés Mena
+            Eric Morales
     """
 
     # Muestra el estado de la partida que se encuentra en la sesion. En caso
@@ -653,9 +791,14 @@ def show_game_service(request):
         if game.status == GameStatus.FINISHED:
             return end_game(request, game)
 
+        # Movimientos hechos, para consultar el libro de aperturas
+        book_path = ",".join("%d-%d" % move for move in Move.objects.filter(
+            game=game).order_by('id').values_list('origin', 'target'))
+
         # Devolvemos la partida con tablero
         return render(request, 'mouse_cat/game.html',
-                      {'game': game, 'board': create_board_from_game(game)})
+                      {'game': game, 'board': game_board(game),
+                       'book_path': book_path})
     except KeyError:
         return errorHTTP(request, constants.ERROR_NO_SELECTED_GAME)
 
@@ -664,7 +807,8 @@ def show_game_service(request):
 def move_service(request):
     """
         Funcion que realiza un movimiento en la partida que se esta jugando
-        (via POST), o da error si se llama via GET
+        (via POST), o da error si se llama via GET. La partida se toma de la
+        sesion; la pagina de juego usa logic.api.move, que la recibe en la url
 
         Parameters
         ----------
@@ -677,7 +821,7 @@ def move_service(request):
             -2: Error en el movimiento
             -1: Error en el movimiento
             0: Movimiento ok
-            2: Hay ganador, finalizar partida
+            2: Hay ganador (o se ha agotado el tiempo), finalizar partida
 
         Author
         -------
@@ -696,9 +840,27 @@ def move_service(request):
                                 content_type="application/json")
 
         try:
-            # Sacamos la partida que se esta jugando de la sesión
-            game = Game.objects.filter(id=request.session[
-                constants.GAME_SELECTED_SESSION_ID])[0]
+            game_id = request.session[constants.GAME_SELECTED_SESSION_ID]
+        except KeyError:
+            return HttpResponse(json.dumps({'status': -2}),
+                                content_type="application/json")
+
+        with transaction.atomic():
+            # Sacamos la partida que se esta jugando de la sesión, bloqueada
+            # para que dos peticiones (o el barrido de relojes) no la
+            # terminen a partir del mismo estado
+            game = Game.objects.select_for_update().filter(id=game_id).first()
+            if game is None:
+                return HttpResponse(json.dumps({'status': -2}),
+                                    content_type="application/json")
+
+            # Si se le ha acabado el tiempo al jugador, termina la partida
+            if clock.expired(game):
+                game.adjudicate()
+                notify_game(game.id)
+                REGISTRY.inc('paccat_games_finished_total')
+                return HttpResponse(json.dumps({'status': 2}),
+                                    content_type="application/json")
 
             # Intentamos hacer el movimiento. En caso de que nos de una
             # excepcion, significa que el moviemiento no estaba permitido
@@ -713,22 +875,21 @@ def move_service(request):
                         game=game, player=game.mouse_user,
                         origin=origin,
                         target=target)
+                REGISTRY.inc('paccat_moves_total')
+                notify_game(game.id)
 
                 # Si hay un ganador, devolvemos un status code a interpretar
                 # por el que ha hecho la solicutd, para que finalice la partida
                 if check_winner(game) != 0:
+                    REGISTRY.inc('paccat_games_finished_total')
                     return HttpResponse(json.dumps({'status': 2}),
                                         content_type="application/json")
             except ValidationError:
                 return HttpResponse(json.dumps({'status': -1}),
                                     content_type="application/json")
 
-            return HttpResponse(json.dumps({'status': 0}),
-                                content_type="application/json")
-
-        except KeyError:
-            return HttpResponse(json.dumps({'status': -2}),
-                                content_type="application/json")
+        return HttpResponse(json.dumps({'status': 0}),
+                            content_type="application/json")
 
     # GET: Tiene que dar error. No se puede llamar a este servicio en modo get
     else:
@@ -737,7 +898,7 @@ def move_service(request):
 
 
 @login_required
-def reproduce_game_service(request):
+def reproduce_game_service(request, game_id=None):
     """
         Funcion que pinta el tablero para comenzar la reproduccion de una
         partida, inicializando las variables necesarias para la reproduccion de
@@ -747,6 +908,8 @@ def reproduce_game_service(request):
         ----------
         request : HttpRequest
             Solicitud Http
+        game_id : int (default None)
+            Id de la partida. Si no se indica, se usa la de la sesion
 
         Returns
         -------
@@ -758,11 +921,14 @@ def reproduce_game_service(request):
             Andrés Mena
     """
 
-    if constants.GAME_SELECTED_SESSION_ID not in request.session:
-        return errorHTTP(request, constants.ERROR_REPRODUCE_NOT_IN_SESSION)
+    if game_id is None:
+        if constants.GAME_SELECTED_SESSION_ID not in request.session:
+            return errorHTTP(request,
+                             constants.ERROR_REPRODUCE_NOT_IN_SESSION)
+        game_id = request.session[constants.GAME_SELECTED_SESSION_ID]
 
-    game_id = request.session[constants.GAME_SELECTED_SESSION_ID]
-    game = Game.objects.filter(id=game_id)
+    game = Game.objects.filter(id=game_id).select_related('cat_user',
+                                                          'mouse_user')
 
     # No hay ninguna partida con el id
     if len(game) == 0:
@@ -777,17 +943,20 @@ def reproduce_game_service(request):
                          constants.ERROR_NOT_FINISHED_YET)
 
     # Si no somos ni el PAC ni el gato, no podemos visualizar la partida
-    if not (game.cat_user == request.user or game.mouse_user == request.user):
+    if request.user.id not in (game.cat_user_id, game.mouse_user_id):
         return errorHTTP(request,
                          constants.ERROR_NOT_ALLOWED_TO_REPRODUCE)
 
     # Coloco el tablero en la posicion inicial
     if request.method == "GET":
-        # Ponemos a 0 el movimiento por que vamos a colocar en pos inicial
-        request.session[constants.GAME_SELECTED_MOVE_NUMBER] = 0
+        # Ponemos a 0 el movimiento por que vamos a colocar en pos inicial.
+        # La pagina usa la API de reproduccion (logic.api.replay), que no
+        # necesita el cursor; solo lo mantenemos para get_move_service
+        if request.session.get(constants.GAME_SELECTED_MOVE_NUMBER) != 0:
+            request.session[constants.GAME_SELECTED_MOVE_NUMBER] = 0
 
         # Creo un tablero con los gatos en las posiciones iniciales
-        board = create_initial_board()
+        board = initial_board()
         context_dict = {'game': game, 'board': board}
 
         # Dejamos un mensaje de quien es el ganador por si reproduce la partida
@@ -825,7 +994,7 @@ def insert_winner_message(request, game, context_dict):
 
     winner = check_winner(game)
     if winner == 1:
-        if request.user == game.cat_user:
+        if request.user.id == game.cat_user_id:
             msg = constants.CAT_WINNER + ". Enhorabuena " + str(
                 request.user)
             context_dict['winner'] = msg
@@ -834,7 +1003,7 @@ def insert_winner_message(request, game, context_dict):
                 request.user)
             context_dict['winner'] = msg
     if winner == 2:
-        if request.user == game.mouse_user:
+        if request.user.id == game.mouse_user_id:
             msg = constants.MOUSE_WINNER + ". Enhorabuena " + str(
                 request.user)
             context_dict['winner'] = msg
@@ -876,10 +1045,8 @@ def create_only_board(request, game_id=-1):
 
     # Creamos el array que representa el tablero
     if game is not None:
-        # Creamos el tablero
-        board = create_board_from_game(game)
-        return render(request, 'mouse_cat/board.html',
-                      {'board': board})
+        # El tablero sale de la caché por posición (logic.board_cache)
+        return HttpResponse(game_board(game))
 
 
 @csrf_exempt
@@ -907,11 +1074,19 @@ def turn(request, game_id=-1):
             winner:
                 0: No hay ganador
                 1: Hay ganador
+            remaining: Segundos que le quedan al jugador que tiene el turno
+                (None si la partida no tiene reloj). Se calcula con la
+                partida ya leída, sin más consultas.
 
         Author
         -------
             Eric Morales
     """
+    # Contabilizamos los clientes que están esperando su turno
+    REGISTRY.touch('paccat_active_polling_clients',
+                   request.session.session_key or request.META.get(
+                       'REMOTE_ADDR'))
+
     game = Game.objects.filter(id=game_id)
 
     # No hay ninguna partida con el id
@@ -925,19 +1100,21 @@ def turn(request, game_id=-1):
             return HttpResponse(json.dumps({'winner': 1}),
                                 content_type="application/json")
 
-        moves = Move.objects.filter(game=game).order_by('-date')
-        if len(moves) != 0:
-            last_move = moves[0]
+        remaining = clock.remaining(game)
+        last_move = Move.objects.filter(game=game).order_by('-date').first()
+        if last_move is not None:
             return HttpResponse(json.dumps({'turn': game.cat_turn,
                                             'origin': last_move.origin,
                                             'target': last_move.target,
-                                            'winner': 0}),
+                                            'winner': 0,
+                                            'remaining': remaining}),
                                 content_type="application/json")
         else:
             return HttpResponse(json.dumps({'turn': game.cat_turn,
                                             'origin': -1,
                                             'target': -1,
-                                            'winner': 0}),
+                                            'winner': 0,
+                                            'remaining': remaining}),
                                 content_type="application/json")
 
     return HttpResponse(json.dumps({'turn': -1}),
@@ -961,19 +1138,9 @@ def create_board_from_game(game):
         -------
             Eric Morales
     """
-    # Primero colocamos todas las casillas a 0, y luego donde estén los
-    # gatos lo ponemos a 1, y donde esté el PAC a -1
-    board = [0] * 64
-    board[game.cat1] = 1
-    board[game.cat2] = 2
-    board[game.cat3] = 3
-    board[game.cat4] = 4
-    board[game.mouse] = -1
-
-    newBoard = []
-    for c in range(0, 64, 8):
-        newBoard.append(board[c: c + 8])
-    return newBoard
+    # Las casillas vacías valen 0, las de los gatos de 1 a 4 y la del PAC -1
+    return board_rows((game.cat1, game.cat2, game.cat3, game.cat4),
+                      game.mouse)
 
 
 def create_initial_board():
@@ -989,24 +1156,15 @@ def create_initial_board():
         -------
             Andres Mena
     """
-    board = [0] * 64
-    board[0] = 1
-    board[2] = 2
-    board[4] = 3
-    board[6] = 4
-    board[59] = -1
-
-    newBoard = []
-    for c in range(0, 64, 8):
-        newBoard.append(board[c: c + 8])
-    return newBoard
+    return board_rows(INITIAL_CATS, INITIAL_MOUSE)
 
 
 @csrf_exempt
 def get_move_service(request):
     """
         Funcion que devuelve el json con la información que debe realizar la
-        partida reproduciendose
+        partida reproduciendose. El cursor se guarda en la sesion; la pagina
+        de reproduccion usa logic.api.replay, que lo recibe en la url
 
         Parameters
         ----------
@@ -1093,3 +1251,129 @@ def get_move_service(request):
 
     return HttpResponse(json.dumps(json_dict),
                         content_type="application/json")
+
+
+def profile_service(request, username):
+    """
+        Muestra el perfil de un jugador con sus estadísticas, que se leen
+        solo de UserStats.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Solicitud Http
+        username : str
+            Nombre del jugador
+
+        Returns
+        -------
+        Html : página del perfil, o de error si no existe el jugador
+
+        Author
+        -------
+            Eric Morales
+    """
+    stats = user_stats_or_none(username)
+    if stats is None:
+        return errorHTTP(request, constants.ERROR_USER_NOT_EXISTS)
+    return render(request, 'mouse_cat/profile.html', {'stats': stats})
+
+
+def tournaments_service(request):
+    """
+        Muestra los últimos torneos.
+
+        Returns
+        -------
+        Html : lista de torneos
+
+        Author
+        -------
+            Eric Morales
+    """
+    tournaments = Tournament.objects.order_by('-id')[:TOURNAMENTS_SHOWN]
+    return render(request, 'mouse_cat/tournaments.html',
+                  {'tournaments': tournaments})
+
+
+def tournament_service(request, tournament_id):
+    """
+        Muestra la clasificación de un torneo, que se lee tal cual de
+        TournamentEntry, y las partidas de la ronda en juego.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Solicitud Http
+        tournament_id : int
+            Id del torneo
+
+        Returns
+        -------
+        Html : página del torneo, o de error si no existe
+
+        Author
+        -------
+            Eric Morales
+    """
+    tournament = Tournament.objects.filter(id=tournament_id).first()
+    if tournament is None:
+        return errorHTTP(request, constants.ERROR_TOURNAMENT_NOT_EXISTS)
+
+    entries = tournament.entries.select_related('user').order_by(
+        '-score', 'id')
+    games = tournament.games.filter(
+        round=tournament.current_round).select_related(
+        'game', 'game__cat_user', 'game__mouse_user').order_by('id')
+    return render(request, 'mouse_cat/tournament.html', {
+        'tournament': tournament, 'entries': entries, 'games': games})
+
+
+def leaderboard_service(request):
+    """
+        Muestra la clasificación de los jugadores por puntuación, una página
+        cada vez (ver logic.leaderboard).
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Solicitud Http, con el cursor de la página en el parámetro after
+
+        Returns
+        -------
+        Html : página de la clasificación
+
+        Author
+        -------
+            Eric Morales
+    """
+    rows, next_cursor = leaderboard_page(request.GET.get('after'))
+    return render(request, 'mouse_cat/leaderboard.html',
+                  {'rows': rows, 'next_cursor': next_cursor})
+
+
+def metrics_service(request):
+    """
+        Funcion que devuelve las métricas de la aplicación en formato de
+        texto de Prometheus. Si settings.METRICS_TOKEN está definido, exige
+        la cabecera "Authorization: Bearer <token>".
+
+        Parameters
+        ----------
+        request : HttpRequest
+            Solicitud Http
+
+        Returns
+        -------
+        HttpResponse : métricas en formato texto
+
+        Author
+        -------
+            Eric Morales
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.META.get('HTTP_AUTHORIZATION') != 'Bearer ' + token:
+        return HttpResponseForbidden()
+
+    return HttpResponse(REGISTRY.render(),
+                        content_type="text/plain; version=0.0.4")
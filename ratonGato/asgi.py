@@ -0,0 +1,63 @@
+"""
+    Configuración ASGI de la aplicación de PACGato.
+
+        daphne ratonGato.asgi:application
+
+    Las peticiones HTTP las sigue atendiendo la aplicación WSGI
+    (ratonGato.wsgi) a través del adaptador WsgiToAsgi de asgiref, salvo la
+    espera de movimientos, que la atiende un consumidor asíncrono
+    (logic.consumers). El canal WebSocket de cada partida está en
+    ws/games/<id>/. Con la versión de asgiref fijada en requirements.txt el
+    adaptador atiende cada petición en un hilo del pool.
+
+    El despliegue por defecto (Procfile) sigue siendo gunicorn con la
+    aplicación WSGI; ver el README para desplegar también esta.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import os
+from functools import partial
+
+import django
+from asgiref.wsgi import WsgiToAsgi
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ratonGato.settings')
+django.setup()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from django.urls import re_path  # noqa: E402
+
+from logic import consumers  # noqa: E402
+from ratonGato.wsgi import application as wsgi_application  # noqa: E402
+
+
+class WsgiHandler(object):
+    """
+        Aplicación ASGI (con la interfaz de dos llamadas que usa channels)
+        que atiende las peticiones con una aplicación WSGI.
+    """
+
+    def __init__(self, application):
+        self.application = WsgiToAsgi(application)
+
+    def __call__(self, scope):
+        return partial(self.application, scope)
+
+
+# Las urls de logic están publicadas en la raíz y bajo mouse_cat/
+WAIT_PATH = r'^(mouse_cat/)?api/v1/games/(?P<game_id>\d+)/wait/$'
+GAME_SOCKET_PATH = r'^(mouse_cat/)?ws/games/(?P<game_id>\d+)/$'
+
+application = ProtocolTypeRouter({
+    'http': URLRouter([
+        re_path(WAIT_PATH, AuthMiddlewareStack(consumers.WaitMoveConsumer)),
+        re_path(r'', WsgiHandler(wsgi_application)),
+    ]),
+    'websocket': AuthMiddlewareStack(URLRouter([
+        re_path(GAME_SOCKET_PATH, consumers.GameConsumer),
+    ])),
+})
@@ -9,6 +9,8 @@
 import dj_database_url
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_DIR = os.path.join(BASE_DIR, 'static')
@@ -35,11 +37,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'channels',
     'datamodel',
     'logic'
 ]
 
 MIDDLEWARE = [
+    'logic.middleware.PerformanceMiddleware',
+    'logic.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,6 +74,36 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'ratonGato.wsgi.application'
+ASGI_APPLICATION = 'ratonGato.asgi.application'
+
+# Capa de canales para avisar de los movimientos a los consumidores
+# asíncronos. La capa en memoria solo sirve para un proceso; con varios
+# hay que usar una compartida: Redis (REDIS_URL, con channels_redis) o, con
+# todos los procesos en la misma máquina, la capa en ficheros
+# (CHANNEL_LAYER_DIR, ver logic.channel_layers)
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        }
+    }
+elif os.getenv('CHANNEL_LAYER_DIR'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'logic.channel_layers.FileChannelLayer',
+            'CONFIG': {'directory': os.getenv('CHANNEL_LAYER_DIR')},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Segundos que espera como mucho api/v1/games/<id>/wait/ con ASGI
+WAIT_MOVE_TIMEOUT = 25
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -135,7 +170,109 @@ USE_TZ = True
 
 STATICFILES_DIRS = [STATIC_DIR, ]
 STATIC_URL = '/static/'
+# collectstatic añade el hash del contenido a los nombres y guarda las
+# versiones comprimidas (ver ratonGato.static)
+STATICFILES_STORAGE = 'ratonGato.static.CompressedManifestStorage'
 
 # Media files
 MEDIA_ROOT = MEDIA_DIR
 MEDIA_URL = '/media/'
+
+# Caché. Por defecto es local a cada proceso; con varios workers conviene
+# una compartida (memcached en CACHE_LOCATION, p.ej. "127.0.0.1:11211")
+if os.getenv('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'paccat',
+        }
+    }
+
+# Caché del html del tablero por posición (logic.board_cache): LRU en
+# memoria de cada proceso y, si hay una caché compartida, también en ella
+BOARD_CACHE_SIZE = int(os.getenv('BOARD_CACHE_SIZE', 1024))
+BOARD_CACHE = 'default' if os.getenv('CACHE_LOCATION') else None
+
+# Clasificación (logic.leaderboard): filas por página y primeras páginas
+# que se guardan en la caché, y durante cuántos segundos
+LEADERBOARD_PAGE_SIZE = 20
+LEADERBOARD_CACHED_PAGES = int(os.getenv('LEADERBOARD_CACHED_PAGES', 5))
+LEADERBOARD_CACHE_TIMEOUT = 30
+
+# Partidas abandonadas (comando reap_games): segundos sin actividad tras los
+# que caduca una partida creada a la que nadie se ha unido y se adjudica una
+# partida activa
+GAME_CREATED_TIMEOUT = int(os.getenv('GAME_CREATED_TIMEOUT', 24 * 60 * 60))
+GAME_ACTIVE_TIMEOUT = int(os.getenv('GAME_ACTIVE_TIMEOUT', 3 * 24 * 60 * 60))
+
+# Libro de aperturas (comando build_opening_book), que cada proceso carga
+# en memoria la primera vez que se consulta
+OPENING_BOOK_FILE = os.getenv('OPENING_BOOK_FILE',
+                              os.path.join(BASE_DIR, 'opening_book.bin'))
+
+# Almacenamiento de las sesiones (variable de entorno SESSION_MODE):
+#   - db: tabla django_session
+#   - cached_db: tabla django_session, leyendo de la caché. Sigue
+#     escribiendo en la tabla cada vez que cambia la sesión
+#   - cache: solo en la caché (se pierden si se vacía)
+#   - signed_cookies: en la propia cookie firmada, sin escrituras en el
+#     servidor. Las sesiones solo guardan claves pequeñas (contador de
+#     errores, partida seleccionada y movimiento), así que caben, y es la
+#     opción que quita la tabla de en medio
+# cached_db y cache necesitan una caché compartida (CACHE_LOCATION): con la
+# caché local de cada proceso, un worker leería su propia copia, ya
+# desfasada, de una sesión que ha cambiado otro. Sin ella, por defecto se
+# usa db. Las sesiones caducadas de la tabla se borran con
+# "manage.py purge_sessions"
+SESSION_MODE = os.getenv('SESSION_MODE',
+                         'cached_db' if os.getenv('CACHE_LOCATION') else 'db')
+if SESSION_MODE in ('cached_db', 'cache') and \
+        not os.getenv('CACHE_LOCATION'):
+    raise ImproperlyConfigured("SESSION_MODE=%s necesita una caché "
+                               "compartida en CACHE_LOCATION" % SESSION_MODE)
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+# Instrumentación de rendimiento por petición (cabecera Server-Timing y
+# log paccat.perf). Se puede cambiar en caliente con "manage.py perf_toggle"
+PERF_INSTRUMENTATION = bool(os.getenv('PERF_INSTRUMENTATION', False))
+PERF_TOGGLE_FILE = os.getenv('PERF_TOGGLE_FILE',
+                             os.path.join(BASE_DIR, '.perf_toggle'))
+PERF_TOGGLE_INTERVAL = 1.0
+
+# Métricas en formato Prometheus en /metrics. Con varios workers de
+# gunicorn hay que indicar un directorio compartido en el que cada proceso
+# guarda sus métricas. Si se define METRICS_TOKEN, /metrics exige la
+# cabecera "Authorization: Bearer <token>"
+METRICS_ENABLED = True
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'paccat': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
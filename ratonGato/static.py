@@ -0,0 +1,332 @@
+"""
+    Ficheros estáticos de PACGato.
+
+    collectstatic (con STATICFILES_STORAGE apuntando a
+    CompressedManifestStorage) copia los ficheros a STATIC_ROOT con el hash
+    del contenido en el nombre (style.css -> style.1a2b3c4d5e6f.css) y
+    guarda junto a cada fichero de texto su versión comprimida con gzip
+    (.gz) y, si está instalado el paquete brotli, con brotli (.br).
+
+    StaticFiles sirve STATIC_ROOT desde la aplicación WSGI: elige la versión
+    comprimida según Accept-Encoding y marca los ficheros con hash como
+    inmutables, así que en las siguientes visitas el navegador no vuelve a
+    pedirlos. Atiende las peticiones de un único rango (Range), que usa
+    <audio> para saltar a otro punto de la canción.
+
+    Author
+    -------
+        Eric Morales
+"""
+
+import gzip
+import io
+import mimetypes
+import os
+import re
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+# Extensiones que merece la pena comprimir (las imágenes y el mp3 ya lo
+# están)
+COMPRESSIBLE = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.xml',
+                '.map', '.ico')
+
+# Solo se guarda la versión comprimida si ahorra al menos un 5%
+MIN_RATIO = 0.95
+
+# Codificaciones que se sirven, de mayor a menor preferencia, y el sufijo
+# del fichero comprimido
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Un fichero con hash no cambia nunca: si cambia, cambia su nombre
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Ficheros sin hash (p.ej. si no se ha ejecutado collectstatic)
+DEFAULT_MAX_AGE = 60
+
+# Nombres generados por ManifestStaticFilesStorage: nombre.<12 hex>.ext
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+# Un único rango de bytes: inicio-fin, inicio- o -últimos
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+BLOCK_SIZE = 64 * 1024
+
+
+def gzip_bytes(data):
+    """
+        Comprime con gzip sin guardar la fecha, para que el resultado solo
+        dependa del contenido.
+
+        Author
+        -------
+            Eric Morales
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def byte_range(header, size):
+    """
+        Interpreta la cabecera Range de una petición.
+
+        Parameters
+        ----------
+        header : str
+            Valor de la cabecera (vacío si no la hay)
+        size : int
+            Tamaño del fichero
+
+        Returns
+        -------
+        tuple : (inicio, fin) del rango, incluidos; None si hay que enviar
+        el fichero entero (sin cabecera, o con varios rangos o una que no
+        se entiende) y False si el rango no se puede satisfacer
+
+        Author
+        -------
+            Eric Morales
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Los últimos bytes del fichero
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+
+def read_range(path, start, length):
+    """
+        Lee length bytes de un fichero desde start, por bloques.
+
+        Author
+        -------
+            Eric Morales
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def compressors():
+    """
+        Compresores disponibles para collectstatic.
+
+        Returns
+        -------
+        list : tuplas (sufijo del fichero, función de compresión)
+
+        Author
+        -------
+            Eric Morales
+    """
+    result = [('.gz', gzip_bytes)]
+    if brotli is not None:
+        result.append(('.br', brotli.compress))
+    return result
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """
+        ManifestStaticFilesStorage que además guarda las versiones
+        comprimidas de los ficheros con hash.
+
+        Las referencias de los css a ficheros que no existen (p.ej.
+        owl.video.play.png en owl.carousel.min.css) se dejan como están en
+        lugar de abortar collectstatic. Si no hay manifiesto (no se ha
+        ejecutado collectstatic, como en desarrollo y en los tests) las urls
+        se generan sin hash; si lo hay, un fichero que no está en él es un
+        error (ValueError), como con manifest_strict.
+
+        Methods
+        -------
+        post_process(self, paths, dry_run=False, **options)
+            Renombra con hash y comprime los ficheros copiados.
+    """
+
+    def url_converter(self, name, hashed_files, template=None):
+        convert = super().url_converter(name, hashed_files, template)
+
+        def converter(matchobj):
+            try:
+                return convert(matchobj)
+            except ValueError:
+                return matchobj.groups()[0]
+
+        return converter
+
+    def stored_name(self, name):
+        if not self.hashed_files and not self.exists(self.manifest_name):
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for name in sorted(set(self.hashed_files.values())):
+            if not name.lower().endswith(COMPRESSIBLE):
+                continue
+            with self.open(name) as original:
+                data = original.read()
+            for suffix, compress in compressors():
+                compressed = compress(data)
+                if len(compressed) >= len(data) * MIN_RATIO:
+                    continue
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+                yield name, name + suffix, True
+
+
+class StaticFiles(object):
+    """
+        Aplicación WSGI que sirve los ficheros de STATIC_ROOT bajo STATIC_URL
+        y pasa el resto de peticiones a la aplicación de Django.
+
+        Methods
+        -------
+        find(self, name)
+            Devuelve la ruta del fichero dentro de STATIC_ROOT.
+        serve(self, environ, start_response, full_path)
+            Sirve un fichero (o su versión comprimida), o uno de sus
+            rangos.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = os.path.realpath(root or settings.STATIC_ROOT)
+        self.prefix = prefix or settings.STATIC_URL
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed',
+                           [('Allow', 'GET, HEAD'),
+                            ('Content-Type', 'text/plain')])
+            return [b'Method Not Allowed']
+
+        full_path = self.find(path[len(self.prefix):])
+        if full_path is None:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found']
+        return self.serve(environ, start_response, full_path)
+
+    def find(self, name):
+        """
+            Ruta absoluta del fichero name dentro de STATIC_ROOT.
+
+            Returns
+            -------
+            str : ruta del fichero, o None si no existe o está fuera de
+            STATIC_ROOT
+
+            Author
+            -------
+                Eric Morales
+        """
+        full_path = os.path.realpath(os.path.join(self.root, name))
+        if not full_path.startswith(self.root + os.sep):
+            return None
+        return full_path if os.path.isfile(full_path) else None
+
+    def serve(self, environ, start_response, full_path):
+        """
+            Sirve el fichero. Si el cliente acepta alguna de las
+            codificaciones y existe el fichero comprimido, envía ese. Si
+            pide un único rango de bytes, envía solo ese rango (206).
+
+            Author
+            -------
+                Eric Morales
+        """
+        accepted = {token.split(';')[0].strip() for token in
+                    environ.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+        content_type, _ = mimetypes.guess_type(full_path)
+
+        headers = []
+        served, encoding = full_path, None
+        for name, suffix in ENCODINGS:
+            if os.path.isfile(full_path + suffix):
+                if not headers:
+                    headers.append(('Vary', 'Accept-Encoding'))
+                if encoding is None and name in accepted:
+                    served, encoding = full_path + suffix, name
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+
+        stat = os.stat(served)
+        etag = '"%x-%x%s"' % (int(stat.st_mtime), stat.st_size,
+                              '-' + encoding if encoding else '')
+        if HASHED_RE.search(full_path):
+            cache_control = 'public, max-age=%d, immutable' % \
+                IMMUTABLE_MAX_AGE
+        else:
+            cache_control = 'public, max-age=%d' % DEFAULT_MAX_AGE
+        headers += [('ETag', etag), ('Cache-Control', cache_control),
+                    ('Last-Modified', http_date(stat.st_mtime)),
+                    ('Accept-Ranges', 'bytes')]
+
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            start_response('304 Not Modified', headers)
+            return []
+
+        headers.append(('Content-Type', content_type or
+                        'application/octet-stream'))
+        requested = None
+        # Con If-Range, el rango solo vale si el fichero no ha cambiado
+        if environ.get('HTTP_IF_RANGE', etag) == etag:
+            requested = byte_range(environ.get('HTTP_RANGE', ''),
+                                   stat.st_size)
+        if requested is False:
+            start_response('416 Range Not Satisfiable', headers + [
+                ('Content-Range', 'bytes */%d' % stat.st_size),
+                ('Content-Length', '0')])
+            return []
+        if requested is not None:
+            start, end = requested
+            start_response('206 Partial Content', headers + [
+                ('Content-Range', 'bytes %d-%d/%d' % (start, end,
+                                                      stat.st_size)),
+                ('Content-Length', str(end - start + 1))])
+            if environ['REQUEST_METHOD'] == 'HEAD':
+                return []
+            return read_range(served, start, end - start + 1)
+
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(served, 'rb'))
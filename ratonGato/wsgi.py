@@ -8,9 +8,14 @@
 
 import os
 
-from dj_static import Cling
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ratonGato.settings')
 
-application = Cling(get_wsgi_application())
+django_application = get_wsgi_application()
+
+from ratonGato.static import StaticFiles  # noqa: E402
+
+# Los ficheros estáticos (ver ratonGato.static) se sirven sin pasar por
+# Django
+application = StaticFiles(django_application)
@@ -0,0 +1,32 @@
+/* Libro de aperturas (api/v1/book/): cuantas partidas han llegado a la
+   posicion, como les fue a los gatos y los movimientos mas jugados desde
+   ella. path es la lista de movimientos "origen-destino" desde la posicion
+   inicial */
+function bookPercent(wins, games) {
+    return Math.round(100 * wins / games) + '%';
+}
+
+function showBook(url, path, element) {
+    $.ajax({
+        url: url + '?moves=' + path.join(','),
+        type: 'get',
+        success: function (data) {
+            var box = $(element);
+            if (data.games === 0) {
+                box.text('Ninguna partida del libro ha llegado a esta posición');
+                return;
+            }
+            var list = $('<ul></ul>');
+            data.moves.slice(0, 3).forEach(function (move) {
+                list.append($('<li></li>').text(
+                    move.origin + ' → ' + move.target + ': ' + move.games +
+                    ' partidas, gatos ' + bookPercent(move.cat_wins, move.games)));
+            });
+            box.empty()
+                .append($('<p></p>').text(
+                    data.games + ' partidas, gatos ' +
+                    bookPercent(data.cat_wins, data.games)))
+                .append(list);
+        }
+    });
+}
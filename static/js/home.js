@@ -0,0 +1,33 @@
+/* Carrusel de la portada (index.html). Se carga solo en esa página, junto
+   con owl.carousel.min.js */
+
+'use strict';
+
+(function($) {
+	/*------------------
+		Hero Slider
+	--------------------*/
+	$('.hero-slider').owlCarousel({
+		loop: true,
+		nav: true,
+		dots: true,
+		navText: ['', '<span class="sprite sprite-small sprite-icons-solid-right-arrow"></span>'],
+		mouseDrag: false,
+		animateOut: 'fadeOut',
+		animateIn: 'fadeIn',
+		items: 1,
+		//autoplay: true,
+		autoplayTimeout: 10000,
+	});
+
+	var dot = $('.hero-slider .owl-dot');
+	dot.each(function() {
+		var index = $(this).index() + 1;
+		if(index < 10){
+			$(this).html('0').append(index + '.');
+		}else{
+			$(this).html(index + '.');
+		}
+	});
+
+})(jQuery);
@@ -32,52 +32,15 @@ $(window).on('load', function() {
 	/*------------------
 		Background Set
 	--------------------*/
+	/* Versiones de build_images: WebP si el navegador lo admite y la
+	   pequeña si la pantalla no necesita más */
+	var webp = document.createElement('canvas').toDataURL('image/webp').indexOf('data:image/webp') === 0;
+	var small = window.innerWidth * (window.devicePixelRatio || 1) <= 960;
 	$('.set-bg').each(function() {
-		var bg = $(this).data('setbg');
+		var bg = $(this).data('setbg' + (webp ? '-webp' : '') + (small ? '-small' : '')) || $(this).data('setbg');
 		$(this).css('background-image', 'url(' + bg + ')');
 	});
 
 
 
-	/*------------------
-		Hero Slider
-	--------------------*/
-	$('.hero-slider').owlCarousel({
-		loop: true,
-		nav: true,
-		dots: true,
-		navText: ['', '<img src="/static/img/icons/solid-right-arrow.png">'],
-		mouseDrag: false,
-		animateOut: 'fadeOut',
-		animateIn: 'fadeIn',
-		items: 1,
-		//autoplay: true,
-		autoplayTimeout: 10000,
-	});
-
-	var dot = $('.hero-slider .owl-dot');
-	dot.each(function() {
-		var index = $(this).index() + 1;
-		if(index < 10){
-			$(this).html('0').append(index + '.');
-		}else{
-			$(this).html(index + '.');
-		}
-	});
-
-
-
-	/*------------------
-		Video Popup
-	--------------------*/
-	$('.video-popup').magnificPopup({
-  		type: 'iframe'
-	});
-
-	$('#stickySidebar').stickySidebar({
-	    topSpacing: 60,
-	    bottomSpacing: 60
-	});
-
-
 })(jQuery);